@@ -57,6 +57,8 @@ class SyncThreadActor(Actor, Generic[SyncThreadT]):
     ):
         super().__init__(name, services)
         self._sync_thread = sync_thread
+        self._sync_thread.async_queue_stats.name = name
+        services.stats.queue_writers[name] = self._sync_thread.async_queue_stats
 
     def process_message(self, message: Message) -> Result[bool, BaseException]:
         raise ValueError(f"Error. {self.__class__.__name__} does not process any messages. Received {message.Header}")
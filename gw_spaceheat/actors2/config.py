@@ -1,12 +1,8 @@
-from pydantic import BaseModel
-
 from proactor import ProactorSettings
+from proactor.config import DEFAULT_MAX_EVENT_BYTES  # noqa
 from proactor.config import MQTTClient
+from proactor.config import PersisterSettings  # noqa
 
-DEFAULT_MAX_EVENT_BYTES: int = 500 * 1024 * 1024
-
-class PersisterSettings(BaseModel):
-    max_bytes: int = DEFAULT_MAX_EVENT_BYTES
 
 class ScadaSettings(ProactorSettings):
     """Settings for the GridWorks scada."""
@@ -14,7 +10,6 @@ class ScadaSettings(ProactorSettings):
     gridworks_mqtt: MQTTClient = MQTTClient()
     seconds_per_report: int = 300
     async_power_reporting_threshold = 0.02
-    persister: PersisterSettings = PersisterSettings()
 
     class Config(ProactorSettings.Config):
         env_prefix = "SCADA_"
@@ -41,11 +41,14 @@ from data_classes.components.boolean_actuator_component import BooleanActuatorCo
 from data_classes.hardware_layout import HardwareLayout
 from data_classes.sh_node import ShNode
 from named_tuples.telemetry_tuple import TelemetryTuple
+from proactor.event_loop import run_event_loop
 from proactor.link_state import Transition
 from proactor.mqtt import QOS
 from proactor.message import MQTTReceiptPayload
-from proactor.persister import TimedRollingFilePersister
+from proactor.persister import PersisterInterface
+from proactor.persister import make_persister
 from proactor.proactor_implementation import Proactor
+from proactor.receive_queue import ReceiveLane
 
 ScadaMessageDecoder = create_message_payload_discriminator(
     "ScadaMessageDecoder",
@@ -159,11 +162,8 @@ class Scada2(ScadaInterface, Proactor):
                 )
 
     @classmethod
-    def make_event_persister(cls, settings:ScadaSettings) -> TimedRollingFilePersister:
-        return TimedRollingFilePersister(
-            settings.paths.event_dir,
-            max_bytes=settings.persister.max_bytes,
-        )
+    def make_event_persister(cls, settings:ScadaSettings) -> PersisterInterface:
+        return make_persister(settings.persister, settings.paths.event_dir)
 
     @property
     def alias(self):
@@ -243,82 +243,153 @@ class Scada2(ScadaInterface, Proactor):
         message = Message(Src=from_node.alias, Payload=payload)
         return self._publish_message(Scada2.LOCAL_MQTT, message, qos=qos)
 
+    def _add_routes(self) -> None:
+        super()._add_routes()
+        for payload_type, handler, path in [
+            (GsPwr, self._process_gs_pwr, 0x00010000),
+            (GtDispatchBooleanLocal, self._process_local_boolean_dispatch, 0x00020000),
+            (GtTelemetry, self._process_local_telemetry, 0x00040000),
+            (GtShTelemetryFromMultipurposeSensor, self._process_multipurpose_telemetry, 0x00080000),
+            (GtDriverBooleanactuatorCmd, self._process_booleanactuator_cmd, 0x00100000),
+        ]:
+            self._routes.add(payload_type, handler, path)
+        for type_name, handler, path in [
+            (GtDispatchBoolean_Maker.type_alias, self._process_boolean_dispatch_message, 0x00010000),
+            (GtShCliAtnCmd_Maker.type_alias, self._process_gt_sh_cli_atn_cmd_message, 0x00020000),
+            (GtTelemetry_Maker.type_alias, self._process_telemetry_message, 0x00040000),
+        ]:
+            self._routes.add_mqtt(type_name, handler, path, client=self.GRIDWORKS_MQTT)
+
     def _derived_process_message(self, message: Message):
-        self._logger.path("++Scada2._derived_process_message %s/%s", message.Header.Src, message.Header.MessageType)
+        raise ValueError(
+            f"There is no handler for mqtt message payload type [{type(message.Payload)}]"
+        )
+
+    def _process_gs_pwr(self, message: Message[GsPwr]) -> None:
+        self._logger.path("++Scada2._process_gs_pwr %s", message.Header.Src)
+        started = time.perf_counter()
+        path_dbg = 0
+        if self._layout.node(message.Header.Src, None) is self._layout.power_meter_node:
+            path_dbg |= 0x00000001
+            self.gs_pwr_received(message.Payload)
+        else:
+            raise Exception(
+                f"message.Header.Src {message.Header.Src} must be from {self._layout.power_meter_node} "
+                "for GsPwr message"
+            )
+        self._profiler.record("Scada2._process_gs_pwr", message.Header.MessageType, path_dbg, started)
+        self._logger.path("--Scada2._process_gs_pwr  path:0x%08X", path_dbg)
+
+    def _process_local_boolean_dispatch(self, message: Message[GtDispatchBooleanLocal]) -> None:
+        self._logger.path("++Scada2._process_local_boolean_dispatch %s", message.Header.Src)
+        started = time.perf_counter()
+        path_dbg = 0
+        if message.Header.Src == self._home_alone.name:
+            path_dbg |= 0x00000001
+            self.local_boolean_dispatch_received(message.Payload)
+        else:
+            raise Exception(
+                "message.Header.Src must be a.home for GsDispatchBooleanLocal message"
+            )
+        self._profiler.record("Scada2._process_local_boolean_dispatch", message.Header.MessageType, path_dbg, started)
+        self._logger.path("--Scada2._process_local_boolean_dispatch  path:0x%08X", path_dbg)
+
+    def _process_local_telemetry(self, message: Message[GtTelemetry]) -> None:
+        self._logger.path("++Scada2._process_local_telemetry %s", message.Header.Src)
+        started = time.perf_counter()
+        path_dbg = 0
+        from_node = self._layout.node(message.Header.Src, None)
+        if from_node in self._layout.my_simple_sensors:
+            path_dbg |= 0x00000001
+            self.gt_telemetry_received(from_node, message.Payload)
+        self._profiler.record("Scada2._process_local_telemetry", message.Header.MessageType, path_dbg, started)
+        self._logger.path("--Scada2._process_local_telemetry  path:0x%08X", path_dbg)
+
+    def _process_multipurpose_telemetry(self, message: Message[GtShTelemetryFromMultipurposeSensor]) -> None:
+        self._logger.path("++Scada2._process_multipurpose_telemetry %s", message.Header.Src)
+        started = time.perf_counter()
+        path_dbg = 0
+        from_node = self._layout.node(message.Header.Src, None)
+        if from_node in self._layout.my_multipurpose_sensors:
+            path_dbg |= 0x00000001
+            self.gt_sh_telemetry_from_multipurpose_sensor_received(from_node, message.Payload)
+        self._profiler.record("Scada2._process_multipurpose_telemetry", message.Header.MessageType, path_dbg, started)
+        self._logger.path("--Scada2._process_multipurpose_telemetry  path:0x%08X", path_dbg)
+
+    def _process_booleanactuator_cmd(self, message: Message[GtDriverBooleanactuatorCmd]) -> None:
+        self._logger.path("++Scada2._process_booleanactuator_cmd %s", message.Header.Src)
+        started = time.perf_counter()
         path_dbg = 0
         from_node = self._layout.node(message.Header.Src, None)
+        if from_node in self._layout.my_boolean_actuators:
+            path_dbg |= 0x00000001
+            self.gt_driver_booleanactuator_cmd_record_received(from_node, message.Payload)
+        self._profiler.record("Scada2._process_booleanactuator_cmd", message.Header.MessageType, path_dbg, started)
+        self._logger.path("--Scada2._process_booleanactuator_cmd  path:0x%08X", path_dbg)
+
+    def _derived_receive_lane(self, message: Message) -> ReceiveLane:
         match message.Payload:
-            case GsPwr():
-                path_dbg |= 0x00000001
-                if from_node is self._layout.power_meter_node:
-                    path_dbg |= 0x00000002
-                    self.gs_pwr_received(message.Payload)
-                else:
-                    raise Exception(
-                        f"message.Header.Src {message.Header.Src} must be from {self._layout.power_meter_node} for GsPwr message"
-                    )
             case GtDispatchBooleanLocal():
-                path_dbg |= 0x00000004
-                if message.Header.Src == self._home_alone.name:
-                    path_dbg |= 0x00000008
-                    self.local_boolean_dispatch_received(message.Payload)
-                else:
-                    raise Exception(
-                        "message.Header.Src must be a.home for GsDispatchBooleanLocal message"
-                    )
-            case GtTelemetry():
-                path_dbg |= 0x00000010
-                if from_node in self._layout.my_simple_sensors:
-                    path_dbg |= 0x00000020
-                    self.gt_telemetry_received(from_node, message.Payload)
-            case GtShTelemetryFromMultipurposeSensor():
-                path_dbg |= 0x00000040
-                if from_node in self._layout.my_multipurpose_sensors:
-                    path_dbg |= 0x00000080
-                    self.gt_sh_telemetry_from_multipurpose_sensor_received(
-                        from_node, message.Payload
-                    )
-            case GtDriverBooleanactuatorCmd():
-                path_dbg |= 0x00000100
-                if from_node in self._layout.my_boolean_actuators:
-                    path_dbg |= 0x00000200
-                    self.gt_driver_booleanactuator_cmd_record_received(
-                        from_node, message.Payload
-                    )
-            case _:
-                raise ValueError(
-                    f"There is no handler for mqtt message payload type [{type(message.Payload)}]"
-                )
-        self._logger.path("--Scada2._derived_process_message  path:0x%08X", path_dbg)
+                return ReceiveLane.control
+            case GsPwr():
+                return ReceiveLane.power
+        return ReceiveLane.telemetry
+
+    def _derived_mqtt_receive_lane(self, message_type: str) -> ReceiveLane:
+        if message_type in (GtDispatchBoolean_Maker.type_alias, GtShCliAtnCmd_Maker.type_alias):
+            return ReceiveLane.control
+        return ReceiveLane.telemetry
 
     def _derived_process_mqtt_message(
         self, message: Message[MQTTReceiptPayload], decoded: Any
     ):
-        self._logger.path("++Scada2._derived_process_mqtt_message %s", message.Payload.message.topic)
-        path_dbg = 0
         if message.Payload.client_name != self.GRIDWORKS_MQTT:
             raise ValueError(
                 f"There are no messages expected to be received from [{message.Payload.client_name}] mqtt broker. "
                 f"Received\n\t topic: [{message.Payload.message.topic}]"
             )
-        match decoded.Payload:
-            case GtDispatchBoolean():
+        raise ValueError(
+            f"There is no handler for mqtt message payload type [{type(decoded.Payload)}]\n"
+            f"Received\n\t topic: [{message.Payload.message.topic}]"
+        )
+
+    # noinspection PyUnusedLocal
+    def _process_boolean_dispatch_message(
+        self, message: Message[MQTTReceiptPayload], decoded: Message[GtDispatchBoolean]
+    ) -> None:
+        started = time.perf_counter()
+        path_dbg = 0
+        match self._boolean_dispatch_received(decoded.Payload):
+            case ScadaCmdDiagnostic.SUCCESS:
                 path_dbg |= 0x00000001
-                self._boolean_dispatch_received(decoded.Payload)
-            case GtShCliAtnCmd():
+            case ScadaCmdDiagnostic.IGNORING_ATN_DISPATCH:
                 path_dbg |= 0x00000002
-                self._gt_sh_cli_atn_cmd_received(decoded.Payload)
-            case GtTelemetry():
-                path_dbg |= 0x00000004
-                self._process_telemetry(message, decoded.Payload)
             case _:
-                raise ValueError(
-                    f"There is no handler for mqtt message payload type [{type(decoded.Payload)}]\n"
-                    f"Received\n\t topic: [{message.Payload.message.topic}]"
-                )
-        self._logger.path("--Scada2._derived_process_mqtt_message  path:0x%08X", path_dbg)
+                path_dbg |= 0x00000004
+        self._profiler.record("Scada2._process_boolean_dispatch_message", decoded.Header.MessageType, path_dbg, started)
+
+    # noinspection PyUnusedLocal
+    def _process_gt_sh_cli_atn_cmd_message(
+        self, message: Message[MQTTReceiptPayload], decoded: Message[GtShCliAtnCmd]
+    ) -> None:
+        started = time.perf_counter()
+        path_dbg = 0
+        if decoded.Payload.SendSnapshot is True:
+            path_dbg |= 0x00000001
+        self._gt_sh_cli_atn_cmd_received(decoded.Payload)
+        self._profiler.record(
+            "Scada2._process_gt_sh_cli_atn_cmd_message", decoded.Header.MessageType, path_dbg, started
+        )
+
+    def _process_telemetry_message(self, message: Message[MQTTReceiptPayload], decoded: Message[GtTelemetry]) -> None:
+        started = time.perf_counter()
+        path_dbg = 0
+        if self._process_telemetry(message, decoded.Payload):
+            path_dbg |= 0x00000001
+        self._profiler.record("Scada2._process_telemetry_message", decoded.Header.MessageType, path_dbg, started)
 
-    def _process_telemetry(self, message: Message, decoded: GtTelemetry):
+    def _process_telemetry(self, message: Message, decoded: GtTelemetry) -> bool:
+        """Record telemetry from one of this scada's simple sensors, returning whether it was recorded."""
         from_node = self._layout.node(message.Header.Src)
         if from_node in self._layout.my_simple_sensors:
             self._data.recent_simple_values[from_node].append(decoded.Value)
@@ -326,6 +397,8 @@ class Scada2(ScadaInterface, Proactor):
                 decoded.ScadaReadTimeUnixMs
             )
             self._data.latest_simple_value[from_node] = decoded.Value
+            return True
+        return False
 
     def _boolean_dispatch_received(
         self, payload: GtDispatchBoolean
@@ -500,7 +573,7 @@ class Scada2(ScadaInterface, Proactor):
                 self.stop()
 
         def _run_forever():
-            asyncio.run(_async_run_forever())
+            run_event_loop(_async_run_forever(), self.settings.event_loop)
         thread = threading.Thread(target=_run_forever, daemon=daemon)
         thread.start()
         return thread
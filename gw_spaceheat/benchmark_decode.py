@@ -0,0 +1,195 @@
+"""Measure decoding of received MQTT messages.
+
+Each mode decodes the same mix of wire encoded messages, as received by a scada, --num-messages times:
+  codec    MQTTCodec.decode(), as used when mqtt_full_validation is set
+  topic    TopicDecoder, routing by the message type in the topic and validating the envelope
+  trusted  TopicDecoder for a trusted client, constructing the envelope without validation
+
+Results are printed as a table and, with --json, written as JSON so that runs can be compared.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from dataclasses import asdict
+from dataclasses import dataclass
+from typing import Any
+from typing import Callable
+from typing import Optional
+from typing import Sequence
+
+from gwproto import Decoders
+from gwproto import MQTTCodec
+from gwproto.enums import TelemetryName
+from gwproto.messages import Ack
+from gwproto.messages import GtDispatchBoolean_Maker
+from gwproto.messages import GtDriverBooleanactuatorCmd_Maker
+from gwproto.messages import GtShCliAtnCmd_Maker
+from gwproto.messages import GtShTelemetryFromMultipurposeSensor_Maker
+from gwproto.messages import GtTelemetry_Maker
+from gwproto.messages import MQTTConnectEvent
+from gwproto.messages import PingMessage
+from gwproto.messages import ProblemEvent
+from gwproto.messages import Problems
+from rich import print
+from rich.table import Table
+
+from actors2.scada2 import ScadaMessageDecoder
+from proactor.message import Message
+from proactor.topic_decoder import TopicDecoder
+
+MODES = ["codec", "topic", "trusted"]
+SRC = "dw1.isone.me.freedom.apple.scada"
+
+
+class BenchmarkCodec(MQTTCodec):
+    def __init__(self):
+        super().__init__(
+            Decoders.from_objects(
+                [
+                    GtDispatchBoolean_Maker,
+                    GtShCliAtnCmd_Maker,
+                    GtDriverBooleanactuatorCmd_Maker,
+                    GtShTelemetryFromMultipurposeSensor_Maker,
+                    GtTelemetry_Maker,
+                ],
+                message_payload_discriminator=ScadaMessageDecoder,
+            )
+        )
+
+    def validate_source_alias(self, source_alias: str):
+        if source_alias != SRC:
+            raise ValueError(f"alias {source_alias} is not {SRC}")
+
+
+@dataclass
+class BenchmarkResult:
+    mode: str
+    num_messages: int
+    seconds: float
+    messages_per_second: float
+    us_per_message: float
+
+
+def wire_messages() -> list[tuple[str, bytes]]:
+    telemetry = GtTelemetry_Maker(
+        scada_read_time_unix_ms=int(time.time() * 1000),
+        value=63000,
+        name=TelemetryName.WATER_TEMP_C_TIMES1000,
+        exponent=3,
+    ).tuple
+    messages = [
+        Message(Src=SRC, Payload=telemetry.asdict()),
+        Message(Src=SRC, Payload=Ack(AckMessageID="6c9b1d1c-0a0c-4fd8-bd2b-2a2a9a0c3b11")),
+        PingMessage(Src=SRC),
+        Message(Src=SRC, Payload=MQTTConnectEvent(PeerName="gridworks"), AckRequired=True),
+        Message(
+            Src=SRC,
+            Payload=ProblemEvent(ProblemType=Problems.warning, Summary="decode benchmark", Details="x" * 200),
+            AckRequired=True,
+        ),
+    ]
+    return [(message.mqtt_topic(), message.json().encode()) for message in messages]
+
+
+def decoder_for(mode: str) -> Callable[[str, bytes], Any]:
+    codec = BenchmarkCodec()
+    if mode == "codec":
+        return codec.decode
+    return TopicDecoder(codec, trusted=mode == "trusted").decode
+
+
+def run_mode(mode: str, wire: list[tuple[str, bytes]], num_messages: int) -> BenchmarkResult:
+    decode = decoder_for(mode)
+    for topic, payload in wire:
+        decode(topic, payload)
+    num_rounds = max(1, num_messages // len(wire))
+    start = time.perf_counter()
+    for _ in range(num_rounds):
+        for topic, payload in wire:
+            decode(topic, payload)
+    seconds = time.perf_counter() - start
+    decoded = num_rounds * len(wire)
+    return BenchmarkResult(
+        mode=mode,
+        num_messages=decoded,
+        seconds=seconds,
+        messages_per_second=decoded / seconds,
+        us_per_message=seconds * 1_000_000 / decoded,
+    )
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "-n",
+        "--num-messages",
+        type=int,
+        default=50_000,
+        help="Number of messages decoded in each mode",
+    )
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        choices=MODES,
+        default=MODES,
+        help="Modes to measure",
+    )
+    parser.add_argument(
+        "--json",
+        default=None,
+        help="Write results as JSON to this path, or to stdout if '-'",
+    )
+    return parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+
+def print_table(results: list[BenchmarkResult]) -> None:
+    table = Table(title="MQTT decode")
+    for column in ["mode", "messages", "seconds", "messages/s", "us/message", "speedup"]:
+        table.add_column(column, justify="left" if column == "mode" else "right")
+    baseline = next((result for result in results if result.mode == "codec"), results[0])
+    for result in results:
+        table.add_row(
+            result.mode,
+            str(result.num_messages),
+            f"{result.seconds:.3f}",
+            f"{result.messages_per_second:.0f}",
+            f"{result.us_per_message:.1f}",
+            f"{baseline.us_per_message / result.us_per_message:.2f}x",
+        )
+    print(table)
+
+
+def write_json(args: argparse.Namespace, results: list[BenchmarkResult]) -> None:
+    output = dict(
+        metadata=dict(
+            time=time.time(),
+            python=platform.python_version(),
+            platform=platform.platform(),
+            num_messages=args.num_messages,
+        ),
+        results=[asdict(result) for result in results],
+    )
+    if args.json == "-":
+        sys.stdout.write(json.dumps(output, indent=2) + "\n")
+    else:
+        with open(args.json, "w") as f:
+            json.dump(output, f, indent=2)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    args = parse_args(argv)
+    wire = wire_messages()
+    results = [run_mode(mode, wire, args.num_messages) for mode in args.modes]
+    if args.json != "-":
+        print_table(results)
+    if args.json is not None:
+        write_json(args, results)
+
+
+if __name__ == "__main__":
+    main()
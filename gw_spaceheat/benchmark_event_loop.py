@@ -0,0 +1,242 @@
+"""Compare event loop implementations on a synthetic scada load.
+
+For each event loop implementation installed, a ReceiveQueue is fed as the Proactor's is in a scada:
+  - --telemetry-threads threads each write --num-messages GtTelemetry messages through an AsyncQueueWriter, as
+    sync thread actors and the MQTT client threads do, as fast as they can;
+  - a power meter thread writes a GsPwr message every --power-seconds through another AsyncQueueWriter;
+  - --num-timers tasks on the loop each wake every --timer-seconds, as the Proactor's periodic tasks do.
+A single reader takes messages from the queue and handles them by encoding their payloads; GsPwr messages are
+'forwarded' by encoding them as a whole.
+
+Reported per implementation: messages handled per second and the latency of GsPwr forwarding, from the write of the
+GsPwr message by the power meter thread until it was forwarded. Results are printed as a table and, with --json,
+written as JSON so that runs can be compared.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import threading
+import time
+from dataclasses import asdict
+from dataclasses import dataclass
+from typing import Any
+from typing import Optional
+from typing import Sequence
+
+from gwproto.enums import TelemetryName
+from gwproto.messages import GsPwr
+from gwproto.messages import GsPwr_Maker
+from gwproto.messages import GtTelemetry_Maker
+from rich import print
+from rich.table import Table
+
+from proactor.config import EventLoopImplementation
+from proactor.event_loop import available_event_loops
+from proactor.event_loop import event_loop_implementation
+from proactor.event_loop import run_event_loop
+from proactor.message import Message
+from proactor.receive_queue import ReceiveLane
+from proactor.receive_queue import ReceiveQueue
+from proactor.stats import LatencyHistogram
+from proactor.sync_thread import AsyncQueueWriter
+
+SRC = "a.s"
+
+
+@dataclass
+class BenchmarkResult:
+    event_loop: str
+    num_messages: int
+    num_power: int
+    seconds: float
+    messages_per_second: float
+    power_mean: float
+    power_p50: float
+    power_p99: float
+    power_max: float
+
+
+def receive_lane(message: Message) -> ReceiveLane:
+    if isinstance(message.Payload, GsPwr):
+        return ReceiveLane.power
+    return ReceiveLane.telemetry
+
+
+def telemetry_messages(num_messages: int) -> list[Message]:
+    return [
+        Message(
+            Src=SRC,
+            Payload=GtTelemetry_Maker(
+                scada_read_time_unix_ms=int(time.time() * 1000),
+                value=i,
+                name=TelemetryName.WATER_TEMP_C_TIMES1000,
+                exponent=3,
+            ).tuple,
+        )
+        for i in range(num_messages)
+    ]
+
+
+async def run_load(args: argparse.Namespace) -> BenchmarkResult:
+    loop = asyncio.get_running_loop()
+    queue = ReceiveQueue(receive_lane)
+    writers = [AsyncQueueWriter() for _ in range(args.telemetry_threads + 1)]
+    for writer in writers:
+        writer.set_async_loop(loop, queue)
+    messages = [telemetry_messages(args.num_messages) for _ in range(args.telemetry_threads)]
+    power_message = Message(Src=SRC, Payload=GsPwr_Maker(power=3500).tuple)
+    power_latency = LatencyHistogram()
+    running = True
+
+    def write_telemetry(writer: AsyncQueueWriter, thread_messages: list[Message]) -> None:
+        for message in thread_messages:
+            writer.put(message)
+
+    def write_power(writer: AsyncQueueWriter) -> None:
+        while running:
+            writer.put(power_message)
+            time.sleep(args.power_seconds)
+
+    async def timer() -> None:
+        while True:
+            await asyncio.sleep(args.timer_seconds)
+
+    timers = [asyncio.create_task(timer()) for _ in range(args.num_timers)]
+    threads = [
+        threading.Thread(target=write_telemetry, args=(writer, thread_messages), daemon=True)
+        for writer, thread_messages in zip(writers, messages)
+    ]
+    power_thread = threading.Thread(target=write_power, args=(writers[-1],), daemon=True)
+    num_telemetry = args.telemetry_threads * args.num_messages
+    handled = 0
+    start = time.perf_counter()
+    power_thread.start()
+    for thread in threads:
+        thread.start()
+    while handled < num_telemetry:
+        message = await queue.get()
+        if isinstance(message.Payload, GsPwr):
+            message.json()
+            power_latency.add(time.monotonic() - queue.last_created)
+        else:
+            handled += 1
+            json.dumps(message.Payload.asdict())
+    seconds = time.perf_counter() - start
+    running = False
+    power_thread.join()
+    for thread in threads:
+        thread.join()
+    for task in timers:
+        task.cancel()
+    await asyncio.gather(*timers, return_exceptions=True)
+    return BenchmarkResult(
+        event_loop=event_loop_implementation(loop).value,
+        num_messages=num_telemetry + power_latency.count,
+        num_power=power_latency.count,
+        seconds=seconds,
+        messages_per_second=(num_telemetry + power_latency.count) / seconds,
+        power_mean=power_latency.mean,
+        power_p50=power_latency.percentile(0.5),
+        power_p99=power_latency.percentile(0.99),
+        power_max=power_latency.max,
+    )
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--event-loops",
+        nargs="+",
+        choices=[implementation.value for implementation in EventLoopImplementation],
+        default=None,
+        help="Event loop implementations to measure. Defaults to those installed.",
+    )
+    parser.add_argument(
+        "-n",
+        "--num-messages",
+        type=int,
+        default=50_000,
+        help="Number of telemetry messages written by each telemetry thread",
+    )
+    parser.add_argument("--telemetry-threads", type=int, default=4, help="Number of telemetry writing threads")
+    parser.add_argument("--power-seconds", type=float, default=0.005, help="Seconds between GsPwr messages")
+    parser.add_argument("--num-timers", type=int, default=16, help="Number of periodic tasks on the loop")
+    parser.add_argument("--timer-seconds", type=float, default=0.01, help="Period of the periodic tasks")
+    parser.add_argument(
+        "--json",
+        default=None,
+        help="Write results as JSON to this path, or to stdout if '-'",
+    )
+    return parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+
+def print_table(results: list[BenchmarkResult]) -> None:
+    table = Table(title="Event loops")
+    for column in [
+        "event loop", "messages", "seconds", "messages/s", "GsPwr", "GsPwr mean", "GsPwr p50", "GsPwr p99", "GsPwr max"
+    ]:
+        table.add_column(column, justify="left" if column == "event loop" else "right")
+    for result in results:
+        table.add_row(
+            result.event_loop,
+            str(result.num_messages),
+            f"{result.seconds:.3f}",
+            f"{result.messages_per_second:.0f}",
+            str(result.num_power),
+            f"{result.power_mean * 1000:.2f} ms",
+            f"{result.power_p50 * 1000:.2f} ms",
+            f"{result.power_p99 * 1000:.2f} ms",
+            f"{result.power_max * 1000:.2f} ms",
+        )
+    print(table)
+
+
+def write_json(args: argparse.Namespace, results: list[BenchmarkResult]) -> None:
+    output: dict[str, Any] = dict(
+        metadata=dict(
+            time=time.time(),
+            python=platform.python_version(),
+            platform=platform.platform(),
+            num_messages=args.num_messages,
+            telemetry_threads=args.telemetry_threads,
+            power_seconds=args.power_seconds,
+            num_timers=args.num_timers,
+            timer_seconds=args.timer_seconds,
+        ),
+        results=[asdict(result) for result in results],
+    )
+    if args.json == "-":
+        sys.stdout.write(json.dumps(output, indent=2) + "\n")
+    else:
+        with open(args.json, "w") as f:
+            json.dump(output, f, indent=2)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    args = parse_args(argv)
+    if args.event_loops is None:
+        implementations = available_event_loops()
+    else:
+        implementations = [EventLoopImplementation(value) for value in args.event_loops]
+    results = []
+    for implementation in implementations:
+        result = run_event_loop(run_load(args), implementation)
+        if result.event_loop != implementation.value:
+            print(
+                f"[yellow]{implementation.value} is not installed; measured {result.event_loop} instead",
+                file=sys.stderr,
+            )
+        results.append(result)
+    if args.json != "-":
+        print_table(results)
+    if args.json is not None:
+        write_json(args, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,453 @@
+"""Measure event persister performance.
+
+Each scenario runs against each selected backend in each directory given by --dir. Pass a tmpfs directory (such as
+/dev/shm) and a directory on the target disk to separate the cost of the persister from the cost of the storage.
+
+Scenarios:
+  persist   persisting --num-events events and flushing them
+  clear     clearing --num-events persisted events and flushing
+  retrieve  latency of retrieving persisted events, in random order
+  reindex   opening (and then re-indexing) a persister holding each of --reindex-sizes events
+  trim      persisting --num-events events into a persister already at max_bytes, so that each persist trims
+
+Events are the wire encoding of a mix of gwproto events as they are persisted by a running scada, unless
+--event-bytes is given. Results are printed as a table and, with --json, written as JSON so that runs can be
+compared.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+from typing import Optional
+from typing import Sequence
+
+import pendulum
+from gwproto.enums import TelemetryName
+from gwproto.messages import MQTTConnectEvent
+from gwproto.messages import ProblemEvent
+from gwproto.messages import Problems
+from gwproto.messages import SnapshotSpaceheatEvent
+from gwproto.messages import SnapshotSpaceheat_Maker
+from gwproto.messages import TelemetrySnapshotSpaceheat_Maker
+from rich import print
+from rich.table import Table
+
+from proactor.config import DEFAULT_RETENTION_CLASSES
+from proactor.config import PersisterBackend
+from proactor.config import PersisterDurability
+from proactor.config import PersisterEncoding
+from proactor.config import PersisterSettings
+from proactor.event_encoding import EventCodec
+from proactor.event_encoding import wire_event
+from proactor.persister import PersisterInterface
+from proactor.persister import make_persister
+
+SCENARIOS = ["persist", "clear", "retrieve", "reindex", "trim"]
+SRC = "dw1.isone.me.freedom.apple.scada"
+
+
+@dataclass
+class BenchmarkResult:
+    scenario: str
+    backend: str
+    durability: str
+    dir: str
+    filesystem: str
+    num_events: int
+    event_bytes: float
+    seconds: float
+    events_per_second: float
+    mb_per_second: float
+    p50_us: Optional[float] = None
+    p99_us: Optional[float] = None
+
+    @classmethod
+    def from_timing(
+        cls,
+        scenario: str,
+        settings: PersisterSettings,
+        base_dir: Path,
+        contents: Sequence[bytes],
+        seconds: float,
+        latencies: Optional[list[float]] = None,
+    ) -> "BenchmarkResult":
+        num_bytes = sum(len(content) for content in contents)
+        result = BenchmarkResult(
+            scenario=scenario,
+            backend=settings.backend.value,
+            durability=settings.durability.value,
+            # base_dir is <--dir>/<temporary directory>/<run>
+            dir=str(base_dir.parent.parent),
+            filesystem=filesystem_type(base_dir),
+            num_events=len(contents),
+            event_bytes=num_bytes / max(1, len(contents)),
+            seconds=seconds,
+            events_per_second=len(contents) / seconds if seconds else 0.0,
+            mb_per_second=num_bytes / seconds / 1024 / 1024 if seconds else 0.0,
+        )
+        if latencies:
+            latencies = sorted(latencies)
+            result.p50_us = statistics.median(latencies) * 1_000_000
+            result.p99_us = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1_000_000
+        return result
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "-d",
+        "--dir",
+        nargs="+",
+        default=["."],
+        help="Directories on the filesystems to measure, created if missing, to hold temporary event directories.",
+    )
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        default=SCENARIOS,
+        choices=SCENARIOS,
+        help="Scenarios to run.",
+    )
+    parser.add_argument(
+        "-n",
+        "--num-events",
+        type=int,
+        default=1000,
+        help="Number of events persisted, cleared, retrieved or trimmed per run.",
+    )
+    parser.add_argument(
+        "--reindex-sizes",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 100000],
+        help="Numbers of persisted events for which re-indexing is measured.",
+    )
+    parser.add_argument(
+        "-s",
+        "--event-bytes",
+        type=int,
+        default=None,
+        help="Size of each persisted event. By default, persist a mix of encoded gwproto events.",
+    )
+    parser.add_argument(
+        "--encoding",
+        default=PersisterEncoding.json.value,
+        choices=[encoding.value for encoding in PersisterEncoding],
+        help="Encoding of the gwproto events.",
+    )
+    parser.add_argument(
+        "-b",
+        "--backends",
+        nargs="+",
+        default=[backend.value for backend in PersisterBackend],
+        choices=[backend.value for backend in PersisterBackend],
+        help="Persister backends to measure.",
+    )
+    parser.add_argument(
+        "--durability",
+        nargs="+",
+        default=[PersisterDurability.none.value],
+        choices=[durability.value for durability in PersisterDurability],
+        help="Durability modes in which persist, clear and trim are measured.",
+    )
+    parser.add_argument(
+        "--sync-interval-ms",
+        type=int,
+        default=PersisterSettings().sync_interval_ms,
+        help="sync_interval_ms of the periodic durability mode.",
+    )
+    parser.add_argument(
+        "--sync-max-events",
+        type=int,
+        default=PersisterSettings().sync_max_events,
+        help="sync_max_events of the periodic durability mode.",
+    )
+    parser.add_argument(
+        "--writer-thread",
+        action="store_true",
+        help="Persist through the writer thread, measuring the time until all events are flushed.",
+    )
+    parser.add_argument(
+        "--retention",
+        action="store_true",
+        help="Persist through the default retention classes.",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Seed of the random order in which events are retrieved.",
+    )
+    parser.add_argument(
+        "--json",
+        default=None,
+        help="File to which results are written as JSON, or '-' for stdout.",
+    )
+    return parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+
+def filesystem_type(path: Path) -> str:
+    """Return the type of the filesystem containing path, from /proc/mounts, or "" if it is not known."""
+    path = path.resolve()
+    fs_type = ""
+    mount_len = -1
+    try:
+        with open("/proc/mounts") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount_point = Path(fields[1].replace("\\040", " "))
+                if (path == mount_point or mount_point in path.parents) and len(str(mount_point)) > mount_len:
+                    fs_type = fields[2]
+                    mount_len = len(str(mount_point))
+    except OSError:
+        pass
+    return fs_type
+
+
+def sample_contents(event_bytes: Optional[int], encoding: PersisterEncoding) -> list[bytes]:
+    """Return the persisted content of events like those generated by a running scada: mostly snapshots, with
+    communication events and the occasional problem."""
+    if event_bytes is not None:
+        return [b"." * event_bytes]
+    snapshot = SnapshotSpaceheat_Maker(
+        from_g_node_alias=SRC,
+        from_g_node_instance_id="98542a17-3180-4f2a-a929-6023f0e7a106",
+        snapshot=TelemetrySnapshotSpaceheat_Maker(
+            about_node_alias_list=[f"a.tank.temp{i}" for i in range(12)],
+            value_list=[random.randint(20000, 70000) for _ in range(12)],
+            telemetry_name_list=[TelemetryName.WATER_TEMP_C_TIMES1000] * 12,
+            report_time_unix_ms=int(time.time() * 1000),
+        ).tuple,
+    ).tuple
+    events = [
+        SnapshotSpaceheatEvent(Src=SRC, snap=snapshot),
+        SnapshotSpaceheatEvent(Src=SRC, snap=snapshot),
+        SnapshotSpaceheatEvent(Src=SRC, snap=snapshot),
+        MQTTConnectEvent(Src=SRC, PeerName="gridworks"),
+        ProblemEvent(
+            Src=SRC,
+            ProblemType=Problems.warning,
+            Summary="Sensor read failed",
+            Details="Traceback (most recent call last):\n" + "  File ...\n" * 20,
+        ),
+    ]
+    codec = EventCodec(encoding=encoding)
+    return [codec.encode(*wire_event(event, SRC)).content for event in events]
+
+
+def event_contents(samples: Sequence[bytes], num_events: int) -> list[bytes]:
+    return [samples[i % len(samples)] for i in range(num_events)]
+
+
+def fill(persister: PersisterInterface, contents: Sequence[bytes], first_uid: int = 0) -> list[str]:
+    uids = [f"{first_uid + i:09d}" for i in range(len(contents))]
+    for uid, content in zip(uids, contents):
+        persister.persist(uid, content).unwrap()
+    persister.flush().unwrap()
+    return uids
+
+
+def run_persist(settings: PersisterSettings, base_dir: Path, contents: Sequence[bytes]) -> BenchmarkResult:
+    persister = make_persister(settings, base_dir)
+    try:
+        start = time.perf_counter()
+        fill(persister, contents)
+        seconds = time.perf_counter() - start
+    finally:
+        persister.close()
+    return BenchmarkResult.from_timing("persist", settings, base_dir, contents, seconds)
+
+
+def run_clear(settings: PersisterSettings, base_dir: Path, contents: Sequence[bytes]) -> BenchmarkResult:
+    persister = make_persister(settings, base_dir)
+    try:
+        uids = fill(persister, contents)
+        start = time.perf_counter()
+        for uid in uids:
+            persister.clear(uid).unwrap()
+        persister.flush().unwrap()
+        seconds = time.perf_counter() - start
+    finally:
+        persister.close()
+    return BenchmarkResult.from_timing("clear", settings, base_dir, contents, seconds)
+
+
+def run_retrieve(
+    settings: PersisterSettings,
+    base_dir: Path,
+    contents: Sequence[bytes],
+    seed: int,
+) -> BenchmarkResult:
+    persister = make_persister(settings, base_dir)
+    try:
+        uids = fill(persister, contents)
+        random.Random(seed).shuffle(uids)
+        latencies = []
+        start = time.perf_counter()
+        for uid in uids:
+            retrieve_start = time.perf_counter()
+            persister.retrieve(uid).unwrap()
+            latencies.append(time.perf_counter() - retrieve_start)
+        seconds = time.perf_counter() - start
+    finally:
+        persister.close()
+    return BenchmarkResult.from_timing("retrieve", settings, base_dir, contents, seconds, latencies)
+
+
+def run_reindex(settings: PersisterSettings, base_dir: Path, contents: Sequence[bytes]) -> list[BenchmarkResult]:
+    persister = make_persister(settings, base_dir)
+    try:
+        fill(persister, contents)
+    finally:
+        persister.close()
+    start = time.perf_counter()
+    persister = make_persister(settings, base_dir)
+    open_seconds = time.perf_counter() - start
+    try:
+        start = time.perf_counter()
+        persister.reindex().unwrap()
+        reindex_seconds = time.perf_counter() - start
+    finally:
+        persister.close()
+    return [
+        BenchmarkResult.from_timing("open", settings, base_dir, contents, open_seconds),
+        BenchmarkResult.from_timing("reindex", settings, base_dir, contents, reindex_seconds),
+    ]
+
+
+def run_trim(settings: PersisterSettings, base_dir: Path, contents: Sequence[bytes]) -> BenchmarkResult:
+    settings = settings.copy(update=dict(max_bytes=sum(len(content) for content in contents)))
+    persister = make_persister(settings, base_dir)
+    try:
+        fill(persister, contents)
+        start = time.perf_counter()
+        fill(persister, contents, first_uid=len(contents))
+        seconds = time.perf_counter() - start
+    finally:
+        persister.close()
+    return BenchmarkResult.from_timing("trim", settings, base_dir, contents, seconds)
+
+
+def run_backend(
+    args: argparse.Namespace,
+    backend: str,
+    samples: list[bytes],
+    contents: list[bytes],
+    base_dir: Callable[[], Path],
+) -> list[BenchmarkResult]:
+    results = []
+    base_settings = PersisterSettings(
+        backend=backend,
+        sync_interval_ms=args.sync_interval_ms,
+        sync_max_events=args.sync_max_events,
+        writer_thread=args.writer_thread,
+        retention_classes=DEFAULT_RETENTION_CLASSES if args.retention else [],
+    )
+    for durability in args.durability:
+        settings = base_settings.copy(update=dict(durability=PersisterDurability(durability)))
+        if "persist" in args.scenarios:
+            results.append(run_persist(settings, base_dir(), contents))
+        if "clear" in args.scenarios:
+            results.append(run_clear(settings, base_dir(), contents))
+        if "trim" in args.scenarios:
+            results.append(run_trim(settings, base_dir(), contents))
+    if "retrieve" in args.scenarios:
+        results.append(run_retrieve(base_settings, base_dir(), contents, args.seed))
+    if "reindex" in args.scenarios:
+        for num_events in args.reindex_sizes:
+            results.extend(run_reindex(base_settings, base_dir(), event_contents(samples, num_events)))
+    return results
+
+
+def run(args: argparse.Namespace) -> list[BenchmarkResult]:
+    results = []
+    samples = sample_contents(args.event_bytes, PersisterEncoding(args.encoding))
+    contents = event_contents(samples, args.num_events)
+    for dir_name in args.dir:
+        Path(dir_name).mkdir(parents=True, exist_ok=True)
+        tmp_dir = Path(tempfile.mkdtemp(prefix="benchmark_persister_", dir=dir_name))
+        try:
+            run_num = 0
+            for backend in args.backends:
+
+                def base_dir() -> Path:
+                    nonlocal run_num
+                    run_num += 1
+                    path = tmp_dir / f"{run_num:03d}-{backend}"
+                    path.mkdir(parents=True)
+                    return path
+
+                results.extend(run_backend(args, backend, samples, contents, base_dir))
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    return results
+
+
+def write_json(args: argparse.Namespace, results: list[BenchmarkResult]) -> None:
+    report = dict(
+        time=pendulum.now("utc").isoformat(),
+        host=platform.node(),
+        python=platform.python_version(),
+        cpu_count=os.cpu_count(),
+        args=vars(args),
+        results=[asdict(result) for result in results],
+    )
+    if args.json == "-":
+        sys.stdout.write(json.dumps(report, indent=2) + "\n")
+    else:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+def print_table(results: list[BenchmarkResult]) -> None:
+    table = Table(title="Persister benchmark")
+    columns = [
+        "Scenario", "Backend", "Durability", "Filesystem", "Events", "Bytes/event",
+        "Seconds", "Events/s", "MB/s", "p50 µs", "p99 µs",
+    ]
+    for column in columns:
+        table.add_column(column, justify="left" if column in columns[:4] else "right")
+    for result in results:
+        table.add_row(
+            result.scenario,
+            result.backend,
+            result.durability,
+            result.filesystem,
+            str(result.num_events),
+            f"{result.event_bytes:.0f}",
+            f"{result.seconds:.3f}",
+            f"{result.events_per_second:.0f}",
+            f"{result.mb_per_second:.2f}",
+            "" if result.p50_us is None else f"{result.p50_us:.1f}",
+            "" if result.p99_us is None else f"{result.p99_us:.1f}",
+        )
+    print(table)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    args = parse_args(argv)
+    results = run(args)
+    if args.json != "-":
+        print_table(results)
+    if args.json is not None:
+        write_json(args, results)
+
+
+if __name__ == "__main__":
+    main()
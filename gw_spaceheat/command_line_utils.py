@@ -16,6 +16,8 @@ from actors2 import Scada2
 from actors2.config import ScadaSettings
 from data_classes.hardware_layout import HardwareLayout
 from data_classes.sh_node import ShNode
+from proactor.config import EventLoopImplementation
+from proactor.event_loop import run_event_loop
 from schema.enums import Role
 
 LOGGING_FORMAT = "%(asctime)s %(message)s"
@@ -42,6 +44,16 @@ def add_default_args(
         help="Seconds per status report"
     )
 
+    parser.add_argument(
+        "--event-loop",
+        default=None,
+        choices=[implementation.value for implementation in EventLoopImplementation],
+        help=(
+            "Event loop implementation. Overrides the event_loop setting. Falls back to asyncio if the "
+            "implementation is not installed."
+        ),
+    )
+
     parser.add_argument(
         "-n",
         "--nodes",
@@ -107,6 +119,13 @@ def run_nodes_main(
     run_nodes(args.nodes, settings, load_house.load_all(settings), dbg=dbg)
 
 
+def event_loop_args(args: argparse.Namespace) -> dict[str, EventLoopImplementation]:
+    """Settings arguments overriding the event_loop setting from the command line, if --event-loop was passed."""
+    if getattr(args, "event_loop", None) is None:
+        return dict()
+    return dict(event_loop=EventLoopImplementation(args.event_loop))
+
+
 def get_requested_aliases(args: argparse.Namespace) -> Optional[set[str]]:
     if args.nodes is None:
         requested = None
@@ -149,10 +168,15 @@ def get_scada(
     run_in_thread: bool = False,
     add_screen_handler: bool = True,
     actors_package_name: str = Scada2.DEFAULT_ACTORS_MODULE,
+    args: Optional[argparse.Namespace] = None,
+    settings: Optional[ScadaSettings] = None,
 ) -> Scada2:
-    args = parse_args(argv)
+    """Construct the scada from argv, or from args and settings if they were already made from it."""
+    if args is None:
+        args = parse_args(argv)
     dotenv_file = dotenv.find_dotenv(args.env_file)
-    settings = ScadaSettings(_env_file=dotenv_file)
+    if settings is None:
+        settings = ScadaSettings(_env_file=dotenv_file, **event_loop_args(args))
     settings.paths.mkdirs()
     setup_logging(args, settings, add_screen_handler=add_screen_handler)
     logger = logging.getLogger(settings.logging.qualified_logger_names()["lifecycle"])
@@ -171,10 +195,14 @@ def get_scada(
     return scada
 
 
-async def run_async_actors_main(argv: Optional[Sequence[str]] = None):
-    exception_logger = logging.getLogger(ScadaSettings().logging.base_log_name)
+async def run_async_actors_main(
+    argv: Optional[Sequence[str]] = None,
+    args: Optional[argparse.Namespace] = None,
+    settings: Optional[ScadaSettings] = None,
+):
+    exception_logger = logging.getLogger((ScadaSettings() if settings is None else settings).logging.base_log_name)
     try:
-        scada = get_scada(argv)
+        scada = get_scada(argv, args=args, settings=settings)
         exception_logger = scada.logger
         try:
             await scada.run_forever()
@@ -191,3 +219,10 @@ async def run_async_actors_main(argv: Optional[Sequence[str]] = None):
         except:
             traceback.print_exception(e)
         raise e
+
+
+def run_async_actors(argv: Optional[Sequence[str]] = None) -> None:
+    """Run run_async_actors_main() on the event loop selected by --event-loop or by the event_loop setting."""
+    args = parse_args(argv)
+    settings = ScadaSettings(_env_file=dotenv.find_dotenv(args.env_file), **event_loop_args(args))
+    run_event_loop(run_async_actors_main(args=args, settings=settings), settings.event_loop)
@@ -0,0 +1,76 @@
+"""Thinning of events generated while the upstream link is not active.
+
+EventCoalescer only decides which events are persisted; the Proactor consults it for each event generated while the
+upstream link is not active, and resets it when the link is active again.
+"""
+import fnmatch
+from dataclasses import dataclass
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+
+from proactor.config.persister import CoalescingPolicy
+
+
+class Coalesced(NamedTuple):
+    persist: bool = True
+    replaces: Optional[str] = None
+
+
+@dataclass
+class _PolicyState:
+    num_events: int = 0
+    window: Optional[int] = None
+    latest_uid: Optional[str] = None
+
+
+class EventCoalescer:
+    NS_PER_SECOND: int = 1_000_000_000
+
+    _policies: list[CoalescingPolicy]
+    _policy_by_type_name: dict[str, Optional[int]]
+    _states: dict[int, _PolicyState]
+
+    def __init__(self, policies: Sequence[CoalescingPolicy] = ()):
+        self._policies = list(policies)
+        self._policy_by_type_name = dict()
+        self._states = dict()
+
+    def __bool__(self) -> bool:
+        return bool(self._policies)
+
+    def policy(self, type_name: str) -> Optional[CoalescingPolicy]:
+        policy_idx = self._policy_idx(type_name)
+        return None if policy_idx is None else self._policies[policy_idx]
+
+    def _policy_idx(self, type_name: str) -> Optional[int]:
+        if type_name not in self._policy_by_type_name:
+            self._policy_by_type_name[type_name] = next(
+                (
+                    policy_idx for policy_idx, policy in enumerate(self._policies)
+                    if any(fnmatch.fnmatchcase(type_name, pattern) for pattern in policy.type_names)
+                ),
+                None,
+            )
+        return self._policy_by_type_name[type_name]
+
+    def coalesce(self, uid: str, type_name: str, time_ns: int) -> Coalesced:
+        """Decide whether the event uid, of type_name and generated at time_ns, is persisted and which previously
+        persisted event, if any, it replaces."""
+        policy_idx = self._policy_idx(type_name)
+        if policy_idx is None:
+            return Coalesced()
+        policy = self._policies[policy_idx]
+        state = self._states.setdefault(policy_idx, _PolicyState())
+        state.num_events += 1
+        if policy.window_seconds > 0:
+            window = int(time_ns // (policy.window_seconds * self.NS_PER_SECOND))
+            replaces = state.latest_uid if window == state.window else None
+            state.window = window
+            state.latest_uid = uid
+            return Coalesced(replaces=replaces)
+        return Coalesced(persist=(state.num_events - 1) % max(1, policy.keep_every) == 0)
+
+    def reset(self) -> None:
+        """Forget the events seen so far, as when the upstream link is active again."""
+        self._states.clear()
@@ -8,6 +8,10 @@ from proactor.config.logging import FormatterSettings
 from proactor.config.logging import LoggerLevels
 from proactor.config.logging import LoggingSettings
 from proactor.config.logging import RotatingFileHandlerSettings
+from proactor.config.loop_lag import DEFAULT_LOOP_LAG_REPORT_INTERVAL_SECONDS
+from proactor.config.loop_lag import DEFAULT_LOOP_LAG_SAMPLE_SECONDS
+from proactor.config.loop_lag import DEFAULT_LOOP_LAG_THRESHOLD_SECONDS
+from proactor.config.loop_lag import LoopLagSettings
 from proactor.config.mqtt import MQTTClient
 from proactor.config.paths import DEFAULT_BASE_DIR
 from proactor.config.paths import DEFAULT_BASE_NAME
@@ -15,7 +19,32 @@ from proactor.config.paths import DEFAULT_LAYOUT_FILE
 from proactor.config.paths import DEFAULT_NAME
 from proactor.config.paths import DEFAULT_NAME_DIR
 from proactor.config.paths import Paths
+from proactor.config.persister import CoalescingPolicy
+from proactor.config.persister import DEFAULT_MAX_EVENT_BYTES
+from proactor.config.persister import DEFAULT_MAX_SEGMENT_BYTES
+from proactor.config.persister import DEFAULT_RETENTION_CLASSES
+from proactor.config.persister import DEFAULT_SYNC_INTERVAL_MS
+from proactor.config.persister import DEFAULT_SYNC_MAX_EVENTS
+from proactor.config.persister import DEFAULT_WRITER_GROUP_SIZE
+from proactor.config.persister import DEFAULT_WRITER_QUEUE_SIZE
+from proactor.config.persister import PersisterBackend
+from proactor.config.persister import PersisterDurability
+from proactor.config.persister import PersisterEncoding
+from proactor.config.persister import PersisterSettings
+from proactor.config.persister import RetentionClass
+from proactor.config.proactor_settings import EventLoopImplementation
 from proactor.config.proactor_settings import ProactorSettings
+from proactor.config.receive_queue import DEFAULT_RECEIVE_BLOCK_TIMEOUT_SECONDS
+from proactor.config.receive_queue import DEFAULT_RECEIVE_HIGH_WATER_FRACTION
+from proactor.config.receive_queue import OverflowPolicy
+from proactor.config.receive_queue import ReceiveLaneSettings
+from proactor.config.receive_queue import ReceiveQueueSettings
+from proactor.config.upload import DEFAULT_UPLOAD_BATCH_MAX_BYTES
+from proactor.config.upload import DEFAULT_UPLOAD_INITIAL_WINDOW
+from proactor.config.upload import DEFAULT_UPLOAD_MAX_WINDOW
+from proactor.config.upload import DEFAULT_UPLOAD_READ_AHEAD_EVENTS
+from proactor.config.upload import DEFAULT_UPLOAD_TARGET_ACK_SECONDS
+from proactor.config.upload import UploadSettings
 
 DEFAULT_ENV_FILE = ".env"
 
@@ -31,6 +60,12 @@ __all__ = [
     "LoggingSettings",
     "RotatingFileHandlerSettings",
 
+    # loop lag
+    "DEFAULT_LOOP_LAG_REPORT_INTERVAL_SECONDS",
+    "DEFAULT_LOOP_LAG_SAMPLE_SECONDS",
+    "DEFAULT_LOOP_LAG_THRESHOLD_SECONDS",
+    "LoopLagSettings",
+
     # mqtt
     "MQTTClient",
 
@@ -43,8 +78,39 @@ __all__ = [
     "DEFAULT_LAYOUT_FILE",
     "Paths",
 
+    # persister
+    "CoalescingPolicy",
+    "DEFAULT_MAX_EVENT_BYTES",
+    "DEFAULT_MAX_SEGMENT_BYTES",
+    "DEFAULT_RETENTION_CLASSES",
+    "DEFAULT_SYNC_INTERVAL_MS",
+    "DEFAULT_SYNC_MAX_EVENTS",
+    "DEFAULT_WRITER_GROUP_SIZE",
+    "DEFAULT_WRITER_QUEUE_SIZE",
+    "PersisterBackend",
+    "PersisterDurability",
+    "PersisterEncoding",
+    "PersisterSettings",
+    "RetentionClass",
+
     # proactor
+    "EventLoopImplementation",
     "ProactorSettings",
+
+    # receive queue
+    "DEFAULT_RECEIVE_BLOCK_TIMEOUT_SECONDS",
+    "DEFAULT_RECEIVE_HIGH_WATER_FRACTION",
+    "OverflowPolicy",
+    "ReceiveLaneSettings",
+    "ReceiveQueueSettings",
+
+    # upload
+    "DEFAULT_UPLOAD_BATCH_MAX_BYTES",
+    "DEFAULT_UPLOAD_INITIAL_WINDOW",
+    "DEFAULT_UPLOAD_MAX_WINDOW",
+    "DEFAULT_UPLOAD_READ_AHEAD_EVENTS",
+    "DEFAULT_UPLOAD_TARGET_ACK_SECONDS",
+    "UploadSettings",
 ]
 
 
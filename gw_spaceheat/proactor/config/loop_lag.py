@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+
+DEFAULT_LOOP_LAG_SAMPLE_SECONDS = 0.1
+DEFAULT_LOOP_LAG_THRESHOLD_SECONDS = 0.5
+DEFAULT_LOOP_LAG_REPORT_INTERVAL_SECONDS = 60.0
+
+
+class LoopLagSettings(BaseModel):
+    """Monitoring of the scheduling delay (lag) of the event loop by the WatchdogManager.
+
+    Every sample_seconds the lag of a sleep on the loop is recorded in ProactorStats.loop_lag. A lag above
+    threshold_seconds generates a ProblemEvent, at most one every report_interval_seconds. If capture_stacks is set,
+    a thread also samples the stack of the loop's thread while the loop is blocked for longer than threshold_seconds,
+    and the stack is added to the ProblemEvent.
+    """
+    enabled: bool = True
+    sample_seconds: float = DEFAULT_LOOP_LAG_SAMPLE_SECONDS
+    threshold_seconds: float = DEFAULT_LOOP_LAG_THRESHOLD_SECONDS
+    report_interval_seconds: float = DEFAULT_LOOP_LAG_REPORT_INTERVAL_SECONDS
+    capture_stacks: bool = False
@@ -5,7 +5,11 @@ from pydantic import SecretStr
 
 
 class MQTTClient(BaseModel):
-    """Settings for connecting to an MQTT Broker"""
+    """Settings for connecting to an MQTT Broker. ack_timeout_seconds, if not None, replaces the proactor's
+    ack_timeout_seconds for messages sent through this client.
+
+    If trusted is True the envelopes (Message and Header) of messages received through this client are not validated;
+    their payloads still are. Set it only for brokers whose publishers are known to send well formed messages."""
     host: str = "localhost"
     port: int = 1883
     keepalive: int = 60
@@ -13,3 +17,5 @@ class MQTTClient(BaseModel):
     bind_port: int = 0
     username: Optional[str] = None
     password: SecretStr = SecretStr("")
+    ack_timeout_seconds: Optional[float] = None
+    trusted: bool = False
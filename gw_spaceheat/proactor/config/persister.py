@@ -0,0 +1,122 @@
+from enum import Enum
+from pathlib import Path
+from typing import List
+from typing import Optional
+
+from pydantic import BaseModel
+
+DEFAULT_MAX_EVENT_BYTES: int = 500 * 1024 * 1024
+DEFAULT_MAX_SEGMENT_BYTES: int = 4 * 1024 * 1024
+DEFAULT_WRITER_QUEUE_SIZE: int = 1024
+DEFAULT_WRITER_GROUP_SIZE: int = 64
+DEFAULT_SYNC_INTERVAL_MS: int = 1000
+DEFAULT_SYNC_MAX_EVENTS: int = 64
+
+
+class PersisterBackend(Enum):
+    timed_rolling_file = "timed_rolling_file"
+    segmented_log = "segmented_log"
+    sqlite = "sqlite"
+
+
+class PersisterEncoding(Enum):
+    json = "json"
+    zlib = "zlib"
+    zstd = "zstd"
+
+
+class PersisterDurability(Enum):
+    none = "none"
+    periodic = "periodic"
+    per_event = "per_event"
+
+
+class RetentionClass(BaseModel):
+    """A class of persisted events, selected by matching event TypeNames against type_names, which are fnmatch
+    patterns. When the persister is full, events of the lowest priority are evicted first, and an event never evicts
+    events of a higher priority. The events of a class never occupy more than max_bytes, if it is not None."""
+    name: str
+    priority: int = 0
+    max_bytes: Optional[int] = None
+    type_names: List[str] = []
+
+
+class CoalescingPolicy(BaseModel):
+    """Thinning of events whose TypeName matches one of type_names, which are fnmatch patterns, while the upstream
+    link is not active. If window_seconds is greater than 0, only the latest event of each window of window_seconds
+    is kept, each event replacing the previous event of its window; otherwise only every keep_every-th event is
+    kept, starting with the first event generated while the link is not active."""
+    type_names: List[str] = []
+    keep_every: int = 1
+    window_seconds: float = 0
+
+
+DEFAULT_RETENTION_CLASSES: List[RetentionClass] = [
+    RetentionClass(
+        name="telemetry",
+        priority=0,
+        type_names=["gridworks.event.snapshot.*", "gridworks.event.gt.sh.status.*"],
+    ),
+    RetentionClass(
+        name="default",
+        priority=1,
+    ),
+    RetentionClass(
+        name="critical",
+        priority=2,
+        type_names=[
+            "gridworks.event.problem",
+            "gridworks.event.shutdown",
+            "gridworks.event.startup",
+            "gridworks.event.comm.*",
+        ],
+    ),
+]
+
+
+class PersisterSettings(BaseModel):
+    """Settings for the event persister.
+
+    backend selects the PersisterInterface implementation used by make_persister(). max_segment_bytes is only used by
+    the segmented_log backend. The sqlite backend applies durability through SQLite's synchronous pragma.
+
+    encoding selects how the MQTT topic and JSON payload with which an event is published are persisted: as is
+    (json) or compressed; compression_level, if not None, is passed to the compressor. The zstd encoding requires the
+    optional zstandard package and may use a dictionary, trained with proactor.event_encoding.train_zstd_dictionary(),
+    loaded from zstd_dictionary_path. Persisted events are decoded according to their content, so the encoding may be
+    changed while events are pending.
+
+    If writer_thread is True, make_persister() wraps the backend in a ThreadedWriterPersister, which persists and
+    clears events on a dedicated thread so that file I/O does not block the event loop. At most writer_queue_size
+    operations wait for the writer, beyond which persisting and clearing wait for room in the queue, and the writer
+    completes up to writer_group_size of them per group.
+
+    durability selects when persisted content is fsynced: never (none), in groups once sync_interval_ms have passed
+    or sync_max_events have been written since the last sync (periodic), or as each event is written (per_event).
+    In either of the latter modes the directories containing new files are synced in groups on the same schedule,
+    and everything written is synced whenever the persister is flushed, which the writer thread does once per group.
+
+    retention_classes, if not empty, make make_persister() wrap the backend in a RetentionPersister, which evicts
+    events by class rather than strictly oldest first when max_bytes is reached. An event whose TypeName matches no
+    class belongs to the first class without type_names or, if there is none, to the lowest priority class. Retention
+    is off by default, since the RetentionPersister evicts events one at a time in place of the backend's batched
+    trimming; DEFAULT_RETENTION_CLASSES are the suggested classes.
+
+    coalescing, if not empty, thins the events of the types it designates, such as
+    gridworks.event.snapshot.spaceheat.100, which are generated while the upstream link is not active, so that an
+    outage leaves fewer events to store and upload. The first policy matching an event's TypeName applies.
+    """
+    backend: PersisterBackend = PersisterBackend.timed_rolling_file
+    max_bytes: int = DEFAULT_MAX_EVENT_BYTES
+    max_segment_bytes: int = DEFAULT_MAX_SEGMENT_BYTES
+    encoding: PersisterEncoding = PersisterEncoding.json
+    compression_level: Optional[int] = None
+    zstd_dictionary_path: Optional[Path] = None
+    writer_thread: bool = True
+    writer_queue_size: int = DEFAULT_WRITER_QUEUE_SIZE
+    writer_group_size: int = DEFAULT_WRITER_GROUP_SIZE
+    durability: PersisterDurability = PersisterDurability.none
+    sync_interval_ms: int = DEFAULT_SYNC_INTERVAL_MS
+    sync_max_events: int = DEFAULT_SYNC_MAX_EVENTS
+    retention_classes: List[RetentionClass] = []
+    coalescing: List[CoalescingPolicy] = []
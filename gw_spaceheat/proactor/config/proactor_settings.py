@@ -1,15 +1,40 @@
+from enum import Enum
+
 from pydantic import BaseSettings
 from pydantic import validator
 
 from proactor.config.logging import LoggingSettings
+from proactor.config.loop_lag import LoopLagSettings
 from proactor.config.paths import Paths
+from proactor.config.persister import PersisterSettings
+from proactor.config.receive_queue import ReceiveQueueSettings
+from proactor.config.upload import UploadSettings
 
 MQTT_LINK_POLL_SECONDS = 60
+DEFAULT_ACK_TIMEOUT_SECONDS = 5.0
+DEFAULT_RECEIVE_STARVATION_LIMIT = 16
+DEFAULT_PATH_PROFILE_SAMPLES = 1024
+
+
+class EventLoopImplementation(Enum):
+    asyncio = "asyncio"
+    uvloop = "uvloop"
+
 
 class ProactorSettings(BaseSettings):
     paths: Paths = None
     logging: LoggingSettings = LoggingSettings()
     mqtt_link_poll_seconds: float = MQTT_LINK_POLL_SECONDS
+    ack_timeout_seconds: float = DEFAULT_ACK_TIMEOUT_SECONDS
+    receive_starvation_limit: int = DEFAULT_RECEIVE_STARVATION_LIMIT
+    receive_queue: ReceiveQueueSettings = ReceiveQueueSettings()
+    path_profiling: bool = False
+    path_profile_samples: int = DEFAULT_PATH_PROFILE_SAMPLES
+    mqtt_full_validation: bool = False
+    loop_lag: LoopLagSettings = LoopLagSettings()
+    event_loop: EventLoopImplementation = EventLoopImplementation.asyncio
+    persister: PersisterSettings = PersisterSettings()
+    upload: UploadSettings = UploadSettings()
 
     class Config:
         env_prefix = "PROACTOR_"
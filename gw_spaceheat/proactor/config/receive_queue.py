@@ -0,0 +1,42 @@
+from enum import Enum
+
+from pydantic import BaseModel
+
+DEFAULT_RECEIVE_BLOCK_TIMEOUT_SECONDS = 5.0
+DEFAULT_RECEIVE_HIGH_WATER_FRACTION = 0.8
+
+
+class OverflowPolicy(Enum):
+    block = "block"
+    drop_oldest = "drop_oldest"
+    coalesce = "coalesce"
+
+
+class ReceiveLaneSettings(BaseModel):
+    """Bound of one lane of the receive queue. A max_size of 0 leaves the lane unbounded.
+
+    When a bounded lane is full:
+      block        writers in other threads wait, up to block_timeout_seconds, for the lane to have room. Messages
+                   sent from the event loop, or whose writer timed out, are admitted over max_size.
+      drop_oldest  the oldest message of the lane is dropped.
+      coalesce     the new message replaces the waiting message of the lane from the same source, keeping its place
+                   in the lane; if there is none the oldest message of the lane is dropped.
+    """
+    max_size: int = 0
+    overflow: OverflowPolicy = OverflowPolicy.block
+
+
+class ReceiveQueueSettings(BaseModel):
+    """Bounds of the lanes of the receive queue, named as the lanes are. All lanes are unbounded by default.
+
+    A ProblemEvent is generated when the depth of a bounded lane reaches high_water_fraction of its max_size, and
+    another, if messages of the lane were dropped or coalesced meanwhile, when its depth falls back to half that.
+    """
+    control: ReceiveLaneSettings = ReceiveLaneSettings(overflow=OverflowPolicy.block)
+    power: ReceiveLaneSettings = ReceiveLaneSettings(overflow=OverflowPolicy.coalesce)
+    telemetry: ReceiveLaneSettings = ReceiveLaneSettings(overflow=OverflowPolicy.coalesce)
+    block_timeout_seconds: float = DEFAULT_RECEIVE_BLOCK_TIMEOUT_SECONDS
+    high_water_fraction: float = DEFAULT_RECEIVE_HIGH_WATER_FRACTION
+
+    def lane(self, name: str) -> ReceiveLaneSettings:
+        return getattr(self, name)
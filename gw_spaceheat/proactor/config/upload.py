@@ -0,0 +1,29 @@
+from pydantic import BaseModel
+
+DEFAULT_UPLOAD_INITIAL_WINDOW = 8
+DEFAULT_UPLOAD_MAX_WINDOW = 64
+DEFAULT_UPLOAD_TARGET_ACK_SECONDS = 1.0
+DEFAULT_UPLOAD_BATCH_MAX_BYTES = 128 * 1024
+DEFAULT_UPLOAD_READ_AHEAD_EVENTS = 64
+
+
+class UploadSettings(BaseModel):
+    """Pacing of the upload of pending events after the upstream link is (re)activated.
+
+    At most 'window' uploaded events await acks at any time. The window starts at initial_window, grows by one event
+    for each ack received within target_ack_seconds, shrinks by half an event for each slower ack and is halved by an
+    ack timeout, always staying between min_window and max_window.
+
+    If batch_max_events is greater than 1, pending events are uploaded in EventBatch messages of up to
+    batch_max_events events and batch_max_bytes of event JSON, each cleared by a single ack. The window then counts
+    batches. The upstream peer must understand EventBatch, so batching is disabled by default.
+
+    Pending events are read from the persister read_ahead_events at a time, as the upload needs them.
+    """
+    initial_window: int = DEFAULT_UPLOAD_INITIAL_WINDOW
+    min_window: int = 1
+    max_window: int = DEFAULT_UPLOAD_MAX_WINDOW
+    target_ack_seconds: float = DEFAULT_UPLOAD_TARGET_ACK_SECONDS
+    batch_max_events: int = 1
+    batch_max_bytes: int = DEFAULT_UPLOAD_BATCH_MAX_BYTES
+    read_ahead_events: int = DEFAULT_UPLOAD_READ_AHEAD_EVENTS
@@ -0,0 +1,83 @@
+"""Table of the handlers to which the Proactor dispatches messages.
+
+Messages taken from the receive queue are routed by the type of their payload; a payload whose type has no route of its
+own takes the route of its nearest registered base class, which is looked up once per type and cached. Decoded MQTT
+messages are routed by the TypeName of their payload, with routes registered for a particular client taking
+precedence over those registered for all clients. Each route carries the path_dbg bit logged, and profiled, for
+messages which take it.
+"""
+from typing import Any
+from typing import Callable
+from typing import NamedTuple
+from typing import Optional
+
+
+class Route(NamedTuple):
+    handler: Callable[..., Any]
+    path: int = 0
+
+
+class MessageRoutes:
+    _routes: dict[type, Route]
+    _resolved: dict[type, Optional[Route]]
+    _mqtt_routes: dict[tuple[Optional[str], str], Route]
+
+    def __init__(self):
+        self._routes = dict()
+        self._resolved = dict()
+        self._mqtt_routes = dict()
+
+    def add(self, payload_type: type, handler: Callable[[Any], Any], path: int = 0) -> None:
+        """Route messages whose payload is a payload_type to handler(message)."""
+        if payload_type in self._routes:
+            raise ValueError(f"ERROR. Payload type {payload_type} already routed to {self._routes[payload_type]}")
+        self._routes[payload_type] = Route(handler, path)
+        self._resolved.clear()
+
+    def route(self, payload: Any) -> Optional[Route]:
+        payload_type = type(payload)
+        try:
+            return self._resolved[payload_type]
+        except KeyError:
+            route = next(
+                (self._routes[base] for base in payload_type.__mro__ if base in self._routes),
+                None,
+            )
+            self._resolved[payload_type] = route
+            return route
+
+    def add_mqtt(
+        self,
+        type_name: str,
+        handler: Callable[[Any, Any], Any],
+        path: int = 0,
+        client: Optional[str] = None,
+    ) -> None:
+        """Route decoded MQTT messages whose payload has type_name, received by client or, if client is None, by any
+        client, to handler(mqtt_receipt_message, decoded_message)."""
+        key = (client, type_name)
+        if key in self._mqtt_routes:
+            raise ValueError(f"ERROR. MQTT type name {type_name} of client {client} already routed")
+        self._mqtt_routes[key] = Route(handler, path)
+
+    def mqtt_route(self, client: str, type_name: str) -> Optional[Route]:
+        route = self._mqtt_routes.get((client, type_name))
+        if route is None:
+            route = self._mqtt_routes.get((None, type_name))
+        return route
+
+    def table(self) -> dict[str, dict[str, str]]:
+        """The registered routes, by payload type and by '[client/]TypeName', naming their handlers."""
+        return dict(
+            messages={
+                payload_type.__name__: _handler_name(route.handler) for payload_type, route in self._routes.items()
+            },
+            mqtt={
+                (type_name if client is None else f"{client}/{type_name}"): _handler_name(route.handler)
+                for (client, type_name), route in self._mqtt_routes.items()
+            },
+        )
+
+
+def _handler_name(handler: Callable[..., Any]) -> str:
+    return getattr(handler, "__qualname__", repr(handler))
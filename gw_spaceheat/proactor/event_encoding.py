@@ -0,0 +1,155 @@
+"""Encoding of events stored by the event persister.
+
+Events are stored as the MQTT topic and payload with which they are published upstream, so that uploading a pending
+event does not decode and re-encode it. The stored record, '<topic>\\n<payload>', is optionally compressed with zlib
+or, if the zstandard package is installed, with zstd. Decoding does not depend on the configured encoding: the format
+of persisted content is recognized from its first bytes, so events persisted with a previous encoding, including the
+event JSON persisted by earlier versions, can still be uploaded.
+"""
+import json
+import zlib
+from typing import Any
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+
+from gwproto import Message
+from gwproto.messages import EventBase
+
+from proactor.config.persister import PersisterEncoding
+from proactor.config.persister import PersisterSettings
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+ZSTD_MAGIC: bytes = b"\x28\xb5\x2f\xfd"
+ZLIB_DEFLATE_CMF: int = 0x78
+DEFAULT_ZSTD_DICTIONARY_BYTES: int = 16 * 1024
+
+
+class EventEncodingError(ValueError):
+    ...
+
+
+class EncodedEvent(NamedTuple):
+    content: bytes
+    json_size: int
+
+
+class WireEvent(NamedTuple):
+    topic: str
+    payload: bytes
+
+
+class EventCodec:
+    ENCODING: str = "utf-8"
+    TOPIC_SEPARATOR: bytes = b"\n"
+
+    _encoding: PersisterEncoding
+    _compression_level: Optional[int]
+    _zstd_dictionary: Optional["zstandard.ZstdCompressionDict"] = None
+    _zstd_compressor: Optional["zstandard.ZstdCompressor"] = None
+    _zstd_decompressor: Optional["zstandard.ZstdDecompressor"] = None
+
+    def __init__(
+        self,
+        encoding: PersisterEncoding = PersisterEncoding.json,
+        compression_level: Optional[int] = None,
+        zstd_dictionary: Optional[bytes] = None,
+    ):
+        self._encoding = encoding
+        self._compression_level = compression_level
+        if zstandard is not None:
+            if zstd_dictionary is not None:
+                self._zstd_dictionary = zstandard.ZstdCompressionDict(zstd_dictionary)
+            compressor_kwargs = dict(dict_data=self._zstd_dictionary)
+            if compression_level is not None:
+                compressor_kwargs["level"] = compression_level
+            self._zstd_compressor = zstandard.ZstdCompressor(**compressor_kwargs)
+            self._zstd_decompressor = zstandard.ZstdDecompressor(dict_data=self._zstd_dictionary)
+        elif encoding == PersisterEncoding.zstd or zstd_dictionary is not None:
+            raise EventEncodingError(
+                f"Persister encoding {encoding.value} requires the zstandard package, which is not installed"
+            )
+
+    @classmethod
+    def from_settings(cls, settings: PersisterSettings) -> "EventCodec":
+        zstd_dictionary = None
+        if settings.zstd_dictionary_path is not None:
+            zstd_dictionary = settings.zstd_dictionary_path.read_bytes()
+        return EventCodec(
+            encoding=settings.encoding,
+            compression_level=settings.compression_level,
+            zstd_dictionary=zstd_dictionary,
+        )
+
+    @property
+    def encoding(self) -> PersisterEncoding:
+        return self._encoding
+
+    def encode(self, topic: str, payload: bytes) -> EncodedEvent:
+        """Encode the topic and payload with which an event is published."""
+        record = topic.encode(self.ENCODING) + self.TOPIC_SEPARATOR + payload
+        match self._encoding:
+            case PersisterEncoding.zlib:
+                if self._compression_level is None:
+                    content = zlib.compress(record)
+                else:
+                    content = zlib.compress(record, self._compression_level)
+            case PersisterEncoding.zstd:
+                content = self._zstd_compressor.compress(record)
+            case _:
+                content = record
+        return EncodedEvent(content, len(payload))
+
+    def decompress(self, content: bytes) -> bytes:
+        """Return the uncompressed record or event JSON of persisted content."""
+        if content.startswith(ZSTD_MAGIC):
+            if self._zstd_decompressor is None:
+                raise EventEncodingError(
+                    "Persisted event is zstd compressed but the zstandard package is not installed"
+                )
+            return self._zstd_decompressor.decompress(content)
+        elif content and content[0] == ZLIB_DEFLATE_CMF:
+            return zlib.decompress(content)
+        return content
+
+    def decode(self, content: bytes) -> WireEvent | dict[str, Any]:
+        """Return the topic and payload of persisted content or, for event JSON persisted by earlier versions, the
+        JSON object of the event."""
+        content = self.decompress(content)
+        if content.lstrip()[:1] == b"{":
+            return json.loads(content.decode(self.ENCODING))
+        topic, payload = content.split(self.TOPIC_SEPARATOR, 1)
+        return WireEvent(topic.decode(self.ENCODING), payload)
+
+
+def wire_event(event: EventBase | dict[str, Any], src: str = "") -> WireEvent:
+    """Return the topic and payload with which an event would be published upstream by a Proactor with
+    publication_name src."""
+    message = Message(Src=src, Payload=event, AckRequired=True)
+    return WireEvent(message.mqtt_topic(), message.json().encode(EventCodec.ENCODING))
+
+
+def train_zstd_dictionary(
+    samples: Sequence[bytes | EventBase],
+    dictionary_bytes: int = DEFAULT_ZSTD_DICTIONARY_BYTES,
+) -> bytes:
+    """Train a zstd dictionary from sample events or persisted content, for example the contents of the event
+    directory. The returned bytes may be written to the file named by PersisterSettings.zstd_dictionary_path."""
+    if zstandard is None:
+        raise EventEncodingError("Training a zstd dictionary requires the zstandard package, which is not installed")
+    codec = EventCodec()
+    sample_bytes = []
+    for sample in samples:
+        if isinstance(sample, EventBase):
+            sample_bytes.append(codec.encode(*wire_event(sample, sample.Src)).content)
+        else:
+            match decoded := codec.decode(sample):
+                case WireEvent():
+                    sample_bytes.append(codec.encode(*decoded).content)
+                case _:
+                    sample_bytes.append(codec.encode(*wire_event(decoded, decoded.get("Src", ""))).content)
+    return zstandard.train_dictionary(dictionary_bytes, sample_bytes).as_bytes()
@@ -0,0 +1,66 @@
+"""Selection of the event loop implementation on which the Proactor runs.
+
+EventLoopImplementation.uvloop runs the Proactor on uvloop, if the optional uvloop package is installed, and on the
+default asyncio loop otherwise; the Proactor logs the implementation it actually runs on when it starts.
+"""
+import asyncio
+from typing import Any
+from typing import Callable
+from typing import Coroutine
+from typing import Optional
+
+from proactor.config.proactor_settings import EventLoopImplementation
+
+try:
+    import uvloop
+except ImportError:  # pragma: no cover
+    uvloop = None
+
+
+def available_event_loops() -> list[EventLoopImplementation]:
+    return [
+        implementation for implementation in EventLoopImplementation
+        if implementation == EventLoopImplementation.asyncio or event_loop_factory(implementation) is not None
+    ]
+
+
+def event_loop_factory(
+    implementation: EventLoopImplementation,
+) -> Optional[Callable[[], asyncio.AbstractEventLoop]]:
+    """The function creating event loops of implementation, or None for the default asyncio loop, or if
+    implementation is not installed."""
+    if implementation == EventLoopImplementation.uvloop and uvloop is not None:
+        return uvloop.new_event_loop
+    return None
+
+
+def event_loop_implementation(loop: asyncio.AbstractEventLoop) -> EventLoopImplementation:
+    if type(loop).__module__.split(".")[0] == "uvloop":
+        return EventLoopImplementation.uvloop
+    return EventLoopImplementation.asyncio
+
+
+def run_event_loop(main: Coroutine[Any, Any, Any], implementation: EventLoopImplementation) -> Any:
+    """asyncio.run(main) on a new event loop of implementation, falling back to the default asyncio loop if
+    implementation is not installed."""
+    loop_factory = event_loop_factory(implementation)
+    if loop_factory is None:
+        return asyncio.run(main)
+    if hasattr(asyncio, "Runner"):
+        with asyncio.Runner(loop_factory=loop_factory) as runner:
+            return runner.run(main)
+    # Python < 3.11
+    loop = loop_factory()
+    try:
+        asyncio.set_event_loop(loop)
+        return loop.run_until_complete(main)
+    finally:
+        try:
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
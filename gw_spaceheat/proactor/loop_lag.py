@@ -0,0 +1,104 @@
+"""Sampling of the scheduling delay (lag) of the event loop.
+
+A task sleeps for sample_seconds at a time and records by how much each sleep overran; code blocking the loop, such
+as blocking I/O in a handler, shows up as lag. Lags above threshold_seconds are passed to on_lag, at most once every
+report_interval_seconds.
+
+With capture_stacks a daemon thread wakes every sample_seconds and, once the sampling task has been overdue for more
+than threshold_seconds, takes the stack of the loop's thread, which is then the stack of the blocking code. The stack
+is passed to on_lag with the lag it was taken during.
+"""
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from typing import Callable
+from typing import Optional
+
+from proactor.config.loop_lag import LoopLagSettings
+from proactor.stats import LoopLagStats
+
+
+class LoopLagMonitor:
+    settings: LoopLagSettings
+    stats: LoopLagStats
+    _on_lag: Callable[[float, str], None]
+    _task: Optional[asyncio.Task] = None
+    _stack_thread: Optional[threading.Thread] = None
+    _stop_stacks: threading.Event
+    _loop_thread_id: int = 0
+    _last_wake: float = 0.0
+    _stack: Optional[tuple[float, str]] = None
+    _last_report: Optional[float] = None
+
+    def __init__(
+        self,
+        settings: LoopLagSettings,
+        stats: Optional[LoopLagStats] = None,
+        on_lag: Optional[Callable[[float, str], None]] = None,
+    ):
+        self.settings = settings
+        self.stats = LoopLagStats() if stats is None else stats
+        self._on_lag = (lambda lag, stack: None) if on_lag is None else on_lag
+        self._stop_stacks = threading.Event()
+
+    def start(self) -> None:
+        """Start sampling. Must be called from the event loop."""
+        if not self.settings.enabled or self._task is not None:
+            return
+        self._last_wake = time.monotonic()
+        self._task = asyncio.create_task(self._sample(), name="loop_lag")
+        if self.settings.capture_stacks:
+            self._loop_thread_id = threading.get_ident()
+            self._stop_stacks.clear()
+            self._stack_thread = threading.Thread(target=self._capture_stacks, name="loop_lag_stacks", daemon=True)
+            self._stack_thread.start()
+
+    def stop(self) -> None:
+        self._stop_stacks.set()
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    async def join(self) -> None:
+        if self._task is not None:
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._stack_thread is not None:
+            self._stack_thread.join(timeout=self.settings.sample_seconds * 2)
+
+    async def _sample(self) -> None:
+        while True:
+            started = self._last_wake
+            await asyncio.sleep(self.settings.sample_seconds)
+            self._last_wake = now = time.monotonic()
+            captured, self._stack = self._stack, None
+            self.check(
+                now - started - self.settings.sample_seconds,
+                now,
+                captured[1] if captured is not None and captured[0] == started else "",
+            )
+
+    def check(self, lag: float, now: float, stack: str = "") -> None:
+        """Record one lag sample, reporting it if it is above the threshold and none was reported recently."""
+        lag = max(lag, 0.0)
+        self.stats.lag.add(lag)
+        if lag > self.settings.threshold_seconds:
+            self.stats.num_over_threshold += 1
+            if stack:
+                self.stats.last_stack = stack
+            if self._last_report is None or now - self._last_report >= self.settings.report_interval_seconds:
+                self._last_report = now
+                self.stats.num_reported += 1
+                self._on_lag(lag, stack)
+
+    def _capture_stacks(self) -> None:
+        while not self._stop_stacks.wait(self.settings.sample_seconds):
+            last_wake = self._last_wake
+            overdue = time.monotonic() - last_wake - self.settings.sample_seconds
+            if overdue > self.settings.threshold_seconds and self._stack is None:
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    self._stack = (last_wake, "".join(traceback.format_stack(frame)))
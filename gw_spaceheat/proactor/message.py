@@ -1,4 +1,5 @@
 """Message structures for use between proactor and its sub-objects."""
+import json
 import uuid
 from enum import Enum
 from typing import Any
@@ -7,6 +8,7 @@ from typing import Generic
 from typing import List
 from typing import Literal
 from typing import Optional
+from typing import Sequence
 from typing import TypeVar
 
 from gwproto import as_enum
@@ -17,7 +19,9 @@ from gwproto.messages import EventBase
 from paho.mqtt.client import MQTT_ERR_UNKNOWN
 from paho.mqtt.client import MQTTMessage
 from pydantic import BaseModel
+from pydantic import Field
 from pydantic import validator
+from pydantic.json import pydantic_encoder
 
 from proactor.config import LoggerLevels
 from problems import Problems
@@ -256,6 +260,10 @@ class InternalShutdownMessage(ShutdownMessage):
 
 class DBGCommands(Enum):
     show_subscriptions = "show_subscriptions"
+    show_latency = "show_latency"
+    start_profiling = "start_profiling"
+    stop_profiling = "stop_profiling"
+    show_profile = "show_profile"
 
 
 class DBGPayload(BaseModel):
@@ -278,3 +286,27 @@ class DBGEvent(EventBase):
     Count: int = 0
     Msg: str = ""
     TypeName: Literal["gridworks.event.scada-dbg"] = "gridworks.event.proactor.dbg"
+
+
+class EventBatch(BaseModel):
+    """Envelope carrying many pending events upstream in one acked message. Messages holds the messages with which
+    the events would have been published; the receiver processes each as if it had arrived on its own."""
+    MessageId: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    Messages: List[Dict[str, Any]] = []
+    TypeName: Literal["gridworks.proactor.event.batch"] = "gridworks.proactor.event.batch"
+
+    @classmethod
+    def encode_batch(
+        cls, src: str, message_payloads: Sequence[bytes], encoding: str = "utf-8"
+    ) -> tuple[Message, bytes]:
+        """Return an acked EventBatch message, without its Messages, and the payload with which it is published,
+        which contains message_payloads, the already encoded event messages, without decoding them."""
+        message = Message(Src=src, Payload=cls(), AckRequired=True)
+        # Serialize the envelope with a unique placeholder in place of Messages, which the payloads then replace.
+        placeholder = uuid.uuid4().hex
+        envelope = message.dict()
+        envelope["Payload"]["Messages"] = placeholder
+        head, tail = json.dumps(envelope, default=pydantic_encoder).encode(encoding).split(
+            f'"{placeholder}"'.encode(encoding), 1
+        )
+        return message, b"".join([head, b"[", b", ".join(message_payloads), b"]", tail])
@@ -33,6 +33,7 @@ from proactor.message import MQTTProblemsMessage
 from proactor.message import MQTTReceiptMessage
 from proactor.message import MQTTSubackMessage
 from proactor.message import MQTTSubackPayload
+from proactor.stats import QueueWriterStats
 from proactor.sync_thread import AsyncQueueWriter
 from proactor.sync_thread import responsive_sleep
 
@@ -229,8 +230,8 @@ class MQTTClients:
     upstream_client: str = ""
     primary_peer_client: str = ""
 
-    def __init__(self):
-        self._send_queue = AsyncQueueWriter()
+    def __init__(self, send_queue_stats: Optional[QueueWriterStats] = None):
+        self._send_queue = AsyncQueueWriter(send_queue_stats)
         self.clients = dict()
 
     def add_client(
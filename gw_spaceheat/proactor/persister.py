@@ -1,10 +1,26 @@
 import abc
+import fnmatch
+import itertools
+import json
+import mmap
+import os
+import queue
 import re
 import shutil
+import sqlite3
+import struct
+import threading
+import time
 from abc import abstractmethod
+from dataclasses import dataclass
 from pathlib import Path
+from typing import BinaryIO
+from typing import Callable
+from typing import Iterator
 from typing import NamedTuple
 from typing import Optional
+from typing import Sequence
+from typing import TextIO
 
 import pendulum
 from pendulum import DateTime
@@ -12,6 +28,14 @@ from result import Err
 from result import Ok
 from result import Result
 
+from proactor.config.persister import DEFAULT_SYNC_INTERVAL_MS
+from proactor.config.persister import DEFAULT_SYNC_MAX_EVENTS
+from proactor.config.persister import PersisterBackend
+from proactor.config.persister import PersisterDurability
+from proactor.config.persister import PersisterSettings
+from proactor.config.persister import RetentionClass
+from proactor.stats import PersistenceStats
+from proactor.stats import RetentionClassStats
 from problems import Problems
 
 
@@ -65,6 +89,14 @@ class ReindexError(PersisterError):
     ...
 
 
+class SyncFailed(PersisterError):
+    ...
+
+
+class RetentionBudgetExceeded(PersisterError):
+    ...
+
+
 class JSONDecodingError(PersisterException):
     ...
 
@@ -84,11 +116,26 @@ class FileMissingWarning(PersisterWarning):
 class UIDMissingWarning(PersisterWarning):
     ...
 
+
+class IndexWriteFailedWarning(PersisterWarning):
+    ...
+
+
+DEFAULT_PENDING_CHUNK_SIZE: int = 64
+
+
+class PendingContent(NamedTuple):
+    uid: str
+    content: Optional[bytes]
+    problems: Optional[Problems] = None
+
+
 class PersisterInterface(abc.ABC):
 
     @abstractmethod
-    def persist(self, uid: str, content: bytes) -> Result[bool, Problems]:
-        """Persist content, indexed by uid"""
+    def persist(self, uid: str, content: bytes, type_name: str = "") -> Result[bool, Problems]:
+        """Persist content, indexed by uid. type_name, the TypeName of the persisted event, if known, may be used to
+        decide how long content is retained."""
 
     @abstractmethod
     def clear(self, uid: str) -> Result[bool, Problems]:
@@ -111,18 +158,177 @@ class PersisterInterface(abc.ABC):
     def retrieve(self, uid: str) -> Result[Optional[bytes], Problems]:
         """Load and return persisted content for uid"""
 
+    def content_size(self, uid: str) -> Optional[int]:
+        """Return the size of the content persisted for uid, or None if uid is not pending. Persisters which know the
+        size without reading the content override this."""
+        match self.retrieve(uid):
+            case Ok(content) if content is not None:
+                return len(content)
+        return None
+
     @abstractmethod
     def reindex(self) -> Result[Optional[bool], Problems]:
         """Re-created pending index from persisted storage"""
 
+    def iter_pending(self, chunk_size: int = DEFAULT_PENDING_CHUNK_SIZE) -> Iterator[list[PendingContent]]:
+        """Yield pending uids with their content, in persisted order, in chunks of up to chunk_size events, reading
+        each chunk only when it is requested. The pending uids are listed when iteration starts and uids cleared
+        before their chunk is read are skipped. Content which could not be read is yielded as None, with the problems
+        reading it."""
+        uids = self.pending()
+        for start in range(0, len(uids), chunk_size):
+            chunk = []
+            for uid in uids[start:start + chunk_size]:
+                if uid in self:
+                    match self.retrieve(uid):
+                        case Ok(content):
+                            if content is not None:
+                                chunk.append(PendingContent(uid, content))
+                        case Err(problems):
+                            chunk.append(PendingContent(uid, None, problems))
+            if chunk:
+                yield chunk
+
+    def commit(self) -> Result[bool, Problems]:
+        """Called after a group of persist() and clear() calls, allowing work such as syncing to be done once per
+        group."""
+        return Ok()
+
+    def flush(self) -> Result[bool, Problems]:
+        """Complete the persisting and clearing requested so far, making it durable."""
+        return Ok()
+
+    def close(self) -> Result[bool, Problems]:
+        """Flush and release any resources held by the persister."""
+        return self.flush()
+
 
 class _PersistedItem(NamedTuple):
     uid: str
     path: Path
 
+
+class _PendingIndexEntry(NamedTuple):
+    size: int
+    timestamp: str
+
+
+class FileSyncer:
+    """Apply a PersisterDurability policy to the files written by a persister.
+
+    Persisters report each file they write with written() and each directory they create with created_dir(), and
+    call sync_if_due() after each persist(). Files are fsynced as they are written (per_event), or in groups once
+    interval_seconds have passed or max_events have been written since the last sync (periodic). Directories which
+    received new entries are synced in groups on the same schedule, by commit(), and by sync().
+    """
+    _durability: PersisterDurability
+    _interval_seconds: float
+    _max_events: int
+    _dirty_files: set[Path]
+    _dirty_dirs: set[Path]
+    _num_unsynced: int
+    _last_sync: float
+    num_file_syncs: int
+    num_dir_syncs: int
+
+    def __init__(
+        self,
+        durability: PersisterDurability = PersisterDurability.none,
+        interval_seconds: float = DEFAULT_SYNC_INTERVAL_MS / 1000,
+        max_events: int = DEFAULT_SYNC_MAX_EVENTS,
+    ):
+        self._durability = durability
+        self._interval_seconds = interval_seconds
+        self._max_events = max_events
+        self._dirty_files = set()
+        self._dirty_dirs = set()
+        self._num_unsynced = 0
+        self._last_sync = time.monotonic()
+        self.num_file_syncs = 0
+        self.num_dir_syncs = 0
+
+    @classmethod
+    def from_settings(cls, settings: PersisterSettings) -> "FileSyncer":
+        return FileSyncer(
+            durability=settings.durability,
+            interval_seconds=settings.sync_interval_ms / 1000,
+            max_events=settings.sync_max_events,
+        )
+
+    @property
+    def durability(self) -> PersisterDurability:
+        return self._durability
+
+    def written(self, f: BinaryIO | TextIO, path: Path) -> None:
+        """Record that the open file f, at path, was written."""
+        match self._durability:
+            case PersisterDurability.none:
+                return
+            case PersisterDurability.per_event:
+                f.flush()
+                os.fsync(f.fileno())
+                self.num_file_syncs += 1
+            case PersisterDurability.periodic:
+                self._dirty_files.add(path)
+        self._dirty_dirs.add(path.parent)
+
+    def created_dir(self, path: Path) -> None:
+        if self._durability != PersisterDurability.none:
+            self._dirty_dirs.add(path.parent)
+
+    def sync_if_due(self) -> Result[bool, Problems]:
+        if self._durability == PersisterDurability.none:
+            return Ok()
+        self._num_unsynced += 1
+        if (
+            self._num_unsynced >= self._max_events
+            or time.monotonic() - self._last_sync >= self._interval_seconds
+        ):
+            return self.sync()
+        return Ok()
+
+    def commit(self) -> Result[bool, Problems]:
+        if self._durability == PersisterDurability.per_event:
+            return self.sync()
+        return Ok()
+
+    def sync(self) -> Result[bool, Problems]:
+        problems = Problems()
+        for path in self._dirty_files:
+            self.num_file_syncs += self._sync_path(path, problems)
+        for path in self._dirty_dirs:
+            self.num_dir_syncs += self._sync_path(path, problems)
+        self._dirty_files.clear()
+        self._dirty_dirs.clear()
+        self._num_unsynced = 0
+        self._last_sync = time.monotonic()
+        if problems:
+            return Err(problems)
+        return Ok()
+
+    @classmethod
+    def _sync_path(cls, path: Path, problems: Problems) -> int:
+        """fsync path, which may be a directory. Paths removed since they were written need no sync."""
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return 0
+        except BaseException as e:
+            problems.add_error(e).add_error(SyncFailed(path=path))
+            return 0
+        try:
+            os.fsync(fd)
+        except BaseException as e:
+            problems.add_error(e).add_error(SyncFailed(path=path))
+            return 0
+        finally:
+            os.close(fd)
+        return 1
+
+
 class StubPersister(PersisterInterface):
 
-    def persist(self, uid: str, content: bytes) -> Result[bool, Problems]:
+    def persist(self, uid: str, content: bytes, type_name: str = "") -> Result[bool, Problems]:
         return Ok()
 
     def clear(self, uid: str) -> Result[bool, Problems]:
@@ -159,7 +365,7 @@ class SimpleDirectoryWriter(StubPersister):
     def _make_name(cls, dt: DateTime, uid: str) -> str:
         return f"{dt.isoformat()}.uid[{uid}].json"
 
-    def persist(self, uid: str, content: bytes) -> Result[bool, Problems]:
+    def persist(self, uid: str, content: bytes, type_name: str = "") -> Result[bool, Problems]:
         problems = Problems()
         try:
             if not self._base_dir.exists():
@@ -185,24 +391,52 @@ class SimpleDirectoryWriter(StubPersister):
 
 
 class TimedRollingFilePersister(PersisterInterface):
+    """Persist each event as a file in a per-day directory.
+
+    The pending uids, their paths, sizes and timestamps are also recorded in a journal, INDEX_FILE_NAME, in the base
+    directory. Each persist() and clear() appends one line to the journal, which is kept open between writes, and the
+    journal is periodically rewritten as a checkpoint of the current pending set. At startup the journal is loaded
+    instead of scanning every persisted file; the full directory scan of reindex() is only done if the journal is
+    missing, unreadable or stale, that is, if the number of entries in any day directory differs from the number of
+    pending files the journal records in it. Listing the day directories does not visit the persisted files, and
+    unlike directory mtimes, whose resolution may be coarse, a count misses no file written or removed without being
+    journaled.
+
+    The size of each pending file and the number and total size of the pending files in each day directory are kept
+    in memory, so that neither persist(), clear() nor trimming to max_bytes visit the filesystem to find them. Trimming
+    removes the oldest day directories whole, with a single journal record each, as long as that does not remove more
+    than needed, and then the oldest files of the next day directory one at a time.
+    """
     DEFAULT_MAX_BYTES: int = 500 * 1024 * 1024
     FILENAME_RGX: re.Pattern = re.compile(r"(?P<dt>.*)\.uid\[(?P<uid>.*)].json$")
+    INDEX_FILE_NAME: str = "pending_index.jsonl"
+    INDEX_COMPACTION_MIN_LINES: int = 1024
 
     _base_dir: Path
     _max_bytes: int = DEFAULT_MAX_BYTES
     _pending: dict[str, Path]
+    _index_entries: dict[str, _PendingIndexEntry]
+    _index_lines: int
+    _index_file: Optional[TextIO] = None
+    _day_counts: dict[str, int]
+    _day_bytes: dict[str, int]
     _curr_dir: Path
     _curr_bytes: int
+    _syncer: FileSyncer
 
     def __init__(
         self,
         base_dir: Path | str,
-        max_bytes: int = DEFAULT_MAX_BYTES
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        syncer: Optional[FileSyncer] = None,
     ):
         self._base_dir = Path(base_dir).resolve()
         self._max_bytes = max_bytes
+        self._syncer = FileSyncer() if syncer is None else syncer
         self._curr_dir = self._today_dir()
-        self.reindex()
+        self._index_lines = 0
+        if not self._load_index():
+            self.reindex()
 
     @property
     def max_bytes(self) -> int:
@@ -220,7 +454,11 @@ class TimedRollingFilePersister(PersisterInterface):
     def curr_dir(self) -> Path:
         return self._curr_dir
 
-    def persist(self, uid: str, content: bytes) -> Result[bool, Problems]:
+    @property
+    def index_path(self) -> Path:
+        return self._base_dir / self.INDEX_FILE_NAME
+
+    def persist(self, uid: str, content: bytes, type_name: str = "") -> Result[bool, Problems]:
         problems = Problems()
         try:
             if len(content) > self._max_bytes:
@@ -232,6 +470,14 @@ class TimedRollingFilePersister(PersisterInterface):
                         )
                     )
                 )
+            existing_path = self._pending.get(uid, None)
+            if existing_path is not None:
+                problems.add_warning(UIDExistedWarning(uid=uid, path=existing_path))
+                match self.clear(uid):
+                    case Ok():
+                        problems.add_warning(FileExistedWarning(uid=uid, path=existing_path))
+                    case Err(clear_problems):
+                        problems.add_problems(clear_problems)
             if len(content) + self._curr_bytes > self._max_bytes:
                 trimmed = self._trim_old_storage(len(content))
                 match trimmed:
@@ -239,26 +485,24 @@ class TimedRollingFilePersister(PersisterInterface):
                         problems.add_problems(trim_problems)
                         if problems.errors:
                             return Err(problems.add_error(TrimFailed(uid=uid)))
-            existing_path = self._pending.pop(uid, None)
-            if existing_path is not None:
-                problems.add_warning(UIDExistedWarning(uid=uid, path=existing_path))
-                if existing_path.exists():
-                    self._curr_bytes -= existing_path.stat().st_size
-                    problems.add_warning(FileExistedWarning(uid=uid, path=existing_path))
-                else:
-                    problems.add_warning(FileMissingWarning(uid=uid, path=existing_path))
             self._roll_curr_dir()
-            self._pending[uid] = self._curr_dir / self._make_name(pendulum.now("utc"), uid)
+            timestamp = pendulum.now("utc").isoformat()
+            path = self._curr_dir / self._make_name_from_timestamp(timestamp, uid)
             try:
-                with self._pending[uid].open("wb") as f:
+                with path.open("wb") as f:
                     f.write(content)
-                self._curr_bytes += len(content)
+                    self._syncer.written(f, path)
             except BaseException as e:  # pragma: no cover
                 return Err(
                     problems.add_error(e).add_error(
-                        WriteFailed(f"Open or write failed", uid=uid, path=existing_path)
+                        WriteFailed(f"Open or write failed", uid=uid, path=path)
                     )
                 )
+            self._add_entry(uid, path, _PendingIndexEntry(len(content), timestamp))
+            self._append_index(self._index_record(uid), problems)
+            match self._syncer.sync_if_due():
+                case Err(sync_problems):
+                    problems.add_problems(sync_problems)
         except BaseException as e:
             return Err(problems.add_error(e).add_error(PersisterError(
                 f"Unexpected error", uid=uid
@@ -270,45 +514,55 @@ class TimedRollingFilePersister(PersisterInterface):
 
     def _trim_old_storage(self, needed_bytes: int) -> Result[bool, Problems]:
         problems = Problems()
-        last_day_dir: Optional[Path] = None
-        items = list(self._pending.items())
-        for uid, path in items:
+        target_bytes = self._max_bytes - needed_bytes
+        while self._pending and self._curr_bytes > target_bytes:
+            uid, path = next(iter(self._pending.items()))
+            day_name = path.parent.name
             try:
+                if (
+                    self._curr_bytes - self._day_bytes[day_name] >= target_bytes
+                    and self._remove_day(day_name, problems)
+                ):
+                    continue
                 match self.clear(uid):
                     case Err(other):
                         problems.add_problems(other)
-                day_dir = path.parent
-                if last_day_dir is not None and last_day_dir != day_dir:
-                    shutil.rmtree(last_day_dir, ignore_errors=True)
-                last_day_dir = day_dir
             except BaseException as e:
                 problems.add_error(e)
                 problems.add_error(PersisterError("Unexpected error", uid=uid, path=path))
-            if self._curr_bytes <= self._max_bytes - needed_bytes:
                 break
-        try:
-            if last_day_dir is not None:
-                if not self._pending or next(iter(self._pending.values())).parent != last_day_dir:
-                    shutil.rmtree(last_day_dir, ignore_errors=True)
-        except BaseException as e:  # pragma: no cover
-            problems.add_error(e)
-            problems.add_error(PersisterError("Unexpected error"))
         if problems:
             return Err(problems)
         else:
             return Ok()
 
+    def _remove_day(self, day_name: str, problems: Problems) -> bool:
+        """Remove a whole day directory, which must hold the oldest pending files. Return False, removing nothing, if
+        its files are not the first in self._pending."""
+        uids = list(itertools.islice(self._pending, self._day_counts[day_name]))
+        for uid in uids:
+            if self._pending[uid].parent.name != day_name:
+                return False
+        for uid in uids:
+            self._remove_entry(uid)
+        shutil.rmtree(self._base_dir / day_name, ignore_errors=True)
+        self._append_index({"r": day_name}, problems)
+        return True
+
     def clear(self, uid: str) -> Result[bool, Problems]:
         problems = Problems()
-        path = self._pending.pop(uid, None)
+        path = self._remove_entry(uid)
         if path:
-            if path.exists():
-                self._curr_bytes -= path.stat().st_size
+            try:
                 path.unlink()
-                if next(path.parent.iterdir(), None) is None:
-                    shutil.rmtree(path.parent, ignore_errors=True)
-            else:
+            except FileNotFoundError:
                 problems.add_warning(FileMissingWarning(uid=uid, path=path))
+            if path.parent.name not in self._day_counts:
+                try:
+                    path.parent.rmdir()
+                except OSError:
+                    pass
+            self._append_index({"c": uid}, problems)
         else:
             problems.add_warning(UIDMissingWarning(uid=uid, path=path))
         if problems:
@@ -316,6 +570,51 @@ class TimedRollingFilePersister(PersisterInterface):
         else:
             return Ok()
 
+    def _add_entry(self, uid: str, path: Path, entry: _PendingIndexEntry) -> None:
+        day_name = path.parent.name
+        self._pending[uid] = path
+        self._index_entries[uid] = entry
+        self._day_counts[day_name] = self._day_counts.get(day_name, 0) + 1
+        self._day_bytes[day_name] = self._day_bytes.get(day_name, 0) + entry.size
+        self._curr_bytes += entry.size
+
+    def _remove_entry(self, uid: str) -> Optional[Path]:
+        path = self._pending.pop(uid, None)
+        if path is not None:
+            entry = self._index_entries.pop(uid)
+            day_name = path.parent.name
+            self._curr_bytes -= entry.size
+            if self._day_counts[day_name] > 1:
+                self._day_counts[day_name] -= 1
+                self._day_bytes[day_name] -= entry.size
+            else:
+                self._day_counts.pop(day_name)
+                self._day_bytes.pop(day_name)
+        return path
+
+    def _count_entries(self) -> None:
+        """Recompute the byte and file counts from self._pending and self._index_entries."""
+        self._curr_bytes = 0
+        self._day_counts = dict()
+        self._day_bytes = dict()
+        for uid, path in self._pending.items():
+            size = self._index_entries[uid].size
+            day_name = path.parent.name
+            self._day_counts[day_name] = self._day_counts.get(day_name, 0) + 1
+            self._day_bytes[day_name] = self._day_bytes.get(day_name, 0) + size
+            self._curr_bytes += size
+
+    def commit(self) -> Result[bool, Problems]:
+        return self._syncer.commit()
+
+    def flush(self) -> Result[bool, Problems]:
+        return self._syncer.sync()
+
+    def close(self) -> Result[bool, Problems]:
+        result = self.flush()
+        self._close_index()
+        return result
+
     def pending(self) -> list[str]:
         return list(self._pending.keys())
 
@@ -329,6 +628,10 @@ class TimedRollingFilePersister(PersisterInterface):
     def get_path(self, uid: str) -> Optional[Path]:
         return self._pending.get(uid, None)
 
+    def content_size(self, uid: str) -> Optional[int]:
+        entry = self._index_entries.get(uid, None)
+        return None if entry is None else entry.size
+
     def retrieve(self, uid: str) -> Result[Optional[bytes], Problems]:
         problems = Problems()
         content: Optional[bytes] = None
@@ -350,9 +653,10 @@ class TimedRollingFilePersister(PersisterInterface):
             return Ok(content)
 
     def reindex(self) -> Result[bool, Problems]:
+        """Re-create the pending index by scanning every persisted file, then checkpoint it to the index file."""
         problems = Problems()
-        self._curr_bytes = 0
         paths: list[_PersistedItem] = []
+        sizes: dict[Path, int] = dict()
         for base_dir_entry in self._base_dir.iterdir():
             # noinspection PyBroadException
             try:
@@ -361,18 +665,138 @@ class TimedRollingFilePersister(PersisterInterface):
                         # noinspection PyBroadException
                         try:
                             if persisted_item := self._persisted_item_from_file_path(day_dir_entry):
-                                self._curr_bytes += persisted_item.path.stat().st_size
+                                sizes[persisted_item.path] = persisted_item.path.stat().st_size
                                 paths.append(persisted_item)
                         except BaseException as e:
                             problems.add_error(e).add_error(ReindexError(path=day_dir_entry))
             except BaseException as e:
                 problems.add_error(e).add_error(ReindexError())
         self._pending = dict(sorted(paths, key=lambda item: item.path))
+        self._index_entries = {
+            uid: _PendingIndexEntry(sizes[path], self._timestamp_from_name(path.name))
+            for uid, path in self._pending.items()
+        }
+        self._count_entries()
+        self._write_index(problems)
         if problems:
             return Err(problems)
         else:
             return Ok()
 
+    def _index_record(self, uid: str) -> dict:
+        entry = self._index_entries[uid]
+        path = self._pending[uid]
+        return {
+            "u": uid,
+            "p": f"{path.parent.name}/{path.name}",
+            "s": entry.size,
+            "t": entry.timestamp,
+        }
+
+    def _append_index(self, record: dict, problems: Problems) -> None:
+        """Append one record to the index journal, compacting the journal into a checkpoint once it is mostly
+        superseded records. If the journal cannot be written it is removed, so that the next startup falls back to a
+        full reindex() rather than trusting an incomplete index."""
+        try:
+            if self._index_file is None:
+                self._index_file = self.index_path.open("a")
+            self._index_file.write(json.dumps(record, separators=(",", ":")) + "\n")
+            self._index_file.flush()
+            self._index_lines += 1
+        except BaseException as e:
+            problems.add_warning(e).add_warning(IndexWriteFailedWarning(uid=record.get("u", record.get("c", ""))))
+            self._close_index()
+            self.index_path.unlink(missing_ok=True)
+            return
+        if self._index_lines > max(self.INDEX_COMPACTION_MIN_LINES, 2 * len(self._pending)):
+            self._write_index(problems)
+
+    def _write_index(self, problems: Problems) -> None:
+        """Atomically replace the index journal with a checkpoint of the current pending set."""
+        self._close_index()
+        tmp_path = self.index_path.with_suffix(".tmp")
+        try:
+            with tmp_path.open("w") as f:
+                for uid in self._pending:
+                    f.write(json.dumps(self._index_record(uid), separators=(",", ":")) + "\n")
+            os.replace(tmp_path, self.index_path)
+            self._index_lines = len(self._pending)
+        except BaseException as e:
+            problems.add_warning(e).add_warning(IndexWriteFailedWarning(path=self.index_path))
+            tmp_path.unlink(missing_ok=True)
+            self.index_path.unlink(missing_ok=True)
+
+    def _close_index(self) -> None:
+        if self._index_file is not None:
+            # noinspection PyBroadException
+            try:
+                self._index_file.close()
+            except BaseException:  # pragma: no cover
+                pass
+            self._index_file = None
+
+    def _load_index(self) -> bool:
+        """Load the pending index from the index journal. Return False, leaving the persister unchanged, if the journal
+        is missing, unreadable or stale."""
+        pending: dict[str, Path] = dict()
+        entries: dict[str, _PendingIndexEntry] = dict()
+        lines = 0
+        # noinspection PyBroadException
+        try:
+            with self.index_path.open("r") as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        return False
+                    self._apply_index_record(json.loads(line), pending, entries)
+                    lines += 1
+            if not self._index_is_current(pending):
+                return False
+        except BaseException:
+            return False
+        self._pending = pending
+        self._index_entries = entries
+        self._index_lines = lines
+        self._count_entries()
+        return True
+
+    def _apply_index_record(
+        self,
+        record: dict,
+        pending: dict[str, Path],
+        entries: dict[str, _PendingIndexEntry],
+    ) -> None:
+        """Apply one journal record to the pending index being loaded. Records of directory mtimes, written by earlier
+        versions, are ignored."""
+        if "r" in record:
+            for uid in [uid for uid, path in pending.items() if path.parent.name == record["r"]]:
+                pending.pop(uid)
+                entries.pop(uid)
+        elif "c" in record:
+            entries.pop(record["c"])
+            pending.pop(record["c"])
+        elif "u" in record:
+            uid = record["u"]
+            pending.pop(uid, None)
+            pending[uid] = self._base_dir / record["p"]
+            entries[uid] = _PendingIndexEntry(record["s"], record["t"])
+
+    def _index_is_current(self, pending: dict[str, Path]) -> bool:
+        """Verify the index against the day directories only, without visiting the persisted files: each day directory
+        must hold as many entries as the index records pending in it."""
+        day_counts: dict[str, int] = dict()
+        for path in pending.values():
+            day_counts[path.parent.name] = day_counts.get(path.parent.name, 0) + 1
+        for day_dir in self._day_dirs():
+            with os.scandir(day_dir) as day_dir_entries:
+                if sum(1 for _ in day_dir_entries) != day_counts.pop(day_dir.name, 0):
+                    return False
+        return not day_counts
+
+    def _day_dirs(self) -> list[Path]:
+        return [
+            entry for entry in self._base_dir.iterdir() if entry.is_dir() and self._is_iso_parseable(entry)
+        ]
+
     def _today_dir(self) -> Path:
         return self._base_dir / pendulum.today("utc").isoformat()
 
@@ -382,10 +806,19 @@ class TimedRollingFilePersister(PersisterInterface):
             self._curr_dir = today_dir
         if not self._curr_dir.exists():
             self._curr_dir.mkdir(parents=True, exist_ok=True)
+            self._syncer.created_dir(self._curr_dir)
 
     @classmethod
     def _make_name(cls, dt: DateTime, uid: str) -> str:
-        return f"{dt.isoformat()}.uid[{uid}].json"
+        return cls._make_name_from_timestamp(dt.isoformat(), uid)
+
+    @classmethod
+    def _make_name_from_timestamp(cls, timestamp: str, uid: str) -> str:
+        return f"{timestamp}.uid[{uid}].json"
+
+    @classmethod
+    def _timestamp_from_name(cls, name: str) -> str:
+        return name.split(".uid[", 1)[0]
 
     @classmethod
     def _persisted_item_from_file_path(cls, filepath: Path) -> Optional[_PersistedItem]:
@@ -408,3 +841,1310 @@ class TimedRollingFilePersister(PersisterInterface):
             return isinstance(pendulum.parse(s), DateTime)
         except:
             return False
+
+
+class _SegmentEntry(NamedTuple):
+    segment: int
+    offset: int
+    length: int
+
+
+@dataclass
+class _Segment:
+    seq: int
+    path: Path
+    index_path: Path
+    size: int = 0
+    live: int = 0
+    file: Optional[BinaryIO] = None
+    index_file: Optional[TextIO] = None
+
+
+class SegmentedLogPersister(PersisterInterface):
+    """Persist content by appending length-prefixed records to segment files.
+
+    Each record in a segment file is a RECORD_HEADER (uid length, content length) followed by the utf-8 uid and the
+    content. Each segment has a small text index, appended to as records are persisted ("+ offset length uid") and
+    cleared ("- uid"). A segment and its index are deleted once every record in the segment has been cleared. The
+    files of the segment being appended to are kept open between persists. reindex() recovers records which are
+    missing from an index, such as those written just before a crash, by scanning the segment file from the end of
+    the last indexed record, or from its start if the index file is missing.
+    """
+    DEFAULT_MAX_BYTES: int = 500 * 1024 * 1024
+    DEFAULT_MAX_SEGMENT_BYTES: int = 4 * 1024 * 1024
+    SEGMENT_SUFFIX: str = ".seg"
+    INDEX_SUFFIX: str = ".idx"
+    RECORD_HEADER: struct.Struct = struct.Struct("<HI")
+    UID_ENCODING: str = "utf-8"
+
+    _base_dir: Path
+    _max_bytes: int = DEFAULT_MAX_BYTES
+    _max_segment_bytes: int = DEFAULT_MAX_SEGMENT_BYTES
+    _pending: dict[str, _SegmentEntry]
+    _segments: dict[int, _Segment]
+    _curr_segment: Optional[_Segment]
+    _next_seq: int
+    _curr_bytes: int
+    _syncer: FileSyncer
+
+    def __init__(
+        self,
+        base_dir: Path | str,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_segment_bytes: int = DEFAULT_MAX_SEGMENT_BYTES,
+        syncer: Optional[FileSyncer] = None,
+    ):
+        self._base_dir = Path(base_dir).resolve()
+        self._max_bytes = max_bytes
+        self._max_segment_bytes = max_segment_bytes
+        self._syncer = FileSyncer() if syncer is None else syncer
+        self._segments = dict()
+        self.reindex()
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes
+
+    @property
+    def max_segment_bytes(self) -> int:
+        return self._max_segment_bytes
+
+    @property
+    def curr_bytes(self) -> int:
+        return self._curr_bytes
+
+    @property
+    def base_dir(self) -> Path:
+        return self._base_dir
+
+    @property
+    def num_segments(self) -> int:
+        return len(self._segments)
+
+    def persist(self, uid: str, content: bytes, type_name: str = "") -> Result[bool, Problems]:
+        problems = Problems()
+        try:
+            if len(content) > self._max_bytes:
+                return Err(
+                    problems.add_error(
+                        ContentTooLarge(
+                            f"content bytes ({len(content)} > max bytes {self._max_bytes}",
+                            uid=uid,
+                        )
+                    )
+                )
+            if uid in self._pending:
+                problems.add_warning(UIDExistedWarning(uid=uid, path=self.get_path(uid)))
+                match self.clear(uid):
+                    case Err(clear_problems):
+                        problems.add_problems(clear_problems)
+            if len(content) + self._curr_bytes > self._max_bytes:
+                trimmed = self._trim_old_storage(len(content))
+                match trimmed:
+                    case Err(trim_problems):
+                        problems.add_problems(trim_problems)
+                        if problems.errors:
+                            return Err(problems.add_error(TrimFailed(uid=uid)))
+            uid_bytes = uid.encode(self.UID_ENCODING)
+            record_header = self.RECORD_HEADER.pack(len(uid_bytes), len(content))
+            segment = self._writable_segment(len(record_header) + len(uid_bytes) + len(content))
+            offset = segment.size + len(record_header) + len(uid_bytes)
+            try:
+                f, index_file = self._segment_files(segment)
+                f.write(record_header)
+                f.write(uid_bytes)
+                f.write(content)
+                f.flush()
+                self._syncer.written(f, segment.path)
+                index_file.write(f"+ {offset} {len(content)} {uid}\n")
+                index_file.flush()
+                self._syncer.written(index_file, segment.index_path)
+            except BaseException as e:  # pragma: no cover
+                self._close_segment_files(segment)
+                return Err(
+                    problems.add_error(e).add_error(
+                        WriteFailed("Open or write failed", uid=uid, path=segment.path)
+                    )
+                )
+            segment.size = offset + len(content)
+            segment.live += 1
+            self._pending[uid] = _SegmentEntry(segment.seq, offset, len(content))
+            self._curr_bytes += len(content)
+            match self._syncer.sync_if_due():
+                case Err(sync_problems):
+                    problems.add_problems(sync_problems)
+        except BaseException as e:
+            return Err(problems.add_error(e).add_error(PersisterError(
+                "Unexpected error", uid=uid
+            )))
+        if problems:
+            return Err(problems)
+        else:
+            return Ok()
+
+    def _trim_old_storage(self, needed_bytes: int) -> Result[bool, Problems]:
+        problems = Problems()
+        while self._pending and self._curr_bytes > self._max_bytes - needed_bytes:
+            uid = next(iter(self._pending))
+            try:
+                match self.clear(uid):
+                    case Err(other):
+                        problems.add_problems(other)
+            except BaseException as e:
+                problems.add_error(e)
+                problems.add_error(PersisterError("Unexpected error", uid=uid))
+        if problems:
+            return Err(problems)
+        else:
+            return Ok()
+
+    def clear(self, uid: str) -> Result[bool, Problems]:
+        problems = Problems()
+        entry = self._pending.pop(uid, None)
+        if entry:
+            self._curr_bytes -= entry.length
+            segment = self._segments[entry.segment]
+            segment.live -= 1
+            try:
+                if segment.live <= 0:
+                    self._remove_segment(segment)
+                elif not segment.path.exists():
+                    problems.add_warning(FileMissingWarning(uid=uid, path=segment.path))
+                elif segment.index_file is not None:
+                    segment.index_file.write(f"- {uid}\n")
+                    segment.index_file.flush()
+                else:
+                    with segment.index_path.open("a", encoding=self.UID_ENCODING) as f:
+                        f.write(f"- {uid}\n")
+            except BaseException as e:  # pragma: no cover
+                problems.add_error(e).add_error(PersisterError("Unexpected error", uid=uid, path=segment.path))
+        else:
+            problems.add_warning(UIDMissingWarning(uid=uid))
+        if problems:
+            return Err(problems)
+        else:
+            return Ok()
+
+    def commit(self) -> Result[bool, Problems]:
+        return self._syncer.commit()
+
+    def flush(self) -> Result[bool, Problems]:
+        return self._syncer.sync()
+
+    def close(self) -> Result[bool, Problems]:
+        result = self.flush()
+        for segment in self._segments.values():
+            self._close_segment_files(segment)
+        return result
+
+    def pending(self) -> list[str]:
+        return list(self._pending.keys())
+
+    @property
+    def num_pending(self) -> int:
+        return len(self._pending)
+
+    def __contains__(self, uid: str) -> bool:
+        return uid in self._pending
+
+    def get_path(self, uid: str) -> Optional[Path]:
+        entry = self._pending.get(uid, None)
+        if entry is None:
+            return None
+        return self._segments[entry.segment].path
+
+    def content_size(self, uid: str) -> Optional[int]:
+        entry = self._pending.get(uid, None)
+        return None if entry is None else entry.length
+
+    def retrieve(self, uid: str) -> Result[Optional[bytes], Problems]:
+        problems = Problems()
+        content: Optional[bytes] = None
+        entry = self._pending.get(uid, None)
+        if entry:
+            path = self._segments[entry.segment].path
+            if path.exists():
+                try:
+                    with path.open("rb") as f:
+                        f.seek(entry.offset)
+                        content = f.read(entry.length)
+                    if len(content) != entry.length:
+                        problems.add_error(
+                            ReadFailed(f"Read {len(content)} bytes, expected {entry.length}", uid=uid, path=path)
+                        )
+                except BaseException as e:  # pragma: no cover
+                    problems.add_error(e).add_error(
+                        ReadFailed("Open or read failed", uid=uid, path=path)
+                    )
+            else:
+                problems.add_error(FileMissing(uid=uid, path=path))
+        if problems:
+            return Err(problems)
+        else:
+            return Ok(content)
+
+    def iter_pending(self, chunk_size: int = DEFAULT_PENDING_CHUNK_SIZE) -> Iterator[list[PendingContent]]:
+        """Yield pending content as PersisterInterface.iter_pending(), memory-mapping each segment a chunk spans once
+        instead of opening the segment for each event."""
+        entries = list(self._pending.items())
+        for start in range(0, len(entries), chunk_size):
+            chunk = []
+            maps: dict[int, mmap.mmap] = dict()
+            try:
+                for uid, entry in entries[start:start + chunk_size]:
+                    if self._pending.get(uid, None) == entry:
+                        chunk.append(self._read_mapped(uid, entry, maps))
+            finally:
+                for mapped in maps.values():
+                    mapped.close()
+            if chunk:
+                yield chunk
+
+    def _read_mapped(self, uid: str, entry: _SegmentEntry, maps: dict[int, mmap.mmap]) -> PendingContent:
+        """Read the content of entry from its segment, mapping the segment into maps if it is not already."""
+        segment = self._segments.get(entry.segment, None)
+        if segment is None or not segment.path.exists():
+            return PendingContent(uid, None, Problems(errors=[FileMissing(uid=uid, path=self.get_path(uid))]))
+        try:
+            if entry.segment not in maps:
+                with segment.path.open("rb") as f:
+                    maps[entry.segment] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            mapped = maps[entry.segment]
+            if entry.offset + entry.length > len(mapped):
+                return PendingContent(uid, None, Problems(errors=[ReadFailed(
+                    f"Segment has {len(mapped)} bytes, expected {entry.offset + entry.length}",
+                    uid=uid,
+                    path=segment.path,
+                )]))
+            return PendingContent(uid, mapped[entry.offset:entry.offset + entry.length])
+        except BaseException as e:  # pragma: no cover
+            return PendingContent(uid, None, Problems(errors=[
+                e, ReadFailed("Map or read failed", uid=uid, path=segment.path)
+            ]))
+
+    def reindex(self) -> Result[bool, Problems]:
+        problems = Problems()
+        for segment in self._segments.values():
+            self._close_segment_files(segment)
+        self._pending = dict()
+        self._segments = dict()
+        self._curr_segment = None
+        self._next_seq = 0
+        self._curr_bytes = 0
+        if not self._base_dir.exists():
+            self._base_dir.mkdir(parents=True, exist_ok=True)
+        for seq, path in self._segment_paths():
+            self._next_seq = seq + 1
+            # noinspection PyBroadException
+            try:
+                self._add_segment(*self._load_segment(seq, path))
+            except BaseException as e:
+                problems.add_error(e).add_error(ReindexError(path=path))
+        self._remove_empty_segments(problems)
+        if problems:
+            return Err(problems)
+        else:
+            return Ok()
+
+    def _remove_empty_segments(self, problems: Problems) -> None:
+        for segment in list(self._segments.values()):
+            if segment.live <= 0:
+                # noinspection PyBroadException
+                try:
+                    self._remove_segment(segment)
+                except BaseException as e:  # pragma: no cover
+                    problems.add_error(e).add_error(ReindexError(path=segment.path))
+
+    def _segment_paths(self) -> list[tuple[int, Path]]:
+        """The sequence numbers and paths of the segment files, oldest first."""
+        return sorted(
+            (int(base_dir_entry.stem), base_dir_entry)
+            for base_dir_entry in self._base_dir.iterdir()
+            if base_dir_entry.suffix == self.SEGMENT_SUFFIX and base_dir_entry.stem.isdigit()
+        )
+
+    def _load_segment(self, seq: int, path: Path) -> tuple[_Segment, dict[str, _SegmentEntry]]:
+        """Read the records of a segment from its index, and from the part of the segment after the last indexed
+        record."""
+        segment = _Segment(seq, path, path.with_suffix(self.INDEX_SUFFIX), size=path.stat().st_size)
+        if segment.index_path.exists():
+            entries, indexed_end = self._load_segment_index(segment)
+        else:
+            entries, indexed_end = dict(), 0
+        for uid, entry in self._scan_segment(segment, indexed_end).items():
+            entries.pop(uid, None)
+            entries[uid] = entry
+        return segment, entries
+
+    def _add_segment(self, segment: _Segment, entries: dict[str, _SegmentEntry]) -> None:
+        """Add a segment read by reindex(), whose records replace any of earlier segments with the same uid."""
+        self._segments[segment.seq] = segment
+        for uid, entry in entries.items():
+            if (existing := self._pending.pop(uid, None)) is not None:
+                self._segments[existing.segment].live -= 1
+                self._curr_bytes -= existing.length
+            self._pending[uid] = entry
+            self._curr_bytes += entry.length
+            segment.live += 1
+
+    def _load_segment_index(self, segment: _Segment) -> tuple[dict[str, _SegmentEntry], int]:
+        """Return the records of segment named by its index, and the offset in segment following the last record
+        which was indexed."""
+        entries: dict[str, _SegmentEntry] = dict()
+        indexed_end = 0
+        with segment.index_path.open("r", encoding=self.UID_ENCODING) as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break
+                line = line[:-1]
+                if line.startswith("+ "):
+                    offset_str, length_str, uid = line[2:].split(" ", 2)
+                    entry = _SegmentEntry(segment.seq, int(offset_str), int(length_str))
+                    if entry.offset + entry.length <= segment.size:
+                        entries.pop(uid, None)
+                        entries[uid] = entry
+                        indexed_end = max(indexed_end, entry.offset + entry.length)
+                elif line.startswith("- "):
+                    entries.pop(line[2:], None)
+        return entries, indexed_end
+
+    def _scan_segment(self, segment: _Segment, start: int = 0) -> dict[str, _SegmentEntry]:
+        """Return the complete records of segment from offset start to its end."""
+        entries: dict[str, _SegmentEntry] = dict()
+        with segment.path.open("rb") as f:
+            f.seek(start)
+            data = f.read()
+        offset = 0
+        while offset + self.RECORD_HEADER.size <= len(data):
+            uid_length, content_length = self.RECORD_HEADER.unpack_from(data, offset)
+            uid_offset = offset + self.RECORD_HEADER.size
+            content_offset = uid_offset + uid_length
+            if content_offset + content_length > len(data):
+                break
+            uid = data[uid_offset:content_offset].decode(self.UID_ENCODING)
+            entries.pop(uid, None)
+            entries[uid] = _SegmentEntry(segment.seq, start + content_offset, content_length)
+            offset = content_offset + content_length
+        return entries
+
+    def _writable_segment(self, record_bytes: int) -> _Segment:
+        segment = self._curr_segment
+        if segment is None or (segment.size and segment.size + record_bytes > self._max_segment_bytes):
+            name = f"{self._next_seq:010d}"
+            segment = _Segment(
+                self._next_seq,
+                self._base_dir / (name + self.SEGMENT_SUFFIX),
+                self._base_dir / (name + self.INDEX_SUFFIX),
+            )
+            if not self._base_dir.exists():
+                self._base_dir.mkdir(parents=True, exist_ok=True)
+            if self._curr_segment is not None:
+                self._close_segment_files(self._curr_segment)
+            self._segments[segment.seq] = segment
+            self._curr_segment = segment
+            self._next_seq += 1
+        return segment
+
+    def _segment_files(self, segment: _Segment) -> tuple[BinaryIO, TextIO]:
+        """The segment and index files of segment, opened for appending on first use and kept open."""
+        if segment.file is None:
+            segment.file = segment.path.open("ab")
+        if segment.index_file is None:
+            segment.index_file = segment.index_path.open("a", encoding=self.UID_ENCODING)
+        return segment.file, segment.index_file
+
+    @classmethod
+    def _close_segment_files(cls, segment: _Segment) -> None:
+        for f in (segment.file, segment.index_file):
+            if f is not None:
+                # noinspection PyBroadException
+                try:
+                    f.close()
+                except BaseException:  # pragma: no cover
+                    pass
+        segment.file = None
+        segment.index_file = None
+
+    def _remove_segment(self, segment: _Segment) -> None:
+        self._close_segment_files(segment)
+        self._segments.pop(segment.seq, None)
+        if segment is self._curr_segment:
+            self._curr_segment = None
+        segment.path.unlink(missing_ok=True)
+        segment.index_path.unlink(missing_ok=True)
+
+
+class PendingEventInfo(NamedTuple):
+    uid: str
+    timestamp: str
+    type_name: str
+    size: int
+
+
+class SQLitePersister(PersisterInterface):
+    """Persist content as rows of a single SQLite database, DATABASE_FILE_NAME in base_dir, in WAL mode.
+
+    The events table is keyed by uid and records the timestamp, type name and size of each event next to its content.
+    Pending uids are reported in the order they were persisted (rowid order); the number and total size of pending
+    events are counted once at startup and then kept in memory. Trimming to max_bytes deletes the oldest rows with a
+    single statement. pending_info() and pending_by_type() query the backlog by type name and time range for
+    diagnostics.
+
+    Each persist() and clear() is its own transaction. durability sets the synchronous pragma: OFF (none), NORMAL
+    (periodic; the WAL is synced when it is checkpointed, as by flush()) or FULL (per_event). The connection may be
+    used from more than one thread, one statement at a time.
+    """
+    DEFAULT_MAX_BYTES: int = 500 * 1024 * 1024
+    DATABASE_FILE_NAME: str = "events.sqlite3"
+    SYNCHRONOUS: dict[PersisterDurability, str] = {
+        PersisterDurability.none: "OFF",
+        PersisterDurability.periodic: "NORMAL",
+        PersisterDurability.per_event: "FULL",
+    }
+
+    _base_dir: Path
+    _max_bytes: int = DEFAULT_MAX_BYTES
+    _durability: PersisterDurability
+    _connection: sqlite3.Connection
+    _lock: threading.Lock
+    _num_pending: int
+    _curr_bytes: int
+
+    def __init__(
+        self,
+        base_dir: Path | str,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        durability: PersisterDurability = PersisterDurability.none,
+    ):
+        self._base_dir = Path(base_dir).resolve()
+        self._max_bytes = max_bytes
+        self._durability = durability
+        self._lock = threading.Lock()
+        self._base_dir.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(
+            self.database_path,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(f"PRAGMA synchronous={self.SYNCHRONOUS[durability]}")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            "uid TEXT PRIMARY KEY NOT NULL, "
+            "timestamp TEXT NOT NULL, "
+            "type_name TEXT NOT NULL, "
+            "size INTEGER NOT NULL, "
+            "content BLOB NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS events_timestamp ON events (timestamp)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS events_type_name ON events (type_name, timestamp)")
+        self.reindex()
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes
+
+    @property
+    def curr_bytes(self) -> int:
+        return self._curr_bytes
+
+    @property
+    def base_dir(self) -> Path:
+        return self._base_dir
+
+    @property
+    def database_path(self) -> Path:
+        return self._base_dir / self.DATABASE_FILE_NAME
+
+    def persist(self, uid: str, content: bytes, type_name: str = "") -> Result[bool, Problems]:
+        problems = Problems()
+        try:
+            if len(content) > self._max_bytes:
+                return Err(
+                    problems.add_error(
+                        ContentTooLarge(
+                            f"content bytes ({len(content)} > max bytes {self._max_bytes}",
+                            uid=uid,
+                        )
+                    )
+                )
+            if uid in self:
+                problems.add_warning(UIDExistedWarning(uid=uid, path=self.database_path))
+                match self.clear(uid):
+                    case Err(clear_problems):
+                        problems.add_problems(clear_problems)
+            if len(content) + self._curr_bytes > self._max_bytes:
+                match self._trim_old_storage(len(content)):
+                    case Err(trim_problems):
+                        problems.add_problems(trim_problems)
+                        if problems.errors:
+                            return Err(problems.add_error(TrimFailed(uid=uid)))
+            try:
+                with self._lock:
+                    self._connection.execute(
+                        "INSERT INTO events (uid, timestamp, type_name, size, content) VALUES (?, ?, ?, ?, ?)",
+                        (uid, pendulum.now("utc").isoformat(), type_name, len(content), content),
+                    )
+            except BaseException as e:
+                return Err(
+                    problems.add_error(e).add_error(
+                        WriteFailed("Insert failed", uid=uid, path=self.database_path)
+                    )
+                )
+            self._num_pending += 1
+            self._curr_bytes += len(content)
+        except BaseException as e:
+            return Err(problems.add_error(e).add_error(PersisterError(
+                "Unexpected error", uid=uid
+            )))
+        if problems:
+            return Err(problems)
+        else:
+            return Ok()
+
+    def _trim_old_storage(self, needed_bytes: int) -> Result[bool, Problems]:
+        """Delete the oldest rows, in one statement, until needed_bytes fit in max_bytes."""
+        problems = Problems()
+        try:
+            with self._lock:
+                last_rowid = None
+                num_trimmed = 0
+                trimmed_bytes = 0
+                for rowid, size in self._connection.execute("SELECT rowid, size FROM events ORDER BY rowid"):
+                    if self._curr_bytes - trimmed_bytes <= self._max_bytes - needed_bytes:
+                        break
+                    last_rowid = rowid
+                    num_trimmed += 1
+                    trimmed_bytes += size
+                if last_rowid is not None:
+                    self._connection.execute("DELETE FROM events WHERE rowid <= ?", (last_rowid,))
+                    self._num_pending -= num_trimmed
+                    self._curr_bytes -= trimmed_bytes
+        except BaseException as e:
+            problems.add_error(e).add_error(PersisterError("Unexpected error", path=self.database_path))
+        if problems:
+            return Err(problems)
+        else:
+            return Ok()
+
+    def clear(self, uid: str) -> Result[bool, Problems]:
+        problems = Problems()
+        try:
+            # SELECT then DELETE rather than DELETE ... RETURNING, which requires SQLite 3.35.
+            with self._lock:
+                self._connection.execute("BEGIN")
+                try:
+                    row = self._connection.execute("SELECT size FROM events WHERE uid = ?", (uid,)).fetchone()
+                    if row is not None:
+                        self._connection.execute("DELETE FROM events WHERE uid = ?", (uid,))
+                    self._connection.execute("COMMIT")
+                except BaseException:
+                    self._connection.execute("ROLLBACK")
+                    raise
+            if row is None:
+                problems.add_warning(UIDMissingWarning(uid=uid))
+            else:
+                self._num_pending -= 1
+                self._curr_bytes -= row[0]
+        except BaseException as e:
+            problems.add_error(e).add_error(PersisterError("Unexpected error", uid=uid, path=self.database_path))
+        if problems:
+            return Err(problems)
+        else:
+            return Ok()
+
+    def flush(self) -> Result[bool, Problems]:
+        if self._durability != PersisterDurability.none:
+            try:
+                with self._lock:
+                    self._connection.execute("PRAGMA wal_checkpoint(FULL)")
+            except BaseException as e:
+                return Err(Problems(errors=[e, SyncFailed(path=self.database_path)]))
+        return Ok()
+
+    def close(self) -> Result[bool, Problems]:
+        result = self.flush()
+        with self._lock:
+            self._connection.close()
+        return result
+
+    def pending(self) -> list[str]:
+        with self._lock:
+            return [row[0] for row in self._connection.execute("SELECT uid FROM events ORDER BY rowid")]
+
+    @property
+    def num_pending(self) -> int:
+        return self._num_pending
+
+    def __contains__(self, uid: str) -> bool:
+        with self._lock:
+            return self._connection.execute("SELECT 1 FROM events WHERE uid = ?", (uid,)).fetchone() is not None
+
+    def content_size(self, uid: str) -> Optional[int]:
+        with self._lock:
+            row = self._connection.execute("SELECT size FROM events WHERE uid = ?", (uid,)).fetchone()
+        return None if row is None else row[0]
+
+    def retrieve(self, uid: str) -> Result[Optional[bytes], Problems]:
+        problems = Problems()
+        content: Optional[bytes] = None
+        try:
+            with self._lock:
+                row = self._connection.execute("SELECT content FROM events WHERE uid = ?", (uid,)).fetchone()
+            if row is not None:
+                content = row[0]
+        except BaseException as e:
+            problems.add_error(e).add_error(ReadFailed("Select failed", uid=uid, path=self.database_path))
+        if problems:
+            return Err(problems)
+        else:
+            return Ok(content)
+
+    def iter_pending(self, chunk_size: int = DEFAULT_PENDING_CHUNK_SIZE) -> Iterator[list[PendingContent]]:
+        """Yield pending content as PersisterInterface.iter_pending(), selecting one chunk of rows at a time."""
+        with self._lock:
+            last_rowid = self._connection.execute("SELECT COALESCE(MAX(rowid), 0) FROM events").fetchone()[0]
+        rowid = 0
+        while rowid < last_rowid:
+            with self._lock:
+                rows = self._connection.execute(
+                    "SELECT rowid, uid, content FROM events WHERE rowid > ? AND rowid <= ? ORDER BY rowid LIMIT ?",
+                    (rowid, last_rowid, chunk_size),
+                ).fetchall()
+            if not rows:
+                break
+            rowid = rows[-1][0]
+            yield [PendingContent(uid, content) for _, uid, content in rows]
+
+    def reindex(self) -> Result[bool, Problems]:
+        """Recount the pending events and their total size."""
+        problems = Problems()
+        self._num_pending = 0
+        self._curr_bytes = 0
+        try:
+            with self._lock:
+                self._num_pending, self._curr_bytes = self._connection.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM events"
+                ).fetchone()
+        except BaseException as e:
+            problems.add_error(e).add_error(ReindexError(path=self.database_path))
+        if problems:
+            return Err(problems)
+        else:
+            return Ok()
+
+    def pending_info(
+        self,
+        type_name: Optional[str] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+    ) -> list[PendingEventInfo]:
+        """Return the pending events, in the order persisted, optionally only those of type_name and with
+        start <= timestamp < end, where start and end are ISO 8601 UTC timestamps."""
+        conditions = []
+        parameters = []
+        if type_name is not None:
+            conditions.append("type_name = ?")
+            parameters.append(type_name)
+        if start is not None:
+            conditions.append("timestamp >= ?")
+            parameters.append(start)
+        if end is not None:
+            conditions.append("timestamp < ?")
+            parameters.append(end)
+        query = "SELECT uid, timestamp, type_name, size FROM events"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        with self._lock:
+            return [
+                PendingEventInfo(*row) for row in self._connection.execute(query + " ORDER BY rowid", parameters)
+            ]
+
+    def pending_by_type(self) -> dict[str, tuple[int, int]]:
+        """Return the number and total size of pending events of each type name."""
+        with self._lock:
+            return {
+                type_name: (count, size)
+                for type_name, count, size in self._connection.execute(
+                    "SELECT type_name, COUNT(*), SUM(size) FROM events GROUP BY type_name ORDER BY type_name"
+                )
+            }
+
+
+class _RetainedItem(NamedTuple):
+    retention_class: str
+    size: int
+
+
+class RetentionPersister(PersisterInterface):
+    """Evict persisted events by retention class, selected by event TypeName, rather than strictly oldest first.
+
+    Before content is passed to the wrapped persister, space is made for it by evicting the oldest events of its own
+    class while that class exceeds its max_bytes, and then, while all pending content exceeds max_bytes, the oldest
+    events of the lowest priority class, then of the next, up to the priority of the class of the new event. If that
+    does not make enough space, the new content is rejected. Since the wrapped persister never exceeds max_bytes, it
+    does no trimming of its own, and events are evicted one at a time rather than by the backend's own trimming,
+    which for TimedRollingFilePersister removes whole day directories.
+
+    The class and size of each pending uid are appended to a journal, JOURNAL_FILE_NAME in journal_dir, so they are
+    known after a restart. The journal is kept open and its appends are buffered, being written by commit(), flush()
+    and close(). Cleared uids are dropped from the journal when it is compacted or loaded. Pending uids missing from
+    the journal, such as those whose records were still buffered at a crash, are assigned to the default class, with
+    the size the wrapped persister reports for them.
+    """
+    JOURNAL_FILE_NAME: str = "retention_index.jsonl"
+    JOURNAL_COMPACTION_MIN_LINES: int = 1024
+
+    _persister: PersisterInterface
+    _classes: list[RetentionClass]
+    _default_class: RetentionClass
+    _class_by_type_name: dict[str, RetentionClass]
+    _max_bytes: int
+    _curr_bytes: int
+    _items: dict[str, _RetainedItem]
+    _class_items: dict[str, dict[str, int]]
+    _stats: dict[str, RetentionClassStats]
+    _journal_path: Path
+    _journal_lines: int
+    _journal_file: Optional[TextIO] = None
+
+    def __init__(
+        self,
+        persister: PersisterInterface,
+        classes: Sequence[RetentionClass],
+        max_bytes: int,
+        journal_dir: Path | str,
+    ):
+        if not classes:
+            raise ValueError("ERROR. RetentionPersister requires at least one retention class")
+        self._persister = persister
+        self._classes = sorted(classes, key=lambda retention_class: retention_class.priority)
+        self._default_class = next(
+            (retention_class for retention_class in classes if not retention_class.type_names),
+            self._classes[0],
+        )
+        self._class_by_type_name = dict()
+        self._max_bytes = max_bytes
+        self._stats = {
+            retention_class.name: RetentionClassStats(
+                retention_class.name,
+                priority=retention_class.priority,
+                max_bytes=retention_class.max_bytes,
+            )
+            for retention_class in self._classes
+        }
+        self._journal_path = Path(journal_dir).resolve() / self.JOURNAL_FILE_NAME
+        self._load_journal()
+
+    @property
+    def persister(self) -> PersisterInterface:
+        return self._persister
+
+    @property
+    def stats(self) -> dict[str, RetentionClassStats]:
+        return self._stats
+
+    @property
+    def curr_bytes(self) -> int:
+        return self._curr_bytes
+
+    def retention_class(self, type_name: str) -> RetentionClass:
+        retention_class = self._class_by_type_name.get(type_name, None)
+        if retention_class is None:
+            retention_class = next(
+                (
+                    retention_class for retention_class in self._classes
+                    if any(fnmatch.fnmatchcase(type_name, pattern) for pattern in retention_class.type_names)
+                ),
+                self._default_class,
+            )
+            self._class_by_type_name[type_name] = retention_class
+        return retention_class
+
+    def persist(self, uid: str, content: bytes, type_name: str = "") -> Result[bool, Problems]:
+        problems = Problems()
+        retention_class = self.retention_class(type_name)
+        class_stats = self._stats[retention_class.name]
+        class_items = self._class_items[retention_class.name]
+        size = len(content)
+        if size > self._max_bytes or (retention_class.max_bytes is not None and size > retention_class.max_bytes):
+            class_stats.num_rejected += 1
+            return Err(
+                problems.add_error(
+                    ContentTooLarge(
+                        f"content bytes ({size}) exceed max bytes of retention class {retention_class.name}",
+                        uid=uid,
+                    )
+                )
+            )
+        self._forget(uid)
+        if retention_class.max_bytes is not None:
+            while class_items and class_stats.bytes + size > retention_class.max_bytes:
+                self._evict(next(iter(class_items)), problems)
+        for evicted_class in self._classes:
+            if evicted_class.priority > retention_class.priority:
+                break
+            evicted_items = self._class_items[evicted_class.name]
+            while evicted_items and self._curr_bytes + size > self._max_bytes:
+                self._evict(next(iter(evicted_items)), problems)
+        if self._curr_bytes + size > self._max_bytes:
+            class_stats.num_rejected += 1
+            return Err(
+                problems.add_error(
+                    RetentionBudgetExceeded(
+                        f"no space for content bytes ({size}) without evicting higher priority than "
+                        f"retention class {retention_class.name}",
+                        uid=uid,
+                    )
+                )
+            )
+        match self._persister.persist(uid, content, type_name):
+            case Err(persist_problems):
+                problems.add_problems(persist_problems)
+        if uid in self._persister:
+            self._remember(uid, _RetainedItem(retention_class.name, size))
+            self._append_journal(uid, problems)
+        if problems:
+            return Err(problems)
+        return Ok()
+
+    def clear(self, uid: str) -> Result[bool, Problems]:
+        self._forget(uid)
+        return self._persister.clear(uid)
+
+    def pending(self) -> list[str]:
+        return self._persister.pending()
+
+    @property
+    def num_pending(self) -> int:
+        return self._persister.num_pending
+
+    def __contains__(self, uid: str) -> bool:
+        return uid in self._persister
+
+    def retrieve(self, uid: str) -> Result[Optional[bytes], Problems]:
+        return self._persister.retrieve(uid)
+
+    def content_size(self, uid: str) -> Optional[int]:
+        return self._persister.content_size(uid)
+
+    def iter_pending(self, chunk_size: int = DEFAULT_PENDING_CHUNK_SIZE) -> Iterator[list[PendingContent]]:
+        return self._persister.iter_pending(chunk_size)
+
+    def reindex(self) -> Result[Optional[bool], Problems]:
+        result = self._persister.reindex()
+        self._load_journal()
+        return result
+
+    def commit(self) -> Result[bool, Problems]:
+        self._flush_journal()
+        return self._persister.commit()
+
+    def flush(self) -> Result[bool, Problems]:
+        self._flush_journal()
+        return self._persister.flush()
+
+    def close(self) -> Result[bool, Problems]:
+        self._close_journal()
+        return self._persister.close()
+
+    def _evict(self, uid: str, problems: Problems) -> None:
+        self._stats[self._items[uid].retention_class].num_evicted += 1
+        self._forget(uid)
+        match self._persister.clear(uid):
+            case Err(clear_problems):
+                problems.add_problems(clear_problems)
+
+    def _remember(self, uid: str, item: _RetainedItem) -> None:
+        self._items[uid] = item
+        self._class_items[item.retention_class][uid] = item.size
+        class_stats = self._stats[item.retention_class]
+        class_stats.pending += 1
+        class_stats.bytes += item.size
+        self._curr_bytes += item.size
+
+    def _forget(self, uid: str) -> None:
+        item = self._items.pop(uid, None)
+        if item is not None:
+            self._class_items[item.retention_class].pop(uid)
+            class_stats = self._stats[item.retention_class]
+            class_stats.pending -= 1
+            class_stats.bytes -= item.size
+            self._curr_bytes -= item.size
+
+    def _load_journal(self) -> None:
+        """Load the class and size of each pending uid from the journal, then checkpoint the journal."""
+        self._close_journal()
+        journaled: dict[str, _RetainedItem] = dict()
+        # noinspection PyBroadException
+        try:
+            with self._journal_path.open("r") as f:
+                for line in f:
+                    if line.endswith("\n"):
+                        record = json.loads(line)
+                        journaled[record["u"]] = _RetainedItem(record["k"], record["s"])
+        except BaseException:
+            pass
+        self._items = dict()
+        self._class_items = {retention_class.name: dict() for retention_class in self._classes}
+        self._curr_bytes = 0
+        for class_stats in self._stats.values():
+            class_stats.pending = 0
+            class_stats.bytes = 0
+        for uid in self._persister.pending():
+            item = journaled.get(uid, None)
+            if item is None:
+                item = _RetainedItem(self._default_class.name, self._persister.content_size(uid) or 0)
+            elif item.retention_class not in self._class_items:
+                item = _RetainedItem(self._default_class.name, item.size)
+            self._remember(uid, item)
+        self._write_journal(Problems())
+
+    def _append_journal(self, uid: str, problems: Problems) -> None:
+        item = self._items[uid]
+        try:
+            if self._journal_file is None:
+                self._journal_file = self._journal_path.open("a")
+            self._journal_file.write(
+                json.dumps({"u": uid, "k": item.retention_class, "s": item.size}, separators=(",", ":")) + "\n"
+            )
+            self._journal_lines += 1
+        except BaseException as e:
+            problems.add_warning(e).add_warning(IndexWriteFailedWarning(uid=uid, path=self._journal_path))
+            self._close_journal()
+            return
+        if self._journal_lines > max(self.JOURNAL_COMPACTION_MIN_LINES, 2 * len(self._items)):
+            self._write_journal(problems)
+
+    def _write_journal(self, problems: Problems) -> None:
+        """Atomically replace the journal with the class and size of each pending uid."""
+        self._close_journal()
+        tmp_path = self._journal_path.with_suffix(".tmp")
+        try:
+            with tmp_path.open("w") as f:
+                for uid, item in self._items.items():
+                    f.write(
+                        json.dumps({"u": uid, "k": item.retention_class, "s": item.size}, separators=(",", ":")) + "\n"
+                    )
+            os.replace(tmp_path, self._journal_path)
+            self._journal_lines = len(self._items)
+        except BaseException as e:
+            problems.add_warning(e).add_warning(IndexWriteFailedWarning(path=self._journal_path))
+            tmp_path.unlink(missing_ok=True)
+            self._journal_lines = 0
+
+    def _flush_journal(self) -> None:
+        if self._journal_file is not None:
+            # noinspection PyBroadException
+            try:
+                self._journal_file.flush()
+            except BaseException:  # pragma: no cover
+                self._close_journal()
+
+    def _close_journal(self) -> None:
+        if self._journal_file is not None:
+            # noinspection PyBroadException
+            try:
+                self._journal_file.close()
+            except BaseException:  # pragma: no cover
+                pass
+            self._journal_file = None
+
+
+class _WriteOp(NamedTuple):
+    uid: str
+    content: Optional[bytes]
+    type_name: str = ""
+
+
+class ThreadedWriterPersister(PersisterInterface):
+    """Persist and clear content on a dedicated writer thread, so that callers on the event loop do not wait for file
+    I/O.
+
+    persist() and clear() only queue the operation, in a queue bounded by queue_size; if the queue is full the caller
+    waits for the writer to make room, so that a burst of events slows the caller down rather than being lost or
+    written on the caller's thread. Such waits are counted in stats.num_queue_full. The writer thread completes
+    queued operations in order, in groups of up to group_size, committing the wrapped persister once per group.
+
+    The pending uids are kept in memory by this class, in _pending, and updated by persist() and clear() on the
+    caller's thread, so that clear(), pending(), num_pending and membership tests never wait for the writer. A uid is
+    pending from the moment persist() returns, so an ack which arrives before the content has been written always
+    finds it: if the write has not completed, clear() cancels it, and a write in progress is cleared as soon as it
+    completes. A clear is queued behind the write of its uid and therefore never precedes it. The writer removes
+    from _pending the uids whose write failed and those the wrapped persister trimmed to make space. Content is only
+    durable once written; flush() and close() wait for all queued operations to complete.
+
+    The wrapped persister is not thread-safe, so every call into it holds _persister_lock, which the writer holds
+    for one operation at a time. retrieve() and iter_pending() therefore wait at most for the operation being
+    written; content not yet written is retrieved from memory. _state_lock guards _pending and the content not yet
+    written and is only held briefly; _persister_lock is always taken before _state_lock.
+
+    Problems of queued operations are counted in stats and passed to on_problems, which is called on the writer
+    thread. Once closed, operations are completed on the caller's thread, there being no writer left.
+    """
+    _persister: PersisterInterface
+    _stats: PersistenceStats
+    _queue: queue.Queue
+    _group_size: int
+    _persister_lock: threading.Lock
+    _state_lock: threading.Lock
+    _pending: dict[str, None]
+    _unwritten: dict[str, bytes]
+    _thread: threading.Thread
+    on_problems: Optional[Callable[[Problems], None]] = None
+
+    def __init__(
+        self,
+        persister: PersisterInterface,
+        queue_size: int = 0,
+        group_size: int = 1,
+        stats: Optional[PersistenceStats] = None,
+        on_problems: Optional[Callable[[Problems], None]] = None,
+    ):
+        self._persister = persister
+        self._stats = PersistenceStats() if stats is None else stats
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._group_size = max(1, group_size)
+        self._persister_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._pending = dict.fromkeys(persister.pending())
+        self._unwritten = dict()
+        self.on_problems = on_problems
+        self._thread = threading.Thread(target=self._run, name="ThreadedWriterPersister", daemon=True)
+        self._thread.start()
+
+    @property
+    def persister(self) -> PersisterInterface:
+        return self._persister
+
+    @property
+    def stats(self) -> PersistenceStats:
+        return self._stats
+
+    def persist(self, uid: str, content: bytes, type_name: str = "") -> Result[bool, Problems]:
+        with self._state_lock:
+            self._pending[uid] = None
+            self._unwritten[uid] = content
+        return self._put(_WriteOp(uid, content, type_name))
+
+    def clear(self, uid: str) -> Result[bool, Problems]:
+        with self._state_lock:
+            if uid not in self._pending:
+                return Err(Problems(warnings=[UIDMissingWarning(uid=uid)]))
+            del self._pending[uid]
+            if self._unwritten.pop(uid, None) is not None:
+                self._stats.num_cleared_before_write += 1
+                return Ok()
+        return self._put(_WriteOp(uid, None))
+
+    def pending(self) -> list[str]:
+        with self._state_lock:
+            return list(self._pending)
+
+    @property
+    def num_pending(self) -> int:
+        return len(self._pending)
+
+    def __contains__(self, uid: str) -> bool:
+        return uid in self._pending
+
+    def retrieve(self, uid: str) -> Result[Optional[bytes], Problems]:
+        with self._state_lock:
+            content = self._unwritten.get(uid, None)
+        if content is not None:
+            return Ok(content)
+        with self._persister_lock:
+            return self._persister.retrieve(uid)
+
+    def content_size(self, uid: str) -> Optional[int]:
+        with self._state_lock:
+            content = self._unwritten.get(uid, None)
+        if content is not None:
+            return len(content)
+        with self._persister_lock:
+            return self._persister.content_size(uid)
+
+    def iter_pending(self, chunk_size: int = DEFAULT_PENDING_CHUNK_SIZE) -> Iterator[list[PendingContent]]:
+        """Yield the written content from the wrapped persister's iter_pending(), then the content which was not yet
+        written when iteration started. Each chunk is read from the wrapped persister holding _persister_lock, which
+        is released while the chunk is yielded."""
+        with self._state_lock:
+            unwritten = dict(self._unwritten)
+        chunks = self._persister.iter_pending(chunk_size)
+        while True:
+            with self._persister_lock:
+                chunk = next(chunks, None)
+            if chunk is None:
+                break
+            chunk = [pending for pending in chunk if pending.uid in self._pending]
+            for pending in chunk:
+                unwritten.pop(pending.uid, None)
+            if chunk:
+                yield chunk
+        chunk = []
+        for uid, content in unwritten.items():
+            if uid in self._pending:
+                chunk.append(PendingContent(uid, content))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def reindex(self) -> Result[Optional[bool], Problems]:
+        self._queue.join()
+        with self._persister_lock:
+            result = self._persister.reindex()
+            with self._state_lock:
+                self._pending = dict.fromkeys(self._persister.pending())
+                self._pending.update(dict.fromkeys(self._unwritten))
+            return result
+
+    def flush(self) -> Result[bool, Problems]:
+        if self._thread.is_alive():
+            self._queue.join()
+        with self._persister_lock:
+            return self._persister.flush()
+
+    def close(self) -> Result[bool, Problems]:
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        with self._persister_lock:
+            return self._persister.close()
+
+    def _put(self, op: _WriteOp) -> Result[bool, Problems]:
+        if not self._thread.is_alive():
+            return self._write_group([op])
+        try:
+            self._queue.put_nowait(op)
+        except queue.Full:
+            self._stats.num_queue_full += 1
+            self._queue.put(op)
+        depth = self._queue.qsize()
+        self._stats.queue_depth = depth
+        self._stats.max_queue_depth = max(self._stats.max_queue_depth, depth)
+        return Ok()
+
+    def _run(self) -> None:
+        running = True
+        while running:
+            group = []
+            op = self._queue.get()
+            while op is not None:
+                group.append(op)
+                if len(group) >= self._group_size:
+                    break
+                try:
+                    op = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            running = op is not None
+            try:
+                if group:
+                    match self._write_group(group):
+                        case Err(problems):
+                            if self.on_problems is not None:
+                                self.on_problems(problems)
+            except BaseException as e:  # pragma: no cover
+                if self.on_problems is not None:
+                    self.on_problems(Problems(errors=[e, PersisterError("Unexpected writer thread error")]))
+            finally:
+                self._stats.queue_depth = self._queue.qsize()
+                for _ in range(len(group) + (0 if running else 1)):
+                    self._queue.task_done()
+
+    def _write_group(self, group: list[_WriteOp]) -> Result[bool, Problems]:
+        problems = Problems()
+        num_writes = 0
+        start = time.perf_counter()
+        for op in group:
+            with self._persister_lock:
+                result = self._write_op(op)
+            if result is not None:
+                num_writes += 1
+                match result:
+                    case Err(op_problems):
+                        problems.add_problems(op_problems)
+        with self._persister_lock:
+            match self._persister.commit():
+                case Err(commit_problems):
+                    problems.add_problems(commit_problems)
+            self._drop_trimmed()
+        self._stats.add_group(num_writes, time.perf_counter() - start)
+        if problems:
+            if problems.errors:
+                self._stats.num_write_errors += len(problems.errors)
+            return Err(problems)
+        return Ok()
+
+    def _write_op(self, op: _WriteOp) -> Optional[Result[bool, Problems]]:
+        """Complete one queued operation, holding _persister_lock. Returns None for a write cancelled by clear()."""
+        if op.content is None:
+            return self._persister.clear(op.uid)
+        with self._state_lock:
+            if self._unwritten.get(op.uid, None) is not op.content:
+                return None
+        result = self._persister.persist(op.uid, op.content, op.type_name)
+        with self._state_lock:
+            cleared = self._unwritten.get(op.uid, None) is not op.content
+            if not cleared:
+                self._unwritten.pop(op.uid)
+                if op.uid not in self._persister:
+                    self._pending.pop(op.uid, None)
+        if cleared and op.uid in self._persister:
+            self._persister.clear(op.uid)
+        return result
+
+    def _drop_trimmed(self) -> None:
+        """Remove from _pending the uids which the wrapped persister trimmed to make space, holding _persister_lock.
+        Every pending uid which is not waiting to be written should be in the wrapped persister, so the difference in
+        counts is the number trimmed. Trimming removes the oldest events first, so the search starts there."""
+        with self._state_lock:
+            num_trimmed = len(self._pending) - len(self._unwritten) - self._persister.num_pending
+            if num_trimmed <= 0:
+                return
+            trimmed = []
+            for uid in self._pending:
+                if uid not in self._unwritten and uid not in self._persister:
+                    trimmed.append(uid)
+                    if len(trimmed) >= num_trimmed:
+                        break
+            for uid in trimmed:
+                del self._pending[uid]
+
+
+def make_persister(
+    settings: PersisterSettings,
+    base_dir: Path | str,
+) -> PersisterInterface:
+    """Construct the PersisterInterface implementation selected by settings.backend, wrapped in a RetentionPersister if
+    settings.retention_classes is not empty, and in a ThreadedWriterPersister if settings.writer_thread is True."""
+    base_dir = Path(base_dir)
+    syncer = FileSyncer.from_settings(settings)
+    match settings.backend:
+        case PersisterBackend.segmented_log:
+            persister = SegmentedLogPersister(
+                base_dir,
+                max_bytes=settings.max_bytes,
+                max_segment_bytes=settings.max_segment_bytes,
+                syncer=syncer,
+            )
+        case PersisterBackend.sqlite:
+            persister = SQLitePersister(base_dir, max_bytes=settings.max_bytes, durability=settings.durability)
+        case _:
+            persister = TimedRollingFilePersister(base_dir, max_bytes=settings.max_bytes, syncer=syncer)
+    if settings.retention_classes:
+        persister = RetentionPersister(
+            persister,
+            settings.retention_classes,
+            max_bytes=settings.max_bytes,
+            journal_dir=base_dir,
+        )
+    if settings.writer_thread:
+        persister = ThreadedWriterPersister(
+            persister,
+            queue_size=settings.writer_queue_size,
+            group_size=settings.writer_group_size,
+        )
+    return persister
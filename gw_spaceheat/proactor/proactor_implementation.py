@@ -2,8 +2,8 @@
 
 import asyncio
 import enum
-import functools
 import json
+import signal
 import sys
 import time
 import traceback
@@ -12,6 +12,7 @@ from dataclasses import field
 from typing import Any
 from typing import Awaitable
 from typing import Dict
+from typing import Hashable
 from typing import Iterable
 from typing import List
 from typing import Optional
@@ -19,6 +20,7 @@ from typing import Sequence
 
 import gwproto
 from gwproto import MQTTCodec
+from gwproto import MQTTTopic
 from gwproto.messages import Ack
 from gwproto.messages import CommEvent
 from gwproto.messages import EventBase
@@ -38,10 +40,16 @@ from result import Err
 from result import Ok
 from result import Result
 
+from proactor.coalescing import EventCoalescer
+from proactor.dispatch import MessageRoutes
+from proactor.event_loop import event_loop_implementation
 from proactor.config.proactor_settings import MQTT_LINK_POLL_SECONDS
+from proactor.event_encoding import EventCodec
+from proactor.event_encoding import WireEvent
 from proactor.message import DBGCommands
 from proactor.message import DBGEvent
 from proactor.message import DBGPayload
+from proactor.message import EventBatch
 from problems import Problems
 from proactor import config
 from proactor import ProactorSettings
@@ -60,21 +68,31 @@ from proactor.message import Shutdown
 from proactor.mqtt import MQTTClients
 from proactor.mqtt import QOS
 from proactor.persister import JSONDecodingError
+from proactor.profiler import PathProfiler
+from proactor.topic_decoder import TopicDecoder
+from proactor.receive_queue import ReceiveLane
+from proactor.receive_queue import ReceiveLaneAlert
+from proactor.receive_queue import ReceiveQueue
+from proactor.persister import PendingContent
 from proactor.persister import PersisterInterface
+from proactor.persister import RetentionPersister
 from proactor.persister import StubPersister
+from proactor.persister import ThreadedWriterPersister
 from proactor.persister import UIDMissingWarning
 from proactor.proactor_interface import CommunicatorInterface
 from proactor.proactor_interface import MonitoredName
 from proactor.proactor_interface import Runnable
 from proactor.proactor_interface import ServicesInterface
 from proactor.stats import ProactorStats
+from proactor.timer_wheel import TimerWheel
+from proactor.uploader import PendingEventUploader
 from proactor.watchdog import WatchdogManager
 
 
 @dataclass
 class AckWaitInfo:
     message_id: str
-    timer_handle: asyncio.TimerHandle
+    deadline: float
     client_name: str
     context: Any = None
 
@@ -131,24 +149,32 @@ class MessageTimes:
 
 class Proactor(ServicesInterface, Runnable):
 
-    PERSISTER_ENCODING = "utf-8"
-
     _name: str
     _settings: ProactorSettings
     _logger: ProactorLogger
     _stats: ProactorStats
     _event_persister: PersisterInterface
+    _event_codec: EventCodec
+    _uploader: PendingEventUploader
+    _coalescer: EventCoalescer
+    _profiler: PathProfiler
     _loop: Optional[asyncio.AbstractEventLoop] = None
-    _receive_queue: Optional[asyncio.Queue] = None
+    _receive_queue: Optional[ReceiveQueue] = None
+    _receive_lane_by_topic: dict[str, ReceiveLane]
     _mqtt_clients: MQTTClients
     _mqtt_codecs: Dict[str, MQTTCodec]
+    _mqtt_decoders: Dict[str, TopicDecoder]
     _link_states: LinkStates
     _link_message_times: dict[str, MessageTimes]
     _acks: dict[str, AckWaitInfo]
+    _ack_timers: TimerWheel
+    _ack_timeouts: dict[str, float]
+    _ack_sweep_handle: Optional[asyncio.TimerHandle] = None
     _communicators: Dict[str, CommunicatorInterface]
     _stop_requested: bool
     _tasks: List[asyncio.Task]
     _watchdog: WatchdogManager
+    _routes: MessageRoutes
 
     def __init__(self, name: str, settings: ProactorSettings):
         self._name = name
@@ -156,16 +182,48 @@ class Proactor(ServicesInterface, Runnable):
         self._logger = ProactorLogger(**settings.logging.qualified_logger_names())
         self._stats = self.make_stats()
         self._event_persister = self.make_event_persister(settings)
-        self._mqtt_clients = MQTTClients()
+        self._connect_event_persister()
+        self._event_codec = EventCodec.from_settings(settings.persister)
+        self._uploader = PendingEventUploader(settings.upload, self._stats.upload)
+        self._coalescer = EventCoalescer(settings.persister.coalescing)
+        self._profiler = PathProfiler(settings.path_profiling, settings.path_profile_samples)
+        self._mqtt_clients = MQTTClients(self._stats.queue_writer("mqtt"))
         self._mqtt_codecs = dict()
+        self._mqtt_decoders = dict()
+        self._receive_lane_by_topic = dict()
         self._link_states = LinkStates()
         self._link_message_times = dict()
         self._acks = dict()
+        self._ack_timers = TimerWheel()
+        self._ack_timeouts = dict()
         self._communicators = dict()
         self._tasks = []
         self._stop_requested = False
         self._watchdog = WatchdogManager(10, self)
         self.add_communicator(self._watchdog)
+        self._routes = MessageRoutes()
+        self._add_routes()
+
+    def _add_routes(self) -> None:
+        for payload_type, handler, path in [
+            (MQTTReceiptPayload, self._process_mqtt_message, 0x00000002),
+            (MQTTConnectPayload, self._process_mqtt_connected, 0x00000004),
+            (MQTTDisconnectPayload, self._process_mqtt_disconnected, 0x00000008),
+            (MQTTConnectFailPayload, self._process_mqtt_connect_fail, 0x00000010),
+            (MQTTSubackPayload, self._process_mqtt_suback, 0x00000020),
+            (MQTTProblemsPayload, self._process_mqtt_problems, 0x00000040),
+            (PatWatchdog, self._watchdog.process_message, 0x00000080),
+            (Shutdown, self._process_shutdown_message, 0x00000100),
+            (EventBase, self._process_event_message, 0x00000200),
+        ]:
+            self._routes.add(payload_type, handler, path)
+        for payload_type, handler, path in [
+            (Ack, self._process_ack_message, 0x00000040),
+            (Ping, self._process_ping_message, 0x00000080),
+            (DBGPayload, self._process_dbg_message, 0x00000100),
+            (EventBatch, self._process_event_batch, 0x00002000),
+        ]:
+            self._routes.add_mqtt(payload_type.__fields__["TypeName"].default, handler, path)
 
     @classmethod
     def make_stats(cls) -> ProactorStats:
@@ -186,7 +244,8 @@ class Proactor(ServicesInterface, Runnable):
         self._receive_queue.put_nowait(message)
 
     def send_threadsafe(self, message: Message) -> None:
-        self._loop.call_soon_threadsafe(self._receive_queue.put_nowait, message)
+        reserved = self._receive_queue.reserve_threadsafe(message)
+        self._loop.call_soon_threadsafe(self._receive_queue.put_nowait, message, time.monotonic(), reserved)
 
     def get_communicator(self, name: str) -> CommunicatorInterface:
         return self._communicators[name]
@@ -233,10 +292,55 @@ class Proactor(ServicesInterface, Runnable):
             self.logger.info(event)
         if not event.Src:
             event.Src = self.publication_name
+        message = Message(Src=self.publication_name, Payload=event, AckRequired=True)
+        wire_event = self._encode_upstream(message)
         if self._mqtt_clients.upstream_client and self._link_states[self._mqtt_clients.upstream_client].active_for_send():
-            self._publish_upstream(event, AckRequired=True)
-        return self._event_persister.persist(event.MessageId, event.json(
-            sort_keys=True, indent=2).encode(self.PERSISTER_ENCODING))
+            self._coalescer.reset()
+            self._publish_encoded(
+                self._mqtt_clients.upstream_client,
+                wire_event,
+                message_id=event.MessageId,
+                payload_object=event,
+            )
+        elif self._coalescer:
+            coalesced = self._coalescer.coalesce(event.MessageId, event.TypeName, event.TimeNS)
+            if not coalesced.persist:
+                self._stats.num_coalesced_events += 1
+                return Ok()
+            if coalesced.replaces is not None and coalesced.replaces in self._event_persister:
+                self._stats.num_coalesced_events += 1
+                self._event_persister.clear(coalesced.replaces)
+        encoded = self._event_codec.encode(*wire_event)
+        self._stats.add_persisted_event(encoded.json_size, len(encoded.content))
+        return self._event_persister.persist(event.MessageId, encoded.content, event.TypeName)
+
+    def _connect_event_persister(self) -> None:
+        """Share the stats of the event persister, and of any persisters it wraps, with self.stats."""
+        persister = self._event_persister
+        while True:
+            match persister:
+                case ThreadedWriterPersister():
+                    self._stats.persistence = persister.stats
+                    persister.on_problems = self._log_persistence_problems
+                case RetentionPersister():
+                    self._stats.retention = persister.stats
+                case _:
+                    break
+            persister = persister.persister
+
+    def _log_persistence_problems(self, problems: Problems) -> None:
+        """Log problems of events persisted by the writer thread. Called on that thread, so must not generate
+        events."""
+        self._logger.error(f"Event persistence problems:\n{problems}")
+
+    def _encode_upstream(self, message: Message) -> WireEvent:
+        """Return the topic and payload with which message would be published upstream."""
+        codec = self._mqtt_codecs.get(self._mqtt_clients.upstream_client, None)
+        if codec is None:
+            payload = message.json().encode(EventCodec.ENCODING)
+        else:
+            payload = codec.encode(message)
+        return WireEvent(message.mqtt_topic(), payload)
 
     def _add_mqtt_client(
         self,
@@ -249,7 +353,10 @@ class Proactor(ServicesInterface, Runnable):
         self._mqtt_clients.add_client(name, client_config, upstream=upstream, primary_peer=primary_peer)
         if codec is not None:
             self._mqtt_codecs[name] = codec
+            self._mqtt_decoders[name] = TopicDecoder(codec, trusted=client_config.trusted)
         self._link_states.add(name)
+        if client_config.ack_timeout_seconds is not None:
+            self._ack_timeouts[name] = client_config.ack_timeout_seconds
         self._link_message_times[name] = MessageTimes()
         self._stats.add_link(name)
 
@@ -261,18 +368,43 @@ class Proactor(ServicesInterface, Runnable):
                 self._publish_message(client, PingMessage(Src=self.publication_name))
             await asyncio.sleep(message_times.seconds_until_next_ping(self.settings.mqtt_link_poll_seconds))
 
-    def _start_ack_timer(self, client_name: str, message_id: str, context: Any = None, delay: Optional[float] = None) -> None:
+    def _start_ack_timer(
+        self,
+        client_name: str,
+        message_id: str,
+        context: Any = None,
+        delay: Optional[float] = None,
+    ) -> None:
+        """Wait delay seconds, by default the ack timeout of client_name's link, for an ack of message_id. Deadlines
+        are kept in a timer wheel swept by a single loop timer, rather than in a loop timer per message; the timer is
+        set for the earliest deadline, so the loop is not woken while no ack is due."""
         if delay is None:
-            delay = 5
+            delay = self._ack_timeouts.get(client_name, self.settings.ack_timeout_seconds)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + delay
         self._acks[message_id] = AckWaitInfo(
             message_id,
-            asyncio.get_running_loop().call_later(
-                delay,
-                functools.partial(self._process_ack_timeout, message_id),
-            ),
+            deadline,
             client_name=client_name,
             context=context,
         )
+        self._ack_timers.add(message_id, deadline)
+        if self._ack_sweep_handle is None or deadline < self._ack_sweep_handle.when():
+            self._schedule_ack_sweep(loop)
+
+    def _schedule_ack_sweep(self, loop: asyncio.AbstractEventLoop) -> None:
+        if self._ack_sweep_handle is not None:
+            self._ack_sweep_handle.cancel()
+        when = self._ack_timers.next_sweep(loop.time())
+        self._ack_sweep_handle = None if when is None else loop.call_at(when, self._sweep_ack_timers)
+
+    def _sweep_ack_timers(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._ack_sweep_handle = None
+        for message_id in self._ack_timers.expire(loop.time()):
+            self._process_ack_timeout(message_id)
+        if self._ack_sweep_handle is None:
+            self._schedule_ack_sweep(loop)
 
     def _cancel_ack_timer(self, message_id: str) -> Optional[AckWaitInfo]:
         self._logger.path("++cancel_ack_timer %s", message_id)
@@ -280,7 +412,11 @@ class Proactor(ServicesInterface, Runnable):
         wait_info = self._acks.pop(message_id, None)
         if wait_info is not None:
             path_dbg |= 0x00000001
-            wait_info.timer_handle.cancel()
+            self._ack_timers.cancel(message_id)
+            if not len(self._ack_timers) and self._ack_sweep_handle is not None:
+                path_dbg |= 0x00000002
+                self._ack_sweep_handle.cancel()
+                self._ack_sweep_handle = None
 
         self._logger.path("--cancel_ack_timer path:0x%08X", path_dbg)
         return wait_info
@@ -306,17 +442,23 @@ class Proactor(ServicesInterface, Runnable):
                 for message_id in list(self._acks.keys()):
                     path_dbg |= 0x00000004
                     self._process_ack_result(message_id, AckWaitSummary.connection_failure)
+            self._stop_upload(transition)
         self._logger.path("--Proactor._apply_ack_timeout path:0x%08X", path_dbg)
         return Ok()
 
     def _process_ack_result(self, message_id: str, reason: AckWaitSummary):
         self._logger.path("++Proactor._process_ack_result  %s", message_id)
+        started = time.perf_counter()
         path_dbg = 0
         wait_info = self._cancel_ack_timer(message_id)
         if wait_info is not None:
             path_dbg |= 0x00000001
+            uploading = message_id in self._uploader
             if reason == AckWaitSummary.timeout:
                 path_dbg |= 0x00000002
+                if uploading:
+                    path_dbg |= 0x00000008
+                    self._uploader.timed_out(message_id)
                 self._link_states.process_ack_timeout(
                     wait_info.client_name
                 ).and_then(
@@ -327,12 +469,25 @@ class Proactor(ServicesInterface, Runnable):
             elif reason == AckWaitSummary.acked and message_id in self._event_persister:
                 path_dbg |= 0x00000004
                 self._event_persister.clear(message_id)
+            if uploading and reason == AckWaitSummary.acked:
+                path_dbg |= 0x00000010
+                for uid in self._uploader.acked(message_id):
+                    if uid in self._event_persister:
+                        path_dbg |= 0x00000040
+                        self._event_persister.clear(uid)
+                self._upload_next_events()
+            elif uploading and reason == AckWaitSummary.connection_failure:
+                path_dbg |= 0x00000020
+                self._uploader.stop()
+        self._profiler.record("Proactor._process_ack_result", reason.value, path_dbg, started)
         self._logger.path("--Proactor._process_ack_result path:0x%08X", path_dbg)
 
     def _process_dbg(self, dbg: DBGPayload):
         self._logger.path("++_process_dbg")
+        started = time.perf_counter()
         path_dbg = 0
         count_dbg = 0
+        msg = ""
         for logger_name in ["message_summary", "lifecycle", "comm_event"]:
             requested_level = getattr(dbg.Levels, logger_name)
             if requested_level > -1:
@@ -351,9 +506,23 @@ class Proactor(ServicesInterface, Runnable):
             case DBGCommands.show_subscriptions:
                 path_dbg |= 0x00000002
                 self.log_subscriptions("message")
+            case DBGCommands.show_latency:
+                path_dbg |= 0x00000008
+                msg = json.dumps(dict(self._stats.latency.as_dict(), loop_lag=self._stats.loop_lag.as_dict()))
+            case DBGCommands.start_profiling:
+                path_dbg |= 0x00000010
+                self._profiler.clear()
+                self._profiler.enabled = True
+            case DBGCommands.stop_profiling:
+                path_dbg |= 0x00000020
+                self._profiler.enabled = False
+            case DBGCommands.show_profile:
+                path_dbg |= 0x00000040
+                msg = json.dumps(self._profiler.as_dict())
             case _:
                 path_dbg |= 0x00000004
-        self.generate_event(DBGEvent(Command=dbg, Path=f"0x{path_dbg:08X}", Count=count_dbg, Msg=""))
+        self.generate_event(DBGEvent(Command=dbg, Path=f"0x{path_dbg:08X}", Count=count_dbg, Msg=msg))
+        self._profiler.record("Proactor._process_dbg", DBGPayload.__fields__["TypeName"].default, path_dbg, started)
         self._logger.path("--_process_dbg  path:0x%08X  count:%d", path_dbg, count_dbg)
 
     def log_subscriptions(self, tag=""):
@@ -382,6 +551,25 @@ class Proactor(ServicesInterface, Runnable):
         message = Message(Src=self.publication_name, Payload=payload, **message_args)
         return self._publish_message(self._mqtt_clients.upstream_client, message, qos=qos)
 
+    def _publish_encoded(
+        self,
+        client: str,
+        wire_event: WireEvent,
+        message_id: str = "",
+        qos: int = 0,
+        context: Any = None,
+        payload_object: Any = None,
+    ) -> MQTTMessageInfo:
+        """Publish an already encoded message, such as a stored pending event, starting an ack timer for message_id
+        if it is not empty."""
+        self._logger.message_summary("OUT mqtt    ", self.publication_name, wire_event.topic, payload_object)
+        if message_id:
+            if message_id in self._acks:
+                self._cancel_ack_timer(message_id)
+            self._start_ack_timer(client, message_id, context)
+        self._link_message_times[client].last_send = time.time()
+        return self._mqtt_clients.publish(client, wire_event.topic, wire_event.payload, qos)
+
 
     def add_communicator(self, communicator: CommunicatorInterface):
         if communicator.name in self._communicators:
@@ -392,6 +580,17 @@ class Proactor(ServicesInterface, Runnable):
         for monitored in communicator.monitored_names:
             self._watchdog.add_monitored_name(monitored)
 
+    @property
+    def routes(self) -> MessageRoutes:
+        return self._routes
+
+    @property
+    def profiler(self) -> PathProfiler:
+        return self._profiler
+
+    def log_profile(self) -> None:
+        self._logger.info(str(self._profiler))
+
     @property
     def async_receive_queue(self) -> Optional[asyncio.Queue]:
         return self._receive_queue
@@ -406,8 +605,11 @@ class Proactor(ServicesInterface, Runnable):
             self._start_processing_messages()
             while not self._stop_requested:
                 message = await self._receive_queue.get()
+                dequeued = time.monotonic()
+                self._stats.latency.queue[message.Header.MessageType].add(dequeued - self._receive_queue.last_created)
                 if not self._stop_requested:
                     await self.process_message(message)
+                    self._stats.latency.handler[message.Header.MessageType].add(time.monotonic() - dequeued)
                 self._receive_queue.task_done()
         except BaseException as e:
             if not isinstance(e, asyncio.exceptions.CancelledError):
@@ -445,6 +647,72 @@ class Proactor(ServicesInterface, Runnable):
     def _derived_process_message(self, message: Message):
         pass
 
+    def _receive_lane(self, message: Message) -> ReceiveLane:
+        """Choose the lane of the receive queue in which message waits. Link state changes, watchdog pats, shutdown
+        and the acks and pings of the links are control messages, served before all others."""
+        match message.Payload:
+            case (
+                MQTTConnectPayload() | MQTTDisconnectPayload() | MQTTConnectFailPayload() | MQTTSubackPayload()
+                | MQTTProblemsPayload() | PatWatchdog() | Shutdown()
+            ):
+                return ReceiveLane.control
+            case MQTTReceiptPayload():
+                topic = message.Payload.message.topic
+                lane = self._receive_lane_by_topic.get(topic)
+                if lane is None:
+                    message_type = MQTTTopic.decode(topic).message_type
+                    if message_type in (Ack.__fields__["TypeName"].default, Ping.__fields__["TypeName"].default):
+                        lane = ReceiveLane.control
+                    else:
+                        lane = self._derived_mqtt_receive_lane(message_type)
+                    # Called from writer threads as well as the loop, so the cache is replaced rather than updated in
+                    # place; a lane cached concurrently by another thread may be lost, and is then computed again.
+                    self._receive_lane_by_topic = {**self._receive_lane_by_topic, topic: lane}
+                return lane
+        return self._derived_receive_lane(message)
+
+    @classmethod
+    def _receive_coalesce_key(cls, message: Message) -> Hashable:
+        """The source of message, for lanes of the receive queue which coalesce messages when full: the client and
+        topic of an MQTT receipt, otherwise the source and type of the message."""
+        if isinstance(message.Payload, MQTTReceiptPayload):
+            return message.Payload.client_name, message.Payload.message.topic
+        return message.Header.Src, message.Header.MessageType
+
+    def _receive_lane_alert(self, alert: ReceiveLaneAlert) -> None:
+        """Called by the receive queue from within put and get, so defers generating events."""
+        self._loop.call_soon(self._report_receive_lane_alert, alert)
+
+    def _report_receive_lane_alert(self, alert: ReceiveLaneAlert) -> None:
+        lane_stats = self._stats.receive_lanes[alert.lane.name]
+        if alert.above:
+            self.generate_event(
+                ProblemEvent(
+                    ProblemType=gwproto.messages.Problems.warning,
+                    Summary=f"Receive lane [{alert.lane.name}] reached high water mark {alert.depth}/{alert.max_size}",
+                    Details=str(lane_stats),
+                )
+            )
+        elif alert.num_dropped or alert.num_coalesced or alert.num_overflowed:
+            self.generate_event(
+                ProblemEvent(
+                    ProblemType=gwproto.messages.Problems.warning,
+                    Summary=(
+                        f"Receive lane [{alert.lane.name}] drained after dropping {alert.num_dropped}, "
+                        f"coalescing {alert.num_coalesced} and overflowing {alert.num_overflowed} messages"
+                    ),
+                    Details=str(lane_stats),
+                )
+            )
+        else:
+            self._logger.info(f"Receive lane [{alert.lane.name}] drained to {alert.depth}/{alert.max_size}")
+
+    def _derived_receive_lane(self, message: Message) -> ReceiveLane:
+        return ReceiveLane.telemetry
+
+    def _derived_mqtt_receive_lane(self, message_type: str) -> ReceiveLane:
+        return ReceiveLane.telemetry
+
     def _derived_process_mqtt_message(
         self, message: Message[MQTTReceiptPayload], decoded: Any
     ):
@@ -485,6 +753,7 @@ class Proactor(ServicesInterface, Runnable):
         if not isinstance(message.Payload, PatWatchdog):
             self._logger.message_enter("++Proactor.process_message %s/%s",
                                        message.Header.Src, message.Header.MessageType)
+        started = time.perf_counter()
         path_dbg = 0
         if not isinstance(message.Payload, (MQTTReceiptPayload, PatWatchdog)):
             path_dbg |= 0x00000001
@@ -495,42 +764,21 @@ class Proactor(ServicesInterface, Runnable):
                 message.Payload,
             )
         self._stats.add_message(message)
-        match message.Payload:
-            case MQTTReceiptPayload():
-                path_dbg |= 0x00000002
-                self._process_mqtt_message(message)
-            case MQTTConnectPayload():
-                path_dbg |= 0x00000004
-                self._process_mqtt_connected(message)
-            case MQTTDisconnectPayload():
-                path_dbg |= 0x00000008
-                self._process_mqtt_disconnected(message)
-            case MQTTConnectFailPayload():
-                path_dbg |= 0x00000010
-                self._process_mqtt_connect_fail(message)
-            case MQTTSubackPayload():
-                path_dbg |= 0x00000020
-                self._process_mqtt_suback(message)
-            case MQTTProblemsPayload():
-                path_dbg |= 0x00000040
-                self._process_mqtt_problems(message)
-            case PatWatchdog():
-                path_dbg |= 0x00000080
-                self._watchdog.process_message(message)
-            case Shutdown():
-                path_dbg |= 0x00000100
-                self._process_shutdown_message(message)
-            case EventBase():
-                path_dbg |= 0x00000200
-                self.generate_event(message.Payload)
-            case _:
-                path_dbg |= 0x00000400
-                self._derived_process_message(message)
+        if (route := self._routes.route(message.Payload)) is not None:
+            path_dbg |= route.path
+            route.handler(message)
+        else:
+            path_dbg |= 0x00000400
+            self._derived_process_message(message)
+        self._profiler.record("Proactor.process_message", message.Header.MessageType, path_dbg, started)
         if not isinstance(message.Payload, PatWatchdog):
             self._logger.message_exit("--Proactor.process_message  path:0x%08X", path_dbg)
 
     def _decode_mqtt_message(self, mqtt_payload) -> Result[Message[Any], BaseException]:
-        decoder = self._mqtt_codecs.get(mqtt_payload.client_name, None)
+        if self._settings.mqtt_full_validation:
+            decoder = self._mqtt_codecs.get(mqtt_payload.client_name, None)
+        else:
+            decoder = self._mqtt_decoders.get(mqtt_payload.client_name, None)
         result: Result[Message[Any], BaseException]
         try:
             result = Ok(decoder.decode(mqtt_payload.message.topic, mqtt_payload.message.payload))
@@ -555,6 +803,7 @@ class Proactor(ServicesInterface, Runnable):
     def _process_mqtt_message(self, mqtt_receipt_message: Message[MQTTReceiptPayload]) -> Result[Message[Any], BaseException]:
         self._logger.path("++Proactor._process_mqtt_message %s/%s",
                           mqtt_receipt_message.Header.Src, mqtt_receipt_message.Header.MessageType)
+        started = time.perf_counter()
         path_dbg = 0
         self._stats.add_mqtt_message(mqtt_receipt_message)
         match result := self._decode_mqtt_message(mqtt_receipt_message.Payload):
@@ -577,18 +826,7 @@ class Proactor(ServicesInterface, Runnable):
                     case Err(error):
                         path_dbg |= 0x00000020
                         self._report_error(error, "_process_mqtt_message/_link_states.process_mqtt_message")
-                match decoded_message.Payload:
-                    case Ack():
-                        path_dbg |= 0x00000040
-                        self._process_ack_result(decoded_message.Payload.AckMessageID, AckWaitSummary.acked)
-                    case Ping():
-                        path_dbg |= 0x00000080
-                    case DBGPayload():
-                        path_dbg |= 0x00000100
-                        self._process_dbg(decoded_message.Payload)
-                    case _:
-                        path_dbg |= 0x00000200
-                        self._derived_process_mqtt_message(mqtt_receipt_message, decoded_message)
+                path_dbg |= self._dispatch_mqtt_message(mqtt_receipt_message, decoded_message)
                 if decoded_message.Header.AckRequired:
                     path_dbg |= 0x00000400
                     if decoded_message.Header.MessageId:
@@ -600,12 +838,58 @@ class Proactor(ServicesInterface, Runnable):
                                 Payload=Ack(AckMessageID=decoded_message.Header.MessageId)
                             )
                         )
+                if received := mqtt_receipt_message.Payload.message.timestamp:
+                    latency = time.monotonic() - received
+                    self._stats.latency.mqtt_by_link[mqtt_receipt_message.Payload.client_name].add(latency)
+                    self._stats.latency.mqtt_by_type[decoded_message.Header.MessageType].add(latency)
             case Err(error):
                 path_dbg |= 0x00001000
                 result = Err(error)
+        self._profiler.record(
+            "Proactor._process_mqtt_message",
+            decoded_message.Header.MessageType if result.is_ok() else mqtt_receipt_message.Payload.message.topic,
+            path_dbg,
+            started,
+        )
         self._logger.path("--Proactor._process_mqtt_message:%s  path:0x%08X", int(result.is_ok()), path_dbg)
         return result
 
+    def _dispatch_mqtt_message(self, message: Message[MQTTReceiptPayload], decoded: Message[Any]) -> int:
+        """Pass a decoded MQTT message to the handler routed for it, or to _derived_process_mqtt_message if there is
+        none, returning the path_dbg bit of the route taken."""
+        if (route := self._routes.mqtt_route(message.Payload.client_name, decoded.Header.MessageType)) is not None:
+            route.handler(message, decoded)
+            return route.path
+        self._derived_process_mqtt_message(message, decoded)
+        return 0x00000200
+
+    def _process_event_message(self, message: Message[EventBase]) -> None:
+        self.generate_event(message.Payload)
+
+    # noinspection PyUnusedLocal
+    def _process_ack_message(self, message: Message[MQTTReceiptPayload], decoded: Message[Ack]) -> None:
+        self._process_ack_result(decoded.Payload.AckMessageID, AckWaitSummary.acked)
+
+    # noinspection PyUnusedLocal
+    def _process_ping_message(self, message: Message[MQTTReceiptPayload], decoded: Message[Ping]) -> None:
+        pass
+
+    # noinspection PyUnusedLocal
+    def _process_dbg_message(self, message: Message[MQTTReceiptPayload], decoded: Message[DBGPayload]) -> None:
+        self._process_dbg(decoded.Payload)
+
+    def _process_event_batch(self, message: Message[MQTTReceiptPayload], batch_message: Message[EventBatch]) -> None:
+        """Decode each event of a batch and process it as if it had been received in its own message. The batch
+        itself is acked as any other message."""
+        decoders = self._mqtt_codecs[message.Payload.client_name].decoders
+        for event_message in batch_message.Payload.Messages:
+            try:
+                decoded_event_message = decoders.decode_obj(Message.type_name(), event_message)
+            except BaseException as e:
+                self._report_error(e, "_process_event_batch")
+            else:
+                self._dispatch_mqtt_message(message, decoded_event_message)
+
     def _process_mqtt_connected(self, message: Message[MQTTConnectPayload]):
         match self._link_states.process_mqtt_connected(message):
             case Ok(transition):
@@ -640,6 +924,7 @@ class Proactor(ServicesInterface, Runnable):
                 if transition.recv_deactivated() or transition.send_deactivated():
                     for message_id in list(self._acks.keys()):
                         self._process_ack_result(message_id, AckWaitSummary.connection_failure)
+                    self._stop_upload(transition)
             case Err(error):
                 result = Err(error)
         return result
@@ -648,28 +933,99 @@ class Proactor(ServicesInterface, Runnable):
         return self._link_states.process_mqtt_connect_fail(message)
 
     def _upload_pending_events(self) -> Result[bool, BaseException]:
+        """Start uploading all pending events once the link is active, unless an upload is already running. Events are
+        not uploaded while the link is only active for send, since the peer may not be listening yet. Events are
+        published as acks arrive for previously uploaded events, so that at most self._uploader.window uploaded events
+        await acks at any time, and are read from the persister settings.upload.read_ahead_events at a time as they
+        are needed."""
+        self._uploader.start(
+            self._event_persister.iter_pending(self.settings.upload.read_ahead_events),
+            self._event_persister.num_pending,
+        )
+        return self._upload_next_events()
+
+    def _stop_upload(self, transition: Transition) -> None:
+        """Abandon the upload once the upstream link is deactivated, so that the next activation starts it again,
+        sending events that were in flight again."""
+        if transition.link_name == self.upstream_client:
+            self._uploader.stop()
+
+    def _upload_next_events(self) -> Result[bool, BaseException]:
+        """Publish queued pending events while the upload window is open, one per message or, if
+        settings.upload.batch_max_events is greater than 1, in EventBatch messages. Stored events are published
+        as persisted, without decoding them."""
         errors = []
-        for message_id in self._event_persister.pending():
-            match self._event_persister.retrieve(message_id):
-                case Ok(event_bytes):
-                    if event_bytes is None:
-                        errors.append(UIDMissingWarning("_upload_pending_events", uid=message_id))
-                    else:
-                        try:
-                            event = json.loads(event_bytes.decode(encoding=self.PERSISTER_ENCODING))
-                        except BaseException as e:
-                            errors.append(e)
-                            errors.append(JSONDecodingError("_upload_pending_events", uid=message_id))
-                        else:
-                            self._publish_upstream(event, AckRequired=True)
-                case Err(error):
-                    errors.append(error)
+        upstream_client = self._mqtt_clients.upstream_client
+        batch_max_events = self.settings.upload.batch_max_events
+        batch_max_bytes = self.settings.upload.batch_max_bytes
+        while upstream_client and self._link_states[upstream_client].active_for_send():
+            pending = self._uploader.next_event()
+            if pending is None:
+                break
+            wire_events = []
+            uids = []
+            batch_bytes = 0
+            while pending is not None:
+                match self._decode_pending_event(pending):
+                    case Ok(wire_event):
+                        if uids and batch_bytes + len(wire_event.payload) > batch_max_bytes:
+                            self._uploader.requeue(pending)
+                            break
+                        wire_events.append(wire_event)
+                        uids.append(pending.uid)
+                        batch_bytes += len(wire_event.payload)
+                    case Err(problems):
+                        self._uploader.skipped()
+                        errors.extend(problems.errors)
+                if len(uids) >= batch_max_events:
+                    break
+                pending = self._uploader.next_batched_event()
+            if len(uids) == 1:
+                self._uploader.sent(uids[0])
+                self._publish_encoded(upstream_client, wire_events[0], message_id=uids[0])
+            elif uids:
+                batch_message, batch_payload = EventBatch.encode_batch(
+                    self.publication_name,
+                    [wire_event.payload for wire_event in wire_events],
+                )
+                self._uploader.sent(batch_message.Header.MessageId, uids=uids)
+                self._publish_encoded(
+                    upstream_client,
+                    WireEvent(batch_message.mqtt_topic(), batch_payload),
+                    message_id=batch_message.Header.MessageId,
+                )
         if errors:
             return Err(Problems(errors=errors))
         return Ok()
 
+    def _decode_pending_event(self, pending: PendingContent) -> Result[WireEvent, Problems]:
+        """Return the topic and payload with which a pending event, read ahead by the uploader, is uploaded. An event
+        cleared since it was read, as by the ack of its live publication, is not uploaded."""
+        problems = Problems()
+        if pending.uid not in self._event_persister:
+            return Err(problems)
+        if pending.problems is not None:
+            problems.add_problems(pending.problems)
+        elif pending.content is None:
+            problems.add_error(UIDMissingWarning("_upload_next_events", uid=pending.uid))
+        else:
+            try:
+                match decoded := self._event_codec.decode(pending.content):
+                    case WireEvent():
+                        return Ok(decoded)
+                    case _:
+                        return Ok(
+                            self._encode_upstream(
+                                Message(Src=self.publication_name, Payload=decoded, AckRequired=True)
+                            )
+                        )
+            except BaseException as e:
+                problems.add_error(e).add_error(JSONDecodingError("_upload_next_events", uid=pending.uid))
+        return Err(problems)
+
     def _process_mqtt_suback(self, message: Message[MQTTSubackPayload]) -> Result[bool, BaseException]:
         self._logger.path("++Proactor._process_mqtt_suback client:%s", message.Payload.client_name)
+        started = time.perf_counter()
         path_dbg = 0
 
         result: Result[bool, BaseException] = Ok()
@@ -684,7 +1040,6 @@ class Proactor(ServicesInterface, Runnable):
                     self._logger.comm_event(transition)
                 if transition.send_activated():
                     path_dbg |= 0x00000004
-                    self._upload_pending_events()
                     self.generate_event(MQTTFullySubscribedEvent(PeerName=message.Payload.client_name))
                     self._publish_message(
                         message.Payload.client_name,
@@ -696,6 +1051,7 @@ class Proactor(ServicesInterface, Runnable):
             case Err(error):
                 path_dbg |= 0x00000010
                 result = Err(error)
+        self._profiler.record("Proactor._process_mqtt_suback", message.Header.MessageType, path_dbg, started)
         self._logger.path(
             "--Proactor._process_mqtt_suback:%d  path:0x%08X",
             result.is_ok(),
@@ -723,7 +1079,26 @@ class Proactor(ServicesInterface, Runnable):
 
     async def run_forever(self):
         self._loop = asyncio.get_running_loop()
-        self._receive_queue = asyncio.Queue()
+        running_on = event_loop_implementation(self._loop)
+        self._logger.lifecycle(f"Event loop: {running_on.value} ({type(self._loop).__name__})")
+        if running_on != self._settings.event_loop:
+            self._logger.warning(
+                f"Event loop {self._settings.event_loop.value} requested but running on {running_on.value}. "
+                f"Is {self._settings.event_loop.value} installed?"
+            )
+        if self._settings.path_profiling:
+            try:
+                self._loop.add_signal_handler(signal.SIGUSR1, self.log_profile)
+            except (ValueError, RuntimeError, NotImplementedError) as e:
+                self._logger.info(f"Not logging path profile on SIGUSR1: {e}")
+        self._receive_queue = ReceiveQueue(
+            self._receive_lane,
+            self._stats.receive_lanes,
+            starvation_limit=self._settings.receive_starvation_limit,
+            settings=self._settings.receive_queue,
+            coalesce_key=self._receive_coalesce_key,
+            on_alert=self._receive_lane_alert,
+        )
         self._mqtt_clients.start(self._loop, self._receive_queue)
         for communicator in self._communicators.values():
             if isinstance(communicator, Runnable):
@@ -745,6 +1120,17 @@ class Proactor(ServicesInterface, Runnable):
             # TODO: CS - Send self a shutdown message instead?
             if not task.done():
                 task.cancel()
+        if self._ack_sweep_handle is not None:
+            self._ack_sweep_handle.cancel()
+            self._ack_sweep_handle = None
+        if self._settings.path_profiling and self._loop is not None:
+            # noinspection PyBroadException
+            try:
+                self._loop.remove_signal_handler(signal.SIGUSR1)
+            except:
+                pass
+        if self._receive_queue is not None:
+            self._receive_queue.close()
         self.stop_mqtt()
         for communicator in self._communicators.values():
             if isinstance(communicator, Runnable):
@@ -753,6 +1139,11 @@ class Proactor(ServicesInterface, Runnable):
                     communicator.stop()
                 except:
                     pass
+        # noinspection PyBroadException
+        try:
+            self._event_persister.close()
+        except:
+            self._logger.exception("ERROR closing event persister")
 
     async def join(self):
         self._logger.lifecycle("++Proactor.join()")
@@ -0,0 +1,106 @@
+"""Opt-in profiling of the code paths taken by message handlers.
+
+Handlers which build a path_dbg bitmask pass it, with the message type they handled and the time.perf_counter() at
+which they started, to PathProfiler.record() just before they log it. While the profiler is enabled it keeps, for each
+(handler, message type, path) the number of calls and their cumulative and maximum time, and keeps the most recent
+calls in a ring buffer. Times are inclusive: the time of a handler includes that of the handlers it calls. While the
+profiler is disabled record() returns immediately.
+"""
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any
+from typing import NamedTuple
+
+from proactor.config.proactor_settings import DEFAULT_PATH_PROFILE_SAMPLES
+
+
+class PathKey(NamedTuple):
+    handler: str
+    message_type: str
+    path: int
+
+
+@dataclass
+class PathProfile:
+    num_calls: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+
+class PathSample(NamedTuple):
+    time: float
+    key: PathKey
+    seconds: float
+
+
+class PathProfiler:
+    enabled: bool
+    _profiles: dict[PathKey, PathProfile]
+    _samples: deque[PathSample]
+
+    def __init__(self, enabled: bool = False, num_samples: int = DEFAULT_PATH_PROFILE_SAMPLES):
+        self.enabled = enabled
+        self._profiles = dict()
+        self._samples = deque(maxlen=num_samples)
+
+    def record(self, handler: str, message_type: str, path: int, started: float) -> None:
+        if not self.enabled:
+            return
+        seconds = time.perf_counter() - started
+        key = PathKey(handler, message_type, path)
+        profile = self._profiles.get(key)
+        if profile is None:
+            profile = self._profiles[key] = PathProfile()
+        profile.num_calls += 1
+        profile.total += seconds
+        if seconds > profile.max:
+            profile.max = seconds
+        self._samples.append(PathSample(time.time(), key, seconds))
+
+    def profile(self, handler: str, message_type: str, path: int) -> PathProfile:
+        return self._profiles.get(PathKey(handler, message_type, path), PathProfile())
+
+    @property
+    def samples(self) -> list[PathSample]:
+        return list(self._samples)
+
+    def clear(self) -> None:
+        self._profiles.clear()
+        self._samples.clear()
+
+    def as_dict(self) -> dict[str, Any]:
+        return dict(
+            enabled=self.enabled,
+            paths=[
+                dict(
+                    handler=key.handler,
+                    message_type=key.message_type,
+                    path=f"0x{key.path:08X}",
+                    num_calls=profile.num_calls,
+                    total=profile.total,
+                    max=profile.max,
+                )
+                for key, profile in sorted(self._profiles.items(), key=lambda item: -item[1].total)
+            ],
+            samples=[
+                dict(
+                    time=sample.time,
+                    handler=sample.key.handler,
+                    message_type=sample.key.message_type,
+                    path=f"0x{sample.key.path:08X}",
+                    seconds=sample.seconds,
+                )
+                for sample in self._samples
+            ],
+        )
+
+    def __str__(self) -> str:
+        s = f"PathProfiler  enabled: {self.enabled}  paths: {len(self._profiles)}  samples: {len(self._samples)}"
+        for key, profile in sorted(self._profiles.items(), key=lambda item: -item[1].total):
+            s += (
+                f"\n  {profile.num_calls:6d}  total: {profile.total:9.4f}  "
+                f"mean: {profile.total / profile.num_calls:.6f}  max: {profile.max:.6f}  "
+                f"0x{key.path:08X}  {key.handler}  [{key.message_type}]"
+            )
+        return s
@@ -0,0 +1,276 @@
+"""The Proactor's receive queue, with a lane per message priority.
+
+ReceiveQueue is an asyncio.Queue, so writers and the reader use it unchanged; it only changes which message get()
+returns next. Each message is put in the lane chosen by a classifier, and get() returns the oldest message of the
+highest priority lane holding messages, except that a lane passed over starvation_limit times while holding messages
+is served next, so that a burst of high priority messages cannot stall the lower lanes indefinitely.
+
+A writer may pass put_nowait() the time.monotonic() at which an item was created, for example in another thread
+before it was handed to the event loop; last_created is that time for the item most recently returned by get(), or the
+time the item was put if no creation time was passed.
+
+Lanes may be bounded, each with the overflow policy of its ReceiveLaneSettings. put_nowait() never blocks the event
+loop; writers in other threads call reserve_threadsafe() before handing an item to the loop, which waits for room in
+the item's lane if the lane blocks, and then put the item with reserved set to the lane returned, so that the item is
+not classified again. If no lane is bounded with the block policy, reserve_threadsafe() returns at once without
+classifying the item. When a bounded lane reaches its high water mark, and when it falls back to half of that,
+on_alert is called with a ReceiveLaneAlert.
+"""
+import asyncio
+import enum
+import math
+import threading
+import time
+from collections import deque
+from typing import Any
+from typing import Callable
+from typing import Hashable
+from typing import NamedTuple
+from typing import Optional
+
+from proactor.config.proactor_settings import DEFAULT_RECEIVE_STARVATION_LIMIT
+from proactor.config.receive_queue import OverflowPolicy
+from proactor.config.receive_queue import ReceiveQueueSettings
+from proactor.stats import ReceiveLaneStats
+
+
+class ReceiveLane(enum.IntEnum):
+    """Lanes of the receive queue, highest priority first."""
+    control = 0
+    power = 1
+    telemetry = 2
+
+
+class ReceiveLaneAlert(NamedTuple):
+    """A bounded lane reached its high water mark (above is True) or fell back to half of it. The counts are of
+    messages dropped, coalesced and admitted over max_size since the lane reached its high water mark."""
+    lane: ReceiveLane
+    above: bool
+    depth: int
+    max_size: int
+    num_dropped: int = 0
+    num_coalesced: int = 0
+    num_overflowed: int = 0
+
+
+class ReceiveQueue(asyncio.Queue):
+    _classify: Callable[[Any], ReceiveLane]
+    _starvation_limit: int
+    _lanes: list[deque[list]]
+    _passed_over: list[int]
+    _lane_stats: list[ReceiveLaneStats]
+    _size: int
+    _created: Optional[float] = None
+    _reserved: Optional[ReceiveLane] = None
+    _num_discarded: int = 0
+    last_created: float = 0.0
+
+    # bounds
+    _max_sizes: list[int]
+    _policies: list[OverflowPolicy]
+    _blocks: bool
+    _high_water: list[int]
+    _alerted: list[Optional[tuple[int, int, int]]]
+    _coalesce_key: Callable[[Any], Hashable]
+    _keys: list[dict[Hashable, list]]
+    _block_timeout: float
+    _room: threading.Condition
+    _num_reserved: list[int]
+    _closed: bool = False
+    on_alert: Optional[Callable[[ReceiveLaneAlert], None]]
+
+    def __init__(
+        self,
+        classify: Callable[[Any], ReceiveLane],
+        stats: Optional[dict[str, ReceiveLaneStats]] = None,
+        starvation_limit: int = DEFAULT_RECEIVE_STARVATION_LIMIT,
+        maxsize: int = 0,
+        settings: Optional[ReceiveQueueSettings] = None,
+        coalesce_key: Optional[Callable[[Any], Hashable]] = None,
+        on_alert: Optional[Callable[[ReceiveLaneAlert], None]] = None,
+    ):
+        self._classify = classify
+        self._starvation_limit = starvation_limit
+        if stats is None:
+            stats = dict()
+        self._lane_stats = [stats.setdefault(lane.name, ReceiveLaneStats(lane.name)) for lane in ReceiveLane]
+        if settings is None:
+            settings = ReceiveQueueSettings()
+        lane_settings = [settings.lane(lane.name) for lane in ReceiveLane]
+        self._max_sizes = [lane.max_size for lane in lane_settings]
+        self._policies = [lane.overflow for lane in lane_settings]
+        self._blocks = any(
+            max_size and policy == OverflowPolicy.block for max_size, policy in zip(self._max_sizes, self._policies)
+        )
+        self._high_water = [
+            max(1, math.ceil(max_size * settings.high_water_fraction)) if max_size else 0
+            for max_size in self._max_sizes
+        ]
+        self._alerted = [None for _ in ReceiveLane]
+        for lane_stats, max_size in zip(self._lane_stats, self._max_sizes):
+            lane_stats.max_size = max_size
+        self._coalesce_key = (lambda item: item) if coalesce_key is None else coalesce_key
+        self._keys = [dict() for _ in ReceiveLane]
+        self._block_timeout = settings.block_timeout_seconds
+        self._room = threading.Condition()
+        self._num_reserved = [0 for _ in ReceiveLane]
+        self.on_alert = on_alert
+        super().__init__(maxsize)
+
+    def lane_size(self, lane: ReceiveLane) -> int:
+        return len(self._lanes[lane])
+
+    def put_nowait(self, item: Any, created: Optional[float] = None, reserved: Optional[ReceiveLane] = None) -> None:
+        """Put item, which if reserved is not None is the lane in which reserve_threadsafe(item) reserved room."""
+        self._created = created
+        self._reserved = reserved
+        self._num_discarded = 0
+        try:
+            super().put_nowait(item)
+        finally:
+            self._created = None
+            self._reserved = None
+        # asyncio.Queue counts each put as an unfinished task
+        for _ in range(self._num_discarded):
+            self.task_done()
+
+    def reserve_threadsafe(self, item: Any) -> Optional[ReceiveLane]:
+        """Called from threads other than the event loop's before handing item to the loop. If item's lane is
+        bounded and blocks when full, wait, up to block_timeout_seconds, for room in the lane and reserve it. Returns
+        the lane if room was reserved, in which case item must be put with put_nowait(item, reserved=lane), and
+        otherwise None."""
+        if not self._blocks:
+            return None
+        try:
+            asyncio.get_running_loop()
+            return None
+        except RuntimeError:
+            pass
+        lane = self._classify(item)
+        max_size = self._max_sizes[lane]
+        if not max_size or self._policies[lane] != OverflowPolicy.block:
+            return None
+        stats = self._lane_stats[lane]
+        with self._room:
+            if len(self._lanes[lane]) + self._num_reserved[lane] >= max_size:
+                started = time.monotonic()
+                stats.num_blocked += 1
+                self._room.wait_for(
+                    lambda: self._closed or len(self._lanes[lane]) + self._num_reserved[lane] < max_size,
+                    timeout=self._block_timeout,
+                )
+                stats.total_blocked += time.monotonic() - started
+                if self._closed or len(self._lanes[lane]) + self._num_reserved[lane] >= max_size:
+                    return None
+            self._num_reserved[lane] += 1
+            return lane
+
+    def close(self) -> None:
+        """Stop writers from waiting for room in the lanes."""
+        with self._room:
+            self._closed = True
+            self._room.notify_all()
+
+    def qsize(self) -> int:
+        return self._size
+
+    def empty(self) -> bool:
+        return self._size == 0
+
+    # asyncio.Queue storage hooks
+
+    def _init(self, maxsize: int) -> None:
+        self._lanes = [deque() for _ in ReceiveLane]
+        self._passed_over = [0 for _ in ReceiveLane]
+        self._size = 0
+
+    def _put(self, item: Any) -> None:
+        lane = self._classify(item) if self._reserved is None else self._reserved
+        put_time = time.monotonic()
+        created = put_time if self._created is None else self._created
+        entries = self._lanes[lane]
+        stats = self._lane_stats[lane]
+        max_size = self._max_sizes[lane]
+        key = None
+        if max_size:
+            if self._reserved is not None:
+                with self._room:
+                    self._num_reserved[lane] -= 1
+            policy = self._policies[lane]
+            if policy == OverflowPolicy.coalesce:
+                key = self._coalesce_key(item)
+                if len(entries) >= max_size and (entry := self._keys[lane].get(key)) is not None:
+                    entry[1] = created
+                    entry[2] = item
+                    stats.num_coalesced += 1
+                    self._num_discarded += 1
+                    return
+            if len(entries) >= max_size:
+                if policy == OverflowPolicy.block:
+                    stats.num_overflowed += 1
+                else:
+                    self._drop_oldest(lane)
+        entry = [put_time, created, item, key]
+        entries.append(entry)
+        if key is not None:
+            self._keys[lane][key] = entry
+        self._size += 1
+        stats.depth = len(entries)
+        stats.max_depth = max(stats.max_depth, stats.depth)
+        if max_size and self._alerted[lane] is None and stats.depth >= self._high_water[lane]:
+            self._alerted[lane] = (stats.num_dropped, stats.num_coalesced, stats.num_overflowed)
+            self._alert(ReceiveLaneAlert(lane, True, stats.depth, max_size))
+
+    def _drop_oldest(self, lane: ReceiveLane) -> None:
+        entry = self._lanes[lane].popleft()
+        self._forget(lane, entry)
+        self._size -= 1
+        self._num_discarded += 1
+        self._lane_stats[lane].num_dropped += 1
+
+    def _forget(self, lane: ReceiveLane, entry: list) -> None:
+        key = entry[3]
+        if key is not None and self._keys[lane].get(key) is entry:
+            del self._keys[lane][key]
+
+    def _get(self) -> Any:
+        waiting = [lane for lane in ReceiveLane if self._lanes[lane]]
+        lane = next(
+            (lane for lane in waiting if self._passed_over[lane] >= self._starvation_limit),
+            waiting[0],
+        )
+        for other in waiting:
+            if other != lane:
+                self._passed_over[other] += 1
+        self._passed_over[lane] = 0
+        entry = self._lanes[lane].popleft()
+        put_time, self.last_created, item, _ = entry
+        self._size -= 1
+        stats = self._lane_stats[lane]
+        stats.depth = len(self._lanes[lane])
+        stats.add_wait(time.monotonic() - put_time)
+        if lane != waiting[0]:
+            stats.num_promoted += 1
+        if self._max_sizes[lane]:
+            self._forget(lane, entry)
+            if self._policies[lane] == OverflowPolicy.block:
+                with self._room:
+                    self._room.notify()
+            if (alerted := self._alerted[lane]) is not None and stats.depth <= self._high_water[lane] // 2:
+                self._alerted[lane] = None
+                self._alert(
+                    ReceiveLaneAlert(
+                        lane,
+                        False,
+                        stats.depth,
+                        self._max_sizes[lane],
+                        num_dropped=stats.num_dropped - alerted[0],
+                        num_coalesced=stats.num_coalesced - alerted[1],
+                        num_overflowed=stats.num_overflowed - alerted[2],
+                    )
+                )
+        return item
+
+    def _alert(self, alert: ReceiveLaneAlert) -> None:
+        if self.on_alert is not None:
+            self.on_alert(alert)
@@ -0,0 +1,86 @@
+"""Notification of systemd by the sd_notify protocol.
+
+SdNotifier sends newline separated assignments ("READY=1", "STATUS=...", "WATCHDOG=1") as a datagram to the unix
+socket named by the NOTIFY_SOCKET environment variable, as sd_notify(3) does, from the notifying process itself
+instead of from a forked systemd-notify. The socket is non-blocking, so a notification never blocks the event loop;
+a notification which cannot be sent immediately is dropped and counted, and the socket is reopened for the next one.
+A socket name beginning with '@' is in the abstract namespace.
+
+If NOTIFY_SOCKET is not set the notifier is disabled and notifications are ignored.
+"""
+import os
+import socket
+from typing import Optional
+
+NOTIFY_SOCKET_ENV_NAME = "NOTIFY_SOCKET"
+
+
+class SdNotifier:
+    address: Optional[str | bytes]
+    num_sent: int
+    num_failed: int
+    last_error: Optional[OSError]
+    _socket: Optional[socket.socket] = None
+
+    def __init__(self, notify_socket: Optional[str] = None):
+        """Notify the socket notify_socket, by default that named by NOTIFY_SOCKET."""
+        if notify_socket is None:
+            notify_socket = os.getenv(NOTIFY_SOCKET_ENV_NAME)
+        if not notify_socket:
+            self.address = None
+        elif notify_socket.startswith("@"):
+            self.address = b"\0" + notify_socket[1:].encode()
+        else:
+            self.address = notify_socket
+        self.num_sent = 0
+        self.num_failed = 0
+        self.last_error = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.address is not None
+
+    def notify(self, *assignments: str) -> bool:
+        """Send assignments, such as "READY=1", in one datagram. Returns True if they were sent."""
+        if self.address is None:
+            return False
+        try:
+            if self._socket is None:
+                self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM | socket.SOCK_CLOEXEC)
+                self._socket.setblocking(False)
+                self._socket.connect(self.address)
+            self._socket.send("\n".join(assignments).encode())
+        except OSError as e:
+            self.num_failed += 1
+            self.last_error = e
+            self.close()
+            return False
+        self.num_sent += 1
+        return True
+
+    def ready(self, status: Optional[str] = None) -> bool:
+        if status is None:
+            return self.notify("READY=1")
+        return self.notify("READY=1", _status(status))
+
+    def status(self, status: str) -> bool:
+        return self.notify(_status(status))
+
+    def watchdog(self) -> bool:
+        return self.notify("WATCHDOG=1")
+
+    def stopping(self, status: Optional[str] = None) -> bool:
+        if status is None:
+            return self.notify("STOPPING=1")
+        return self.notify("STOPPING=1", _status(status))
+
+    def close(self) -> None:
+        if self._socket is not None:
+            try:
+                self._socket.close()
+            finally:
+                self._socket = None
+
+
+def _status(status: str) -> str:
+    return "STATUS=" + status.replace("\n", " ")
@@ -1,6 +1,9 @@
+import bisect
+import time
 from collections import defaultdict
 from dataclasses import dataclass
 from dataclasses import field
+from typing import Any
 from typing import Optional
 from typing import Sequence
 
@@ -38,14 +41,341 @@ class LinkStats:
         return s
 
 
+@dataclass
+class UploadStats:
+    """Progress of the upload of pending events. backlog is the number of events of the current upload which have not
+    yet been acked, including those in flight."""
+    backlog: int = 0
+    in_flight: int = 0
+    window: float = 0.0
+    ack_latency: float = 0.0
+    num_uploads: int = 0
+    num_acked: int = 0
+    num_timeouts: int = 0
+    upload_started: float = 0.0
+    upload_acked: int = 0
+
+    def start_upload(self, backlog: int, now: Optional[float] = None) -> None:
+        self.num_uploads += 1
+        self.backlog = backlog
+        self.upload_started = time.time() if now is None else now
+        self.upload_acked = 0
+
+    def drain_rate(self, now: Optional[float] = None) -> float:
+        """Events acked per second since the current upload started."""
+        if now is None:
+            now = time.time()
+        elapsed = now - self.upload_started
+        if elapsed <= 0 or not self.upload_acked:
+            return 0.0
+        return self.upload_acked / elapsed
+
+    def eta_seconds(self, now: Optional[float] = None) -> Optional[float]:
+        """Estimated seconds until the backlog is drained, or None if no ack has been received yet."""
+        if not self.backlog:
+            return 0.0
+        drain_rate = self.drain_rate(now)
+        if not drain_rate:
+            return None
+        return self.backlog / drain_rate
+
+    def __str__(self) -> str:
+        now = time.time()
+        eta = self.eta_seconds(now)
+        return (
+            f"UploadStats  backlog: {self.backlog}  in_flight: {self.in_flight}  window: {self.window:.1f}  "
+            f"ack_latency: {self.ack_latency:.3f}  drain_rate: {self.drain_rate(now):.1f}/s  "
+            f"eta: {'?' if eta is None else f'{eta:.1f}s'}  uploads: {self.num_uploads}  acked: {self.num_acked}  "
+            f"timeouts: {self.num_timeouts}"
+        )
+
+
+@dataclass
+class PersistenceStats:
+    """Activity of the thread writing persisted events. queue_depth is the number of persist and clear operations
+    waiting for the writer; write_latency is a moving average of the seconds taken to write one group."""
+    queue_depth: int = 0
+    max_queue_depth: int = 0
+    num_queue_full: int = 0
+    num_writes: int = 0
+    num_groups: int = 0
+    num_cleared_before_write: int = 0
+    num_write_errors: int = 0
+    write_latency: float = 0.0
+    max_write_latency: float = 0.0
+
+    WRITE_LATENCY_GAIN = 0.125
+
+    def add_group(self, num_writes: int, latency: float) -> None:
+        if self.num_groups:
+            self.write_latency += self.WRITE_LATENCY_GAIN * (latency - self.write_latency)
+        else:
+            self.write_latency = latency
+        self.max_write_latency = max(self.max_write_latency, latency)
+        self.num_writes += num_writes
+        self.num_groups += 1
+
+    def __str__(self) -> str:
+        return (
+            f"PersistenceStats  queue_depth: {self.queue_depth}  max_queue_depth: {self.max_queue_depth}  "
+            f"queue_full: {self.num_queue_full}  writes: {self.num_writes}  groups: {self.num_groups}  "
+            f"write_latency: {self.write_latency:.4f}  max_write_latency: {self.max_write_latency:.4f}  "
+            f"cleared_before_write: {self.num_cleared_before_write}  write_errors: {self.num_write_errors}"
+        )
+
+
+@dataclass
+class RetentionClassStats:
+    """Pending events of one retention class, and those evicted, or rejected because no space could be made for
+    them."""
+    name: str
+    priority: int = 0
+    max_bytes: Optional[int] = None
+    pending: int = 0
+    bytes: int = 0
+    num_evicted: int = 0
+    num_rejected: int = 0
+
+    def __str__(self) -> str:
+        return (
+            f"RetentionClassStats [{self.name}]  priority: {self.priority}  pending: {self.pending}  "
+            f"bytes: {self.bytes}{'' if self.max_bytes is None else f' / {self.max_bytes}'}  "
+            f"evicted: {self.num_evicted}  rejected: {self.num_rejected}"
+        )
+
+
+@dataclass
+class ReceiveLaneStats:
+    """Messages taken from one lane of the receive queue and the seconds they waited in the queue. num_promoted
+    counts the messages served ahead of higher priority lanes to keep this lane from starving.
+
+    If the lane is bounded (max_size is greater than 0), num_dropped, num_coalesced and num_overflowed count the
+    messages dropped, replaced by a later message from the same source, and admitted over max_size when the lane was
+    full, and num_blocked and total_blocked the writers which waited for room in the lane and the seconds they
+    waited."""
+    name: str
+    num_received: int = 0
+    num_promoted: int = 0
+    depth: int = 0
+    max_depth: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+    max_size: int = 0
+    num_dropped: int = 0
+    num_coalesced: int = 0
+    num_overflowed: int = 0
+    num_blocked: int = 0
+    total_blocked: float = 0.0
+
+    def add_wait(self, wait: float) -> None:
+        self.num_received += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+    @property
+    def mean_wait(self) -> float:
+        if self.num_received:
+            return self.total_wait / self.num_received
+        return 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"ReceiveLaneStats [{self.name}]  received: {self.num_received}  promoted: {self.num_promoted}  "
+            f"depth: {self.depth}  max_depth: {self.max_depth}  "
+            f"mean_wait: {self.mean_wait:.4f}  max_wait: {self.max_wait:.4f}"
+            + (
+                f"  max_size: {self.max_size}  dropped: {self.num_dropped}  coalesced: {self.num_coalesced}  "
+                f"overflowed: {self.num_overflowed}  blocked: {self.num_blocked} ({self.total_blocked:.3f}s)"
+                if self.max_size else ""
+            )
+        )
+
+
+@dataclass
+class QueueWriterStats:
+    """Items written to an asyncio queue from other threads, and the batches in which they were delivered to the
+    event loop. Each batch costs one wakeup of the loop."""
+    name: str
+    num_items: int = 0
+    num_batches: int = 0
+    max_batch: int = 0
+
+    def add_batch(self, num_items: int) -> None:
+        self.num_items += num_items
+        self.num_batches += 1
+        self.max_batch = max(self.max_batch, num_items)
+
+    @property
+    def mean_batch(self) -> float:
+        if self.num_batches:
+            return self.num_items / self.num_batches
+        return 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"QueueWriterStats [{self.name}]  items: {self.num_items}  batches: {self.num_batches}  "
+            f"mean_batch: {self.mean_batch:.2f}  max_batch: {self.max_batch}"
+        )
+
+
+LATENCY_BUCKET_BOUNDS: tuple[float, ...] = (
+    0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0,
+)
+
+
+@dataclass
+class LatencyHistogram:
+    """Counts of latencies, in seconds, in fixed buckets. counts[i] is the number of latencies no greater than
+    LATENCY_BUCKET_BOUNDS[i] and greater than the bound before it; the last count is of latencies above every bound."""
+    counts: list[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKET_BOUNDS) + 1))
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(LATENCY_BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @property
+    def mean(self) -> float:
+        if self.count:
+            return self.total / self.count
+        return 0.0
+
+    def percentile(self, fraction: float) -> float:
+        """The upper bound of the bucket holding the given fraction of latencies, or max for the last bucket."""
+        if not self.count:
+            return 0.0
+        needed = fraction * self.count
+        seen = 0
+        for bucket_idx, bucket_count in enumerate(self.counts[:-1]):
+            seen += bucket_count
+            if seen >= needed:
+                return min(LATENCY_BUCKET_BOUNDS[bucket_idx], self.max)
+        return self.max
+
+    def as_dict(self) -> dict[str, Any]:
+        return dict(
+            bounds=list(LATENCY_BUCKET_BOUNDS),
+            counts=list(self.counts),
+            count=self.count,
+            total=self.total,
+            max=self.max,
+        )
+
+    def __str__(self) -> str:
+        return (
+            f"n: {self.count:5d}  mean: {self.mean:.4f}  p50: {self.percentile(0.5):.4f}  "
+            f"p99: {self.percentile(0.99):.4f}  max: {self.max:.4f}"
+        )
+
+
+@dataclass
+class MessageLatencyStats:
+    """Latencies of the messages processed by the Proactor, in three stages:
+
+    queue: from the creation of a message, by the Proactor or a thread writing to its receive queue, until the
+    message is taken from the queue, by message type.
+    handler: time spent in process_message, by message type.
+    mqtt: from the receipt of an MQTT message by the paho callback until it has been processed, by link and by the
+    type of the decoded message.
+    """
+    queue: dict[str, LatencyHistogram] = field(default_factory=lambda: defaultdict(LatencyHistogram))
+    handler: dict[str, LatencyHistogram] = field(default_factory=lambda: defaultdict(LatencyHistogram))
+    mqtt_by_link: dict[str, LatencyHistogram] = field(default_factory=lambda: defaultdict(LatencyHistogram))
+    mqtt_by_type: dict[str, LatencyHistogram] = field(default_factory=lambda: defaultdict(LatencyHistogram))
+
+    def __bool__(self) -> bool:
+        return bool(self.queue or self.handler or self.mqtt_by_link)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            stage: {name: histogram.as_dict() for name, histogram in histograms.items()}
+            for stage, histograms in [
+                ("queue", self.queue),
+                ("handler", self.handler),
+                ("mqtt_by_link", self.mqtt_by_link),
+                ("mqtt_by_type", self.mqtt_by_type),
+            ]
+        }
+
+    def __str__(self) -> str:
+        s = "MessageLatencyStats"
+        for stage, histograms in [
+            ("queue", self.queue),
+            ("handler", self.handler),
+            ("mqtt by link", self.mqtt_by_link),
+            ("mqtt by message_type", self.mqtt_by_type),
+        ]:
+            if histograms:
+                s += f"\n  {stage}:"
+                for name in sorted(histograms):
+                    s += f"\n    {histograms[name]}  [{name}]"
+        return s
+
+
+@dataclass
+class LoopLagStats:
+    """Scheduling delay of the event loop, sampled by the WatchdogManager: the seconds by which each sampling sleep
+    overran. num_over_threshold counts the lags above the threshold, num_reported those reported as a ProblemEvent,
+    and last_stack is the stack of the loop's thread captured during the most recent lag above the threshold, if
+    stacks are captured."""
+    lag: LatencyHistogram = field(default_factory=LatencyHistogram)
+    num_over_threshold: int = 0
+    num_reported: int = 0
+    last_stack: str = ""
+
+    def as_dict(self) -> dict[str, Any]:
+        return dict(
+            lag=self.lag.as_dict(),
+            num_over_threshold=self.num_over_threshold,
+            num_reported=self.num_reported,
+            last_stack=self.last_stack,
+        )
+
+    def __str__(self) -> str:
+        return (
+            f"LoopLagStats  {self.lag}  over threshold: {self.num_over_threshold}  reported: {self.num_reported}"
+        )
+
+
 class ProactorStats:
     num_received_by_type: dict[str, int]
     num_received_by_topic: dict[str, int]
     links: dict[str, LinkStats]
+    upload: UploadStats
+    persistence: PersistenceStats
+    retention: dict[str, RetentionClassStats]
+    receive_lanes: dict[str, ReceiveLaneStats]
+    queue_writers: dict[str, QueueWriterStats]
+    latency: MessageLatencyStats
+    loop_lag: LoopLagStats
+    num_persisted_events: int
+    persisted_json_bytes: int
+    persisted_encoded_bytes: int
+    num_coalesced_events: int
 
     def __init__(self, link_names: Optional[Sequence[str]] = None):
         self.num_received_by_type = defaultdict(int)
         self.num_received_by_topic = defaultdict(int)
+        self.upload = UploadStats()
+        self.persistence = PersistenceStats()
+        self.retention = dict()
+        self.receive_lanes = dict()
+        self.queue_writers = dict()
+        self.latency = MessageLatencyStats()
+        self.loop_lag = LoopLagStats()
+        self.num_persisted_events = 0
+        self.persisted_json_bytes = 0
+        self.persisted_encoded_bytes = 0
+        self.num_coalesced_events = 0
         if link_names is None:
             link_names = []
         self.links = {}
@@ -62,6 +392,18 @@ class ProactorStats:
         link_stats.num_received_by_type[message.Header.MessageType] += 1
         link_stats.num_received_by_topic[message.Payload.message.topic] += 1
 
+    def add_persisted_event(self, json_bytes: int, encoded_bytes: int) -> None:
+        self.num_persisted_events += 1
+        self.persisted_json_bytes += json_bytes
+        self.persisted_encoded_bytes += encoded_bytes
+
+    @property
+    def compression_ratio(self) -> float:
+        """Ratio of serialized JSON bytes to persisted bytes of all events generated."""
+        if self.persisted_encoded_bytes:
+            return self.persisted_json_bytes / self.persisted_encoded_bytes
+        return 1.0
+
     def total_received(self, message_type: str) -> int:
         return self.num_received_by_type.get(message_type, 0)
 
@@ -81,12 +423,38 @@ class ProactorStats:
     def link(self, name: str) -> LinkStats:
         return self.links[name]
 
+    def queue_writer(self, name: str) -> QueueWriterStats:
+        return self.queue_writers.setdefault(name, QueueWriterStats(name))
+
     def __str__(self) -> str:
         s = "ProactorStats Stats\n"
         if self.num_received_by_type:
             s += "\nGlobal received by message_type:"
             for message_type in sorted(self.num_received_by_type):
                 s += f"\n    {self.num_received_by_type[message_type]:3d}: [{message_type}]"
+        for lane in self.receive_lanes.values():
+            if lane.num_received:
+                s += f"\n{lane}"
+        for queue_writer in self.queue_writers.values():
+            if queue_writer.num_items:
+                s += f"\n{queue_writer}"
+        if self.latency:
+            s += f"\n{self.latency}"
+        if self.loop_lag.lag.count:
+            s += f"\n{self.loop_lag}"
+        if self.num_persisted_events:
+            s += (
+                f"\nPersisted events: {self.num_persisted_events}  json bytes: {self.persisted_json_bytes}  "
+                f"persisted bytes: {self.persisted_encoded_bytes}  compression ratio: {self.compression_ratio:.2f}"
+            )
+        if self.num_coalesced_events:
+            s += f"\nCoalesced events: {self.num_coalesced_events}"
+        if self.persistence.num_groups:
+            s += f"\n{self.persistence}"
+        for retention_class in self.retention.values():
+            s += f"\n{retention_class}"
+        if self.upload.num_uploads:
+            s += f"\n{self.upload}"
         for link_name in sorted(self.links):
             s += "\n"
             s += str(self.links[link_name])
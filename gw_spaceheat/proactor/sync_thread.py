@@ -6,11 +6,14 @@ import threading
 import time
 import traceback
 from abc import ABC
+from collections import deque
 from typing import Any
 from typing import Optional
 
 from proactor.message import InternalShutdownMessage
 from proactor.message import PatInternalWatchdogMessage
+from proactor.receive_queue import ReceiveQueue
+from proactor.stats import QueueWriterStats
 
 
 DEFAULT_STEP_DURATION = 0.1
@@ -35,10 +38,26 @@ class AsyncQueueWriter:
     """Allow synchronous code to write to an asyncio Queue.
 
     It is assumed the asynchronous reader has access to the asyncio Queue "await get()" from directly from it.
+
+    Items are buffered and moved to the asyncio Queue in batches: the first put() after a delivery schedules a
+    delivery callback on the event loop, and items put before that callback runs are delivered with it, so a burst of
+    items from other threads wakes the loop once instead of once per item. Items are delivered in the order in which
+    they were put. When the asyncio Queue is a ReceiveQueue, each item is delivered with the time it was put, and
+    put() first waits for room in the item's lane if that lane is bounded and blocks when full.
     """
 
     _loop: Optional[asyncio.AbstractEventLoop] = None
     _async_queue: Optional[asyncio.Queue] = None
+    _pending: deque
+    _delivery_scheduled: bool
+    _lock: threading.Lock
+    stats: QueueWriterStats
+
+    def __init__(self, stats: Optional[QueueWriterStats] = None):
+        self._pending = deque()
+        self._delivery_scheduled = False
+        self._lock = threading.Lock()
+        self.stats = QueueWriterStats(self.__class__.__name__) if stats is None else stats
 
     def set_async_loop(self, loop: asyncio.AbstractEventLoop, async_queue: asyncio.Queue) -> None:
         self._loop = loop
@@ -48,7 +67,31 @@ class AsyncQueueWriter:
         """Write to asyncio queue in a threadsafe way."""
         if self._loop is None or self._async_queue is None:
             raise ValueError("ERROR. start(loop, async_queue) must be called prior to put(item)")
-        self._loop.call_soon_threadsafe(self._async_queue.put_nowait, item)
+        reserved = self._async_queue.reserve_threadsafe(item) if isinstance(self._async_queue, ReceiveQueue) else None
+        with self._lock:
+            self._pending.append((time.monotonic(), item, reserved))
+            if self._delivery_scheduled:
+                return
+            self._delivery_scheduled = True
+        try:
+            self._loop.call_soon_threadsafe(self._deliver)
+        except BaseException:
+            with self._lock:
+                self._delivery_scheduled = False
+            raise
+
+    def _deliver(self) -> None:
+        with self._lock:
+            items = self._pending
+            self._pending = deque()
+            self._delivery_scheduled = False
+        if isinstance(self._async_queue, ReceiveQueue):
+            for created, item, reserved in items:
+                self._async_queue.put_nowait(item, created, reserved)
+        else:
+            for _, item, _ in items:
+                self._async_queue.put_nowait(item)
+        self.stats.add_batch(len(items))
 
 
 class SyncAsyncQueueWriter:
@@ -57,16 +100,19 @@ class SyncAsyncQueueWriter:
     It is assumed the asynchronous reader has access to the asyncio Queue "await get()" from directly from it.
     """
 
-    _loop: Optional[asyncio.AbstractEventLoop] = None
-    _async_queue: Optional[asyncio.Queue] = None
+    _async_writer: AsyncQueueWriter
     sync_queue: Optional[queue.Queue]
 
-    def __init__(self, sync_queue: Optional[queue.Queue] = None):
+    def __init__(self, sync_queue: Optional[queue.Queue] = None, stats: Optional[QueueWriterStats] = None):
         self.sync_queue = sync_queue
+        self._async_writer = AsyncQueueWriter(stats)
+
+    @property
+    def stats(self) -> QueueWriterStats:
+        return self._async_writer.stats
 
     def set_async_loop(self, loop: asyncio.AbstractEventLoop, async_queue: asyncio.Queue) -> None:
-        self._loop = loop
-        self._async_queue = async_queue
+        self._async_writer.set_async_loop(loop, async_queue)
 
     def put_to_sync_queue(
         self, item: Any, block: bool = True, timeout: Optional[float] = None
@@ -76,9 +122,7 @@ class SyncAsyncQueueWriter:
 
     def put_to_async_queue(self, item: Any):
         """Write to asynchronous queue in a threadsafe way."""
-        if self._loop is None or self._async_queue is None:
-            raise ValueError("ERROR. start(loop, async_queue) must be called prior to put(item)")
-        self._loop.call_soon_threadsafe(self._async_queue.put_nowait, item)
+        self._async_writer.put(item)
 
     def get_from_sync_queue(
         self, block: bool = True, timeout: Optional[float] = None
@@ -135,6 +179,10 @@ class SyncAsyncInteractionThread(threading.Thread, ABC):
     def _handle_exception(self, exception: BaseException) -> bool:
         return False
 
+    @property
+    def async_queue_stats(self) -> QueueWriterStats:
+        return self._channel.stats
+
     def request_stop(self) -> None:
         self.running = False
 
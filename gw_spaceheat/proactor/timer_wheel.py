@@ -0,0 +1,98 @@
+"""A hashed timer wheel, tracking many deadlines with O(1) insert and cancel.
+
+Deadlines are hashed into num_slots slots of tick_seconds each, by the tick in which they fall. expire() visits only
+the slots of the ticks which passed since it last ran, and of the current tick, so a single sweep finds every expired
+deadline without a timer per deadline. next_sweep() returns the end of the tick of the earliest deadline, so the sweep
+need only run when a deadline is due rather than every tick. Deadlines further away than the span of the wheel share
+slots with nearer ones and are skipped until their own tick comes around. A deadline is reported at most tick_seconds
+late.
+"""
+import math
+from typing import Hashable
+from typing import Optional
+
+DEFAULT_TIMER_WHEEL_TICK_SECONDS: float = 0.05
+DEFAULT_TIMER_WHEEL_SLOTS: int = 512
+
+
+class TimerWheel:
+    _tick_seconds: float
+    _slots: list[dict[Hashable, float]]
+    _slot_by_key: dict[Hashable, int]
+    _last_tick: Optional[int] = None
+
+    def __init__(
+        self,
+        tick_seconds: float = DEFAULT_TIMER_WHEEL_TICK_SECONDS,
+        num_slots: int = DEFAULT_TIMER_WHEEL_SLOTS,
+    ):
+        self._tick_seconds = tick_seconds
+        self._slots = [dict() for _ in range(num_slots)]
+        self._slot_by_key = dict()
+
+    @property
+    def tick_seconds(self) -> float:
+        return self._tick_seconds
+
+    def __len__(self) -> int:
+        return len(self._slot_by_key)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._slot_by_key
+
+    def _tick(self, t: float) -> int:
+        return math.floor(t / self._tick_seconds)
+
+    def add(self, key: Hashable, deadline: float) -> None:
+        """Track deadline for key, replacing any deadline key already has."""
+        self.cancel(key)
+        tick = self._tick(deadline)
+        if self._last_tick is not None:
+            # a deadline in a tick which has already been swept is reported by the next sweep
+            tick = max(tick, self._last_tick + 1)
+        slot_idx = tick % len(self._slots)
+        self._slots[slot_idx][key] = deadline
+        self._slot_by_key[key] = slot_idx
+
+    def cancel(self, key: Hashable) -> bool:
+        """Stop tracking key. Return False if key was not tracked."""
+        slot_idx = self._slot_by_key.pop(key, None)
+        if slot_idx is None:
+            return False
+        del self._slots[slot_idx][key]
+        return True
+
+    def next_sweep(self, now: float) -> Optional[float]:
+        """Return the time at which expire() should next be called, the end of the tick of the earliest deadline, or
+        None if no deadlines are tracked. If no deadline falls within the span of the wheel, this is the end of the
+        span."""
+        if not self._slot_by_key:
+            return None
+        first_tick = self._tick(now) if self._last_tick is None else self._last_tick + 1
+        for tick in range(first_tick, first_tick + len(self._slots)):
+            slot = self._slots[tick % len(self._slots)]
+            # a slot may also hold deadlines of later revolutions of the wheel
+            if slot and any(self._tick(deadline) <= tick for deadline in slot.values()):
+                return (tick + 1) * self._tick_seconds
+        return (first_tick + len(self._slots)) * self._tick_seconds
+
+    def expire(self, now: float) -> list[Hashable]:
+        """Stop tracking and return, in order of their deadlines, the keys whose deadlines are at or before now."""
+        curr_tick = self._tick(now)
+        if self._last_tick is None:
+            first_tick = curr_tick - len(self._slots) + 1
+        else:
+            first_tick = max(self._last_tick + 1, curr_tick - len(self._slots) + 1)
+        # deadlines later in the current tick are found by the next sweep
+        self._last_tick = curr_tick - 1
+        expired: list[tuple[float, Hashable]] = []
+        for tick in range(first_tick, curr_tick + 1):
+            slot = self._slots[tick % len(self._slots)]
+            if slot:
+                for key, deadline in list(slot.items()):
+                    if deadline <= now:
+                        del slot[key]
+                        del self._slot_by_key[key]
+                        expired.append((deadline, key))
+        expired.sort(key=lambda entry: entry[0])
+        return [key for _, key in expired]
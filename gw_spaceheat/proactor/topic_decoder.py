@@ -0,0 +1,89 @@
+"""Decoding of received MQTT messages routed by the message type in their topic.
+
+MQTTCodec.decode() parses every message through the codec's MessageDecoder, which, for payloads not decoded by a
+maker, validates the message against the union of every payload type the codec knows, discriminated by TypeName.
+The topic of a GridWorks message already names its message type, so TopicDecoder maps that type directly to the
+decoder of its payload - the codec's maker for the type, or the parse_obj of the type's member of the discriminator
+union - and decodes the payload with it alone. The route of each topic, including the check of its source alias, is
+found once and cached.
+
+The payload is always validated by its decoder. The envelope (Message and Header) is validated unless the decoder is
+trusted, in which case it is constructed directly from the decoded JSON; use this only for brokers whose publishers
+are known to send well formed messages, such as a local broker. Messages whose topic does not name a type known to
+the codec, or whose header does not agree with their topic, are decoded by MQTTCodec.decode().
+"""
+import json
+from typing import Any
+from typing import Callable
+from typing import NamedTuple
+from typing import Optional
+
+from gwproto import MQTTCodec
+from gwproto import MQTTTopic
+from gwproto.decoders import MessageDecoder
+from gwproto.message import Header
+
+from proactor.message import Message
+
+
+class _TopicRoute(NamedTuple):
+    message_type: str
+    decode_payload: Callable[[Any], Any]
+
+
+class TopicDecoder:
+    codec: MQTTCodec
+    trusted: bool
+    _payload_decoders: dict[str, Callable[[Any], Any]]
+    _routes: dict[str, Optional[_TopicRoute]]
+
+    def __init__(self, codec: MQTTCodec, trusted: bool = False):
+        self.codec = codec
+        self.trusted = trusted
+        self._payload_decoders = self.payload_decoders(codec)
+        self._routes = dict()
+
+    @classmethod
+    def payload_decoders(cls, codec: MQTTCodec) -> dict[str, Callable[[Any], Any]]:
+        """Map each message type the codec decodes to the function decoding its payload, as MessageDecoder would."""
+        payload_decoders: dict[str, Callable[[Any], Any]] = dict()
+        if Message.type_name() in codec.decoders:
+            message_decoder = codec.decoders.decoder(Message.type_name())
+            if isinstance(message_decoder, MessageDecoder) and message_decoder.message_payload_discriminator:
+                payload_field = message_decoder.message_payload_discriminator.__fields__["Payload"]
+                for type_name, sub_field in (payload_field.sub_fields_mapping or {}).items():
+                    payload_decoders[type_name] = sub_field.type_.parse_obj
+        for type_name in codec.decoders.types():
+            if type_name != Message.type_name():
+                payload_decoders[type_name] = codec.decoders.decoder(type_name).decode_obj
+        return payload_decoders
+
+    def _route(self, topic: str) -> Optional[_TopicRoute]:
+        try:
+            return self._routes[topic]
+        except KeyError:
+            route = None
+            decoded_topic = MQTTTopic.decode(topic)
+            if (
+                decoded_topic.envelope_type == Message.type_name()
+                and (decode_payload := self._payload_decoders.get(decoded_topic.message_type)) is not None
+            ):
+                self.codec.validate_source_alias(decoded_topic.src)
+                route = _TopicRoute(decoded_topic.message_type, decode_payload)
+            self._routes[topic] = route
+            return route
+
+    def decode(self, topic: str, payload: bytes) -> Message[Any]:
+        route = self._route(topic)
+        if route is not None:
+            message_dict = json.loads(payload)
+            header_dict = message_dict.get("Header", {})
+            if header_dict.get("MessageType") == route.message_type:
+                decoded_payload = route.decode_payload(message_dict.get("Payload", {}))
+                if self.trusted:
+                    return Message.construct(
+                        Header=Header.construct(**header_dict),
+                        Payload=decoded_payload,
+                    )
+                return Message(Header=Header.parse_obj(header_dict), Payload=decoded_payload)
+        return self.codec.decode(topic, payload)
@@ -0,0 +1,170 @@
+"""Pacing of the upload of pending events.
+
+PendingEventUploader only tracks which pending events should be published next; the Proactor does the publishing and
+reports acks and timeouts back to it. Each uploaded message, identified by its message id, carries either one event or
+a batch of events. Pending events are read from the persister's iter_pending() one chunk at a time, as the upload
+needs them, so that starting an upload of a large backlog neither lists nor reads the whole backlog at once.
+"""
+import time
+from collections import deque
+from typing import Iterable
+from typing import Iterator
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+
+from proactor.config.upload import UploadSettings
+from proactor.persister import PendingContent
+from proactor.stats import UploadStats
+
+
+class _InFlight(NamedTuple):
+    sent_at: float
+    uids: Sequence[str]
+
+
+class PendingEventUploader:
+    ACK_LATENCY_GAIN: float = 0.125
+
+    _settings: UploadSettings
+    _stats: UploadStats
+    _queue: deque[PendingContent]
+    _chunks: Optional[Iterator[Sequence[PendingContent]]] = None
+    _num_unread: int = 0
+    _in_flight: dict[str, _InFlight]
+    _window: float
+
+    def __init__(self, settings: UploadSettings, stats: Optional[UploadStats] = None):
+        self._settings = settings
+        self._stats = UploadStats() if stats is None else stats
+        self._queue = deque()
+        self._in_flight = dict()
+        self._window = float(settings.initial_window)
+        self._update_stats()
+
+    @property
+    def window(self) -> int:
+        return max(self._settings.min_window, int(self._window))
+
+    @property
+    def stats(self) -> UploadStats:
+        return self._stats
+
+    @property
+    def num_queued(self) -> int:
+        """Number of events read from the persister and not yet sent."""
+        return len(self._queue)
+
+    @property
+    def num_in_flight(self) -> int:
+        return len(self._in_flight)
+
+    def __contains__(self, message_id: str) -> bool:
+        return message_id in self._in_flight
+
+    @property
+    def uploading(self) -> bool:
+        """True while events of the current upload remain to be read, sent or acked."""
+        return self._chunks is not None or bool(self._queue) or bool(self._in_flight)
+
+    def start(
+        self,
+        chunks: Iterable[Sequence[PendingContent]],
+        num_pending: int,
+        now: Optional[float] = None,
+    ) -> bool:
+        """Start uploading the num_pending events yielded by chunks. Does nothing and returns False if an upload is
+        already running, as when the link is activated in its second direction, so that events in flight are not
+        sent again; after stop() the next upload sends them again, since they may have been published before the
+        peer was listening."""
+        if self.uploading:
+            return False
+        self._chunks = iter(chunks)
+        self._num_unread = num_pending
+        self._stats.start_upload(num_pending, now)
+        self._update_stats()
+        return True
+
+    def stop(self) -> None:
+        """Abandon the current upload, as after a connection failure. Pending events remain in the persister and
+        are uploaded by the next start()."""
+        self._queue.clear()
+        self._chunks = None
+        self._in_flight.clear()
+        self._stats.backlog = 0
+        self._update_stats()
+
+    def next_event(self) -> Optional[PendingContent]:
+        """Return the next event to upload, or None if the upload is complete or the window is full."""
+        if len(self._in_flight) < self.window:
+            return self.next_batched_event()
+        return None
+
+    def next_batched_event(self) -> Optional[PendingContent]:
+        """Return the next event to add to the batch started by next_event(), or None if the upload is complete."""
+        while not self._queue and self._chunks is not None:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                # events cleared before they were read are no longer part of the backlog
+                self._chunks = None
+                self._stats.backlog = max(0, self._stats.backlog - self._num_unread)
+            else:
+                self._queue.extend(chunk)
+                self._num_unread = max(0, self._num_unread - len(chunk))
+        if self._queue:
+            return self._queue.popleft()
+        return None
+
+    def requeue(self, event: PendingContent) -> None:
+        """Return an event obtained from next_event() or next_batched_event() which was not sent to the front of the
+        queue."""
+        self._queue.appendleft(event)
+
+    def sent(self, message_id: str, now: Optional[float] = None, uids: Optional[Sequence[str]] = None) -> None:
+        """Record that a message carrying uids, by default just message_id, was published."""
+        self._in_flight[message_id] = _InFlight(
+            time.time() if now is None else now,
+            (message_id,) if uids is None else uids,
+        )
+        self._update_stats()
+
+    def skipped(self) -> None:
+        """Record that the event returned by next_event() was not sent because it is no longer pending."""
+        self._stats.backlog = max(0, self._stats.backlog - 1)
+
+    def acked(self, message_id: str, now: Optional[float] = None) -> Sequence[str]:
+        """Record an ack, adapting the window to the observed latency. Return the uids carried by the acked message,
+        which are empty if message_id was not in flight."""
+        in_flight = self._in_flight.pop(message_id, None)
+        if in_flight is None:
+            return ()
+        latency = (time.time() if now is None else now) - in_flight.sent_at
+        if self._stats.num_acked:
+            self._stats.ack_latency += self.ACK_LATENCY_GAIN * (latency - self._stats.ack_latency)
+        else:
+            self._stats.ack_latency = latency
+        if latency <= self._settings.target_ack_seconds:
+            self._window = min(float(self._settings.max_window), self._window + 1)
+        else:
+            self._window = max(float(self._settings.min_window), self._window - 0.5)
+        self._stats.num_acked += len(in_flight.uids)
+        self._stats.upload_acked += len(in_flight.uids)
+        self._stats.backlog = max(0, self._stats.backlog - len(in_flight.uids))
+        self._update_stats()
+        return in_flight.uids
+
+    def timed_out(self, message_id: str) -> bool:
+        """Record an ack timeout, halving the window. The events remain pending in the persister and are uploaded by
+        the next start(). Return False if message_id was not in flight."""
+        in_flight = self._in_flight.pop(message_id, None)
+        if in_flight is None:
+            return False
+        self._window = max(float(self._settings.min_window), self._window / 2)
+        self._stats.num_timeouts += 1
+        self._stats.backlog = max(0, self._stats.backlog - len(in_flight.uids))
+        self._update_stats()
+        return True
+
+    def _update_stats(self) -> None:
+        self._stats.in_flight = len(self._in_flight)
+        self._stats.window = self._window
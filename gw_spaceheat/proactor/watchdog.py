@@ -1,11 +1,13 @@
 import asyncio
 import os
-import subprocess
 import time
 from typing import Optional
 
+import gwproto
 from gwproto import Message
+from gwproto.messages import ProblemEvent
 
+from proactor.loop_lag import LoopLagMonitor
 from proactor.message import InternalShutdownMessage
 from proactor.proactor_interface import Communicator
 from proactor.proactor_interface import MonitoredName
@@ -15,6 +17,7 @@ from proactor.message import KnownNames
 from proactor.message import PatExternalWatchdog
 from proactor.message import PatExternalWatchdogMessage
 from proactor.message import PatInternalWatchdog
+from proactor.sd_notify import SdNotifier
 
 class _MonitoredName(MonitoredName):
     last_pat: float = 0.0
@@ -26,7 +29,8 @@ class WatchdogManager(Communicator, Runnable):
     _watchdog_task: Optional[asyncio.Task] = None
     _seconds_per_pat: float
     _monitored_names: dict[str, _MonitoredName]
-    _pat_external_watchdog_process_args: list[str]
+    _notifier: Optional[SdNotifier] = None
+    _loop_lag: LoopLagMonitor
 
     def __init__(
         self,
@@ -37,25 +41,36 @@ class WatchdogManager(Communicator, Runnable):
         self.lg = services.logger
         self._seconds_per_pat = seconds_per_pat
         self._monitored_names = dict()
-        self._pat_external_watchdog_process_args = []
+        self._loop_lag = LoopLagMonitor(services.settings.loop_lag, services.stats.loop_lag, self._report_loop_lag)
+
+    @property
+    def loop_lag(self) -> LoopLagMonitor:
+        return self._loop_lag
 
     def start(self):
         if self._watchdog_task is None:
             if os.getenv(self.RUNNING_AS_SERIVCE_ENV_NAME, "").lower() in ["1", "true"]:
-                self._pat_external_watchdog_process_args = [
-                    "systemd-notify",
-                    f"--pid={os.getpid()}",
-                    "WATCHDOG=1",
-                ]
-            self.lg.lifecycle(f"WatchdogManager: [{' '.join(self._pat_external_watchdog_process_args)}]")
+                self._notifier = SdNotifier()
+                if self._notifier.enabled:
+                    self.lg.lifecycle(f"WatchdogManager: notifying systemd at [{self._notifier.address!r}]")
+                    self._notifier.ready(f"{self._services.name} running")
+                else:
+                    self.lg.warning("WatchdogManager: running as a service but NOTIFY_SOCKET is not set")
+            else:
+                self.lg.lifecycle("WatchdogManager: not notifying systemd")
             now = time.time()
             for monitored in self._monitored_names.values():
                 monitored.last_pat = now
             self._watchdog_task = asyncio.create_task(self._check_pats(), name="pat_watchdog")
+            self._loop_lag.start()
 
     def stop(self):
         if self._watchdog_task is not None and not self._watchdog_task.done():
             self._watchdog_task.cancel()
+            if self._notifier is not None:
+                self._notifier.stopping(f"{self._services.name} stopping")
+                self._notifier.close()
+        self._loop_lag.stop()
 
     async def join(self):
         if self._watchdog_task is not None:
@@ -63,6 +78,7 @@ class WatchdogManager(Communicator, Runnable):
                 await self._watchdog_task
             except asyncio.CancelledError:
                 pass
+        await self._loop_lag.join()
 
     def process_message(self, message: Message) -> None:
         # self.lg.path("++WatchdogManager.process_message")
@@ -131,6 +147,29 @@ class WatchdogManager(Communicator, Runnable):
             )
         ))
 
+    def _report_loop_lag(self, lag: float, stack: str) -> None:
+        details = str(self._loop_lag.stats)
+        if stack:
+            details += f"\nStack of the event loop while blocked:\n{stack}"
+        self._services.generate_event(
+            ProblemEvent(
+                ProblemType=gwproto.messages.Problems.warning,
+                Summary=(
+                    f"Event loop lag {lag:.3f} seconds exceeded threshold "
+                    f"{self._loop_lag.settings.threshold_seconds:.3f} seconds"
+                ),
+                Details=details,
+            )
+        )
+
+    def notify_status(self, status: str) -> None:
+        """Set the status shown by systemctl status, if notifying systemd."""
+        if self._notifier is not None:
+            self._notifier.status(status)
+
     def _pat_external_watchdog(self):
-        if self._pat_external_watchdog_process_args:
-            subprocess.run(self._pat_external_watchdog_process_args, check=True)
+        if self._notifier is not None and not self._notifier.watchdog():
+            self.lg.warning(
+                f"WatchdogManager: failed to notify systemd watchdog ({self._notifier.num_failed} failures): "
+                f"{self._notifier.last_error}"
+            )
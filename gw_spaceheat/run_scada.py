@@ -1,6 +1,4 @@
-import asyncio
-
-from command_line_utils import run_async_actors_main
+from command_line_utils import run_async_actors
 
 if __name__ == "__main__":
-    asyncio.run(run_async_actors_main())
+    run_async_actors()
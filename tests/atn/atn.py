@@ -52,7 +52,7 @@ from tests.atn.atn_config import AtnSettings
 
 AtnMessageDecoder = create_message_payload_discriminator(
     model_name="AtnMessageDecoder",
-    module_names=["gwproto.messages", "actors2.message"],
+    module_names=["gwproto.messages", "proactor.message", "actors2.message"],
     modules=[messages],
 )
 
@@ -116,3 +116,29 @@ async def test_run_local2(tmp_path, monkeypatch, request):
                     print(e)
 
     await AsyncFragmentRunner.async_run_fragment(Fragment, tag=request.node.name)
+
+
+def test_run_async_actors_settings(monkeypatch):
+    """run_async_actors() parses its arguments and makes its settings once, passing both to run_async_actors_main()"""
+    import command_line_utils
+
+    made = []
+    received = []
+
+    class CountingSettings(ScadaSettings):
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            made.append(self)
+
+    async def main(argv=None, args=None, settings=None):
+        received.append((argv, args, settings))
+
+    monkeypatch.setattr(command_line_utils, "ScadaSettings", CountingSettings)
+    monkeypatch.setattr(command_line_utils, "run_async_actors_main", main)
+    command_line_utils.run_async_actors(["-e", os.getenv(TEST_DOTENV_PATH_VAR, TEST_DOTENV_PATH)])
+    assert len(made) == 1
+    assert len(received) == 1
+    argv, args, settings = received[0]
+    assert argv is None
+    assert args.env_file == os.getenv(TEST_DOTENV_PATH_VAR, TEST_DOTENV_PATH)
+    assert settings is made[0]
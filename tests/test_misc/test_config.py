@@ -6,12 +6,19 @@ from pathlib import Path
 import dotenv
 
 from actors2.config import PersisterSettings
+from proactor.config import EventLoopImplementation
 from proactor.config import LoggingSettings
+from proactor.config import LoopLagSettings
 from proactor.config import MQTTClient
 from proactor.config import Paths
+from proactor.config import ReceiveQueueSettings
+from proactor.config import UploadSettings
 from actors2.config import ScadaSettings
 from pydantic import SecretStr
 
+from proactor.config.proactor_settings import DEFAULT_ACK_TIMEOUT_SECONDS
+from proactor.config.proactor_settings import DEFAULT_PATH_PROFILE_SAMPLES
+from proactor.config.proactor_settings import DEFAULT_RECEIVE_STARVATION_LIMIT
 from proactor.config.proactor_settings import MQTT_LINK_POLL_SECONDS
 
 
@@ -22,7 +29,7 @@ def test_mqtt_client_settings():
     exp = dict(host="a", keepalive=1, bind_address="b", bind_port=2, username="c", password=SecretStr(password))
     settings = MQTTClient(**exp)
     d = settings.dict()
-    assert d == dict(exp, port=port)
+    assert d == dict(exp, port=port, ack_timeout_seconds=None, trusted=False)
     for k, v in exp.items():
         assert d[k] == v
         assert getattr(settings, k) == v
@@ -174,7 +181,16 @@ def test_scada_settings_defaults(clean_scada_env, tmp_path):
         paths=exp_paths_dict(home=tmp_path),
         logging=LoggingSettings().dict(),
         persister=PersisterSettings().dict(),
+        upload=UploadSettings().dict(),
         mqtt_link_poll_seconds=MQTT_LINK_POLL_SECONDS,
+        ack_timeout_seconds=DEFAULT_ACK_TIMEOUT_SECONDS,
+        receive_starvation_limit=DEFAULT_RECEIVE_STARVATION_LIMIT,
+        receive_queue=ReceiveQueueSettings().dict(),
+        path_profiling=False,
+        path_profile_samples=DEFAULT_PATH_PROFILE_SAMPLES,
+        mqtt_full_validation=False,
+        loop_lag=LoopLagSettings().dict(),
+        event_loop=EventLoopImplementation.asyncio,
     )
     assert settings.dict() == exp
     assert settings.local_mqtt == MQTTClient()
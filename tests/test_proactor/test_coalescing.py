@@ -0,0 +1,43 @@
+from proactor.coalescing import Coalesced
+from proactor.coalescing import EventCoalescer
+from proactor.config import CoalescingPolicy
+
+SECOND_NS = 1_000_000_000
+
+
+def test_coalescer_keep_every():
+    coalescer = EventCoalescer(
+        [
+            CoalescingPolicy(type_names=["gridworks.event.snapshot.*"], keep_every=3),
+            CoalescingPolicy(type_names=["gridworks.event.*"], keep_every=2),
+        ]
+    )
+    assert coalescer
+    assert not EventCoalescer()
+    assert coalescer.policy("gridworks.event.snapshot.spaceheat.100").keep_every == 3
+    assert coalescer.policy("gridworks.event.problem").keep_every == 2
+    assert coalescer.policy("gt.sh.status.110") is None
+
+    kept = [
+        coalescer.coalesce(str(i), "gridworks.event.snapshot.spaceheat.100", i * SECOND_NS).persist
+        for i in range(7)
+    ]
+    assert kept == [True, False, False, True, False, False, True]
+    assert coalescer.coalesce("a", "gt.sh.status.110", 0) == Coalesced()
+    assert coalescer.coalesce("b", "gridworks.event.problem", 0).persist
+    assert not coalescer.coalesce("c", "gridworks.event.problem", 0).persist
+
+    # reset starts counting again
+    coalescer.reset()
+    assert coalescer.coalesce("7", "gridworks.event.snapshot.spaceheat.100", 7 * SECOND_NS).persist
+
+
+def test_coalescer_window():
+    coalescer = EventCoalescer([CoalescingPolicy(type_names=["snapshot"], window_seconds=60)])
+    assert coalescer.coalesce("a", "snapshot", 0) == Coalesced()
+    assert coalescer.coalesce("b", "snapshot", 30 * SECOND_NS) == Coalesced(replaces="a")
+    assert coalescer.coalesce("c", "snapshot", 59 * SECOND_NS) == Coalesced(replaces="b")
+    assert coalescer.coalesce("d", "snapshot", 60 * SECOND_NS) == Coalesced()
+    assert coalescer.coalesce("e", "snapshot", 61 * SECOND_NS) == Coalesced(replaces="d")
+    coalescer.reset()
+    assert coalescer.coalesce("f", "snapshot", 62 * SECOND_NS) == Coalesced()
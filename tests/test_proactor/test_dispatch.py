@@ -0,0 +1,79 @@
+import pytest
+from gwproto.messages import Ack
+from gwproto.messages import GsPwr
+from gwproto.messages import GtDispatchBoolean_Maker
+from gwproto.messages import ProblemEvent
+from gwproto.messages import Problems as ProblemType
+
+from actors2 import Scada2
+from actors2.config import ScadaSettings
+from proactor import Proactor
+from proactor import ProactorSettings
+from proactor.dispatch import MessageRoutes
+from proactor.message import PatInternalWatchdog
+from proactor.message import PatWatchdog
+import load_house
+
+
+class Base:
+    pass
+
+
+class Derived(Base):
+    pass
+
+
+class Unrouted:
+    pass
+
+
+def base_handler(message):
+    return message
+
+
+def mqtt_handler(message, decoded):
+    return message, decoded
+
+
+def test_message_routes():
+    routes = MessageRoutes()
+    routes.add(Base, base_handler, 0x1)
+    with pytest.raises(ValueError):
+        routes.add(Base, base_handler)
+    assert routes.route(Base()).path == 0x1
+    # subclasses take the route of their nearest routed base
+    assert routes.route(Derived()).handler is base_handler
+    assert routes.route(Unrouted()) is None
+    routes.add(Derived, base_handler, 0x2)
+    assert routes.route(Derived()).path == 0x2
+
+    routes.add_mqtt("t", mqtt_handler, 0x10)
+    routes.add_mqtt("t", mqtt_handler, 0x20, client="c")
+    with pytest.raises(ValueError):
+        routes.add_mqtt("t", mqtt_handler, client="c")
+    assert routes.mqtt_route("c", "t").path == 0x20
+    assert routes.mqtt_route("other", "t").path == 0x10
+    assert routes.mqtt_route("c", "u") is None
+
+    assert routes.table() == dict(
+        messages=dict(Base="base_handler", Derived="base_handler"),
+        mqtt={"t": "mqtt_handler", "c/t": "mqtt_handler"},
+    )
+
+
+def test_proactor_routes():
+    proactor = Proactor("p", ProactorSettings())
+    assert proactor.routes.route(PatInternalWatchdog()).handler.__qualname__ == "WatchdogManager.process_message"
+    assert proactor.routes.route(ProblemEvent(ProblemType=ProblemType.warning, Summary="")).path == 0x00000200
+    assert proactor.routes.mqtt_route("any", Ack.__fields__["TypeName"].default).path == 0x00000040
+    assert PatWatchdog.__name__ in proactor.routes.table()["messages"]
+
+
+def test_scada_routes():
+    settings = ScadaSettings()
+    settings.paths.mkdirs()
+    layout = load_house.load_all(settings)
+    scada = Scada2("a.s", settings, hardware_layout=layout)
+    assert scada.routes.route(GsPwr(Power=1)).handler.__qualname__ == "Scada2._process_gs_pwr"
+    assert scada.routes.mqtt_route(Scada2.GRIDWORKS_MQTT, GtDispatchBoolean_Maker.type_alias) is not None
+    assert scada.routes.mqtt_route(Scada2.LOCAL_MQTT, GtDispatchBoolean_Maker.type_alias) is None
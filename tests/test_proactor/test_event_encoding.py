@@ -0,0 +1,140 @@
+import json
+import zlib
+
+import pytest
+from gwproto import Decoders
+from gwproto import Message
+from gwproto import create_message_payload_discriminator
+from gwproto.messages import MQTTFullySubscribedEvent
+from gwproto.messages import ProblemEvent
+from gwproto.messages import Problems as ProblemType
+
+from proactor.config import PersisterEncoding
+from proactor.config import PersisterSettings
+from proactor.event_encoding import EventCodec
+from proactor.event_encoding import EventEncodingError
+from proactor.event_encoding import train_zstd_dictionary
+from proactor.event_encoding import wire_event
+from proactor.event_encoding import zstandard
+from proactor.message import EventBatch
+from proactor.stats import ProactorStats
+
+
+def make_events(n: int) -> list:
+    events = []
+    for i in range(n):
+        events.append(MQTTFullySubscribedEvent(PeerName=f"peer{i % 3}"))
+        events.append(
+            ProblemEvent(
+                ProblemType=ProblemType.error,
+                Summary=f"problem {i}",
+                Details=f"details of problem {i} " * 10,
+            )
+        )
+    return events
+
+
+def encodings() -> list[PersisterEncoding]:
+    return [
+        encoding for encoding in PersisterEncoding
+        if encoding != PersisterEncoding.zstd or zstandard is not None
+    ]
+
+
+@pytest.mark.parametrize("encoding", encodings())
+def test_event_codec_round_trip(encoding: PersisterEncoding):
+    codec = EventCodec(encoding)
+    assert codec.encoding == encoding
+    for event in make_events(3):
+        wire = wire_event(event, "a.b")
+        assert wire.topic == f"gw/a-b/{event.TypeName.replace('.', '-')}"
+        encoded = codec.encode(*wire)
+        assert encoded.json_size == len(wire.payload)
+        assert codec.decode(encoded.content) == wire
+        if encoding == PersisterEncoding.json:
+            assert encoded.content == wire.topic.encode() + b"\n" + wire.payload
+
+
+def test_event_codec_legacy_decode():
+    event = make_events(1)[1]
+    legacy = event.json(sort_keys=True, indent=2).encode()
+    for encoding in encodings():
+        codec = EventCodec(encoding)
+        assert codec.decode(legacy) == json.loads(event.json())
+        assert codec.decode(zlib.compress(legacy)) == json.loads(event.json())
+
+
+def test_event_codec_mixed_decode():
+    events = make_events(2)
+    codecs = [EventCodec(encoding) for encoding in encodings()]
+    for i, event in enumerate(events):
+        wire = wire_event(event, "a")
+        content = codecs[i % len(codecs)].encode(*wire).content
+        for codec in codecs:
+            assert codec.decode(content) == wire
+
+
+def test_event_batch_encoding():
+    events = make_events(2)
+    payloads = [wire_event(event, "a").payload for event in events]
+    message, payload = EventBatch.encode_batch("a", payloads)
+    assert message.Header.Src == "a"
+    assert message.Header.AckRequired
+    assert message.Header.MessageId == message.Payload.MessageId
+    decoded = Decoders.from_objects(
+        message_payload_discriminator=create_message_payload_discriminator(
+            "BatchTestDiscriminator",
+            ["gwproto.messages", "proactor.message"],
+        )
+    ).decode_obj(Message.type_name(), json.loads(payload))
+    assert decoded.Header == message.Header
+    assert decoded.Payload.Messages == [json.loads(event_payload) for event_payload in payloads]
+
+    # the envelope is not located by its text, which other fields may contain
+    message, payload = EventBatch.encode_batch('"Messages": []', payloads)
+    assert json.loads(payload)["Header"]["Src"] == '"Messages": []'
+    assert json.loads(payload)["Payload"]["Messages"] == [json.loads(event_payload) for event_payload in payloads]
+
+
+def test_event_codec_compression_stats():
+    stats = ProactorStats()
+    assert stats.compression_ratio == 1.0
+    codec = EventCodec(PersisterEncoding.zlib)
+    for event in make_events(10):
+        encoded = codec.encode(*wire_event(event))
+        stats.add_persisted_event(encoded.json_size, len(encoded.content))
+    assert stats.num_persisted_events == 20
+    assert stats.persisted_json_bytes > stats.persisted_encoded_bytes
+    assert stats.compression_ratio > 1.0
+    assert "compression ratio" in str(stats)
+
+
+@pytest.mark.skipif(zstandard is None, reason="zstandard not installed")
+def test_event_codec_zstd_dictionary(tmp_path):
+    samples = make_events(200)
+    dictionary = train_zstd_dictionary(samples, dictionary_bytes=4 * 1024)
+    dictionary_path = tmp_path / "events.dict"
+    dictionary_path.write_bytes(dictionary)
+    codec = EventCodec.from_settings(
+        PersisterSettings(encoding=PersisterEncoding.zstd, zstd_dictionary_path=dictionary_path)
+    )
+    plain = EventCodec(PersisterEncoding.zstd)
+    wire = wire_event(make_events(1)[1])
+    encoded = codec.encode(*wire)
+    assert codec.decode(encoded.content) == wire
+    assert len(encoded.content) < len(plain.encode(*wire).content)
+
+    # Training also accepts persisted content.
+    persisted = [EventCodec(PersisterEncoding.zlib).encode(*wire_event(sample)).content for sample in samples]
+    assert train_zstd_dictionary(persisted, dictionary_bytes=4 * 1024)
+
+
+def test_event_codec_zstd_missing(monkeypatch):
+    monkeypatch.setattr("proactor.event_encoding.zstandard", None)
+    with pytest.raises(EventEncodingError):
+        EventCodec(PersisterEncoding.zstd)
+    with pytest.raises(EventEncodingError):
+        train_zstd_dictionary(make_events(1))
+    codec = EventCodec(PersisterEncoding.json)
+    with pytest.raises(EventEncodingError):
+        codec.decode(b"\x28\xb5\x2f\xfd" + b"\x00" * 8)
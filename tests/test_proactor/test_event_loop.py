@@ -0,0 +1,32 @@
+import asyncio
+
+from command_line_utils import event_loop_args
+from command_line_utils import parse_args
+from proactor.config import EventLoopImplementation
+from proactor.event_loop import available_event_loops
+from proactor.event_loop import event_loop_factory
+from proactor.event_loop import event_loop_implementation
+from proactor.event_loop import run_event_loop
+
+
+async def running_on() -> EventLoopImplementation:
+    return event_loop_implementation(asyncio.get_running_loop())
+
+
+def test_run_event_loop():
+    assert EventLoopImplementation.asyncio in available_event_loops()
+    assert event_loop_factory(EventLoopImplementation.asyncio) is None
+    assert run_event_loop(running_on(), EventLoopImplementation.asyncio) == EventLoopImplementation.asyncio
+
+    # uvloop if installed, otherwise the default asyncio loop
+    expected = (
+        EventLoopImplementation.uvloop
+        if EventLoopImplementation.uvloop in available_event_loops()
+        else EventLoopImplementation.asyncio
+    )
+    assert run_event_loop(running_on(), EventLoopImplementation.uvloop) == expected
+
+
+def test_event_loop_args():
+    assert event_loop_args(parse_args([])) == dict()
+    assert event_loop_args(parse_args(["--event-loop", "uvloop"])) == dict(event_loop=EventLoopImplementation.uvloop)
@@ -0,0 +1,62 @@
+import asyncio
+import time
+
+from proactor.config import LoopLagSettings
+from proactor.loop_lag import LoopLagMonitor
+from proactor.stats import ProactorStats
+
+
+def block_the_loop(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+def test_loop_lag_monitor():
+    stats = ProactorStats()
+    reports = []
+
+    async def run():
+        monitor = LoopLagMonitor(
+            LoopLagSettings(
+                sample_seconds=0.01,
+                threshold_seconds=0.1,
+                report_interval_seconds=60,
+                capture_stacks=True,
+            ),
+            stats.loop_lag,
+            on_lag=lambda lag, stack: reports.append((lag, stack)),
+        )
+        monitor.start()
+        await asyncio.sleep(0.1)
+        block_the_loop(0.3)
+        await asyncio.sleep(0.05)
+        # a second lag above the threshold within report_interval_seconds is counted but not reported
+        block_the_loop(0.2)
+        await asyncio.sleep(0.05)
+        monitor.stop()
+        await monitor.join()
+
+    asyncio.run(run())
+    assert stats.loop_lag.lag.count > 5
+    assert stats.loop_lag.num_over_threshold == 2
+    assert stats.loop_lag.num_reported == 1
+    assert len(reports) == 1
+    lag, stack = reports[0]
+    assert lag >= 0.25
+    assert "block_the_loop" in stack
+    assert "block_the_loop" in stats.loop_lag.last_stack
+    assert stats.loop_lag.lag.max == lag
+    assert "LoopLagStats" in str(stats)
+
+
+def test_loop_lag_check():
+    monitor = LoopLagMonitor(LoopLagSettings(threshold_seconds=0.5, report_interval_seconds=10))
+    reports = []
+    monitor._on_lag = lambda lag, stack: reports.append(lag)
+    monitor.check(-0.001, 0.0)
+    monitor.check(1.0, 1.0)
+    monitor.check(2.0, 5.0)
+    monitor.check(3.0, 11.0)
+    assert monitor.stats.lag.count == 4
+    assert monitor.stats.lag.counts[0] == 1
+    assert monitor.stats.num_over_threshold == 3
+    assert reports == [1.0, 3.0]
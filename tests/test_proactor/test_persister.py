@@ -1,26 +1,45 @@
 import json
+import os
 import shutil
+import threading
 from pathlib import Path
 from typing import Optional
 from typing import Union
 
 import gwproto.messages
 import pendulum
+import pytest
 from gwproto.messages import ProblemEvent
+from result import Err
+from result import Ok
 from result import Result
 
 from actors2.config import ScadaSettings
+from proactor.config import DEFAULT_RETENTION_CLASSES
+from proactor.config import PersisterBackend
+from proactor.config import PersisterDurability
+from proactor.config import PersisterSettings
+from proactor.config import RetentionClass
 from proactor.persister import FileExistedWarning
 from proactor.persister import FileMissing
+from proactor.persister import ContentTooLarge
 from proactor.persister import FileMissingWarning
 from proactor.persister import PersisterError
 from proactor.persister import PersisterException
 from proactor.persister import PersisterWarning
 from proactor.persister import ReindexError
+from proactor.persister import RetentionBudgetExceeded
+from proactor.persister import RetentionPersister
+from proactor.persister import SegmentedLogPersister
+from proactor.persister import SQLitePersister
+from proactor.persister import ThreadedWriterPersister
 from proactor.persister import TimedRollingFilePersister
 from proactor.persister import TrimFailed
 from proactor.persister import UIDExistedWarning
 from proactor.persister import UIDMissingWarning
+from proactor.persister import make_persister
+from proactor.persister import PendingContent
+from proactor.persister import WriteFailed
 from problems import Problems
 
 
@@ -646,6 +665,65 @@ def test_persister_size_and_roll():
         pendulum.set_test_now()
 
 
+def test_persister_trim_whole_days(monkeypatch):
+    settings = ScadaSettings()
+    settings.paths.mkdirs()
+    buf = ("." * 100).encode()
+    days = [pendulum.today("utc").add(days=i) for i in range(3)]
+    events_per_day = 20
+    try:
+        p = TimedRollingFilePersister(settings.paths.event_dir, max_bytes=events_per_day * 3 * len(buf))
+        for day_idx, day in enumerate(days):
+            pendulum.set_test_now(day)
+            for i in range(events_per_day):
+                p.persist(f"{day_idx}-{i:02d}", buf).unwrap()
+        assert p.curr_bytes == p.max_bytes
+        first_day_dir = p.get_path("0-00").parent
+
+        # An event as large as a day removes that day whole, without visiting each of its files.
+        num_stats = 0
+        num_unlinks = 0
+        path_stat = Path.stat
+        path_unlink = Path.unlink
+
+        def stat(self, *args, **kwargs):
+            nonlocal num_stats
+            num_stats += 1
+            return path_stat(self, *args, **kwargs)
+
+        def unlink(self, *args, **kwargs):
+            nonlocal num_unlinks
+            num_unlinks += 1
+            return path_unlink(self, *args, **kwargs)
+
+        monkeypatch.setattr(Path, "stat", stat)
+        monkeypatch.setattr(Path, "unlink", unlink)
+        p.persist("big", buf * events_per_day).unwrap()
+        monkeypatch.undo()
+        assert num_unlinks == 0
+        assert num_stats <= 3
+        assert not first_day_dir.exists()
+        assert p.pending()[0] == "1-00"
+        assert p.num_pending == 2 * events_per_day + 1
+        assert p.curr_bytes == p.max_bytes
+        with p.index_path.open() as f:
+            assert sum(1 for line in f if json.loads(line).get("r") == first_day_dir.name) == 1
+
+        # A smaller event removes only as many of the oldest files as needed.
+        p.persist("medium", buf * 3).unwrap()
+        assert p.pending()[:2] == ["1-03", "1-04"]
+        assert p.curr_bytes == p.max_bytes
+
+        # The journal reproduces the trimmed state.
+        p2 = TimedRollingFilePersister(settings.paths.event_dir, max_bytes=p.max_bytes)
+        assert p2.pending() == p.pending()
+        assert p2.curr_bytes == p.curr_bytes
+        assert p2._day_bytes == p._day_bytes
+        assert p2._day_counts == p._day_counts
+    finally:
+        pendulum.set_test_now()
+
+
 def test_persister_indexing():
     settings = ScadaSettings()
     settings.paths.mkdirs()
@@ -709,6 +787,127 @@ def test_persister_indexing():
         pendulum.set_test_now()
 
 
+def test_persister_pending_index():
+    settings = ScadaSettings()
+    settings.paths.mkdirs()
+    buf = ("." * 100).encode()
+
+    class NoScanPersister(TimedRollingFilePersister):
+        @classmethod
+        def _persisted_item_from_file_path(cls, filepath: Path):
+            raise ValueError("Index should have been loaded without scanning files")
+
+    class SmallIndexPersister(TimedRollingFilePersister):
+        INDEX_COMPACTION_MIN_LINES = 4
+
+    def index_lines(persister: TimedRollingFilePersister) -> list[str]:
+        with persister.index_path.open() as f:
+            return f.readlines()
+
+    d1 = pendulum.today("utc")
+    d2 = d1.add(days=1)
+    try:
+        pendulum.set_test_now(d1)
+        p = TimedRollingFilePersister(settings.paths.event_dir)
+        assert p.index_path.exists()
+        assert index_lines(p) == []
+        for uid in ["1", "2", "3"]:
+            assert p.persist(uid, buf).is_ok()
+        pendulum.set_test_now(d2)
+        assert p.persist("4", buf).is_ok()
+        assert p.clear("2").is_ok()
+        assert len(index_lines(p)) == 5
+
+        # Startup loads index without visiting persisted files
+        p2 = NoScanPersister(settings.paths.event_dir)
+        assert p2._pending == p._pending
+        assert p2.pending() == ["1", "3", "4"]
+        assert p2.curr_bytes == p.curr_bytes == 3 * len(buf)
+        assert p2.retrieve("3").unwrap() == buf
+
+        # The loaded persister keeps extending the index
+        assert p2.clear("1").is_ok()
+        assert p2.persist("5", buf).is_ok()
+        p3 = NoScanPersister(settings.paths.event_dir)
+        assert p3.pending() == ["3", "4", "5"]
+        assert p3.curr_bytes == 3 * len(buf)
+
+        # Stale index: file added to day dir after index was written
+        p4_path = p3.get_path("4")
+        shutil.copy(p4_path, p4_path.parent / p4_path.name.replace("uid[4]", "uid[6]"))
+        p4 = TimedRollingFilePersister(settings.paths.event_dir)
+        assert set(p4.pending()) == {"3", "4", "5", "6"}
+        assert p4.curr_bytes == 4 * len(buf)
+        # reindex() rewrote index as a checkpoint
+        assert len(index_lines(p4)) == 4
+        assert NoScanPersister(settings.paths.event_dir)._pending == p4._pending
+
+        # Stale index: day dir removed
+        shutil.rmtree(p4.get_path("3").parent)
+        p5 = TimedRollingFilePersister(settings.paths.event_dir)
+        assert set(p5.pending()) == {"4", "5", "6"}
+
+        # Missing index
+        p5.index_path.unlink()
+        p6 = TimedRollingFilePersister(settings.paths.event_dir)
+        assert p6._pending == p5._pending
+        assert p6.index_path.exists()
+
+        # Truncated index
+        with p6.index_path.open("a") as f:
+            f.write('{"c":"4"')
+        p7 = TimedRollingFilePersister(settings.paths.event_dir)
+        assert p7._pending == p6._pending
+
+        # Compaction
+        p8 = SmallIndexPersister(settings.paths.event_dir)
+        for i in range(20):
+            assert p8.persist(f"x{i}", buf).is_ok()
+            assert p8.clear(f"x{i}").is_ok()
+            assert len(index_lines(p8)) <= p8.INDEX_COMPACTION_MIN_LINES + 1
+        assert NoScanPersister(settings.paths.event_dir)._pending == p8._pending
+    finally:
+        pendulum.set_test_now()
+
+
+def test_persister_pending_index_unjournaled(tmp_path, monkeypatch):
+    buf = ("." * 100).encode()
+    opened = []
+    path_open = Path.open
+
+    def counting_open(path, *args, **kwargs):
+        opened.append(path)
+        return path_open(path, *args, **kwargs)
+
+    # the journal is opened once, not for each persist and clear
+    p = TimedRollingFilePersister(tmp_path)
+    monkeypatch.setattr(Path, "open", counting_open)
+    for uid in ["1", "2", "3"]:
+        p.persist(uid, buf).unwrap()
+    p.clear("1").unwrap()
+    monkeypatch.undo()
+    assert opened.count(p.index_path) == 1
+    p.close()
+
+    # a file written without being journaled, as by a crash between the two writes, makes the journal stale even if
+    # the mtime of its day directory is unchanged
+    day_dir = p.get_path("2").parent
+    mtime_ns = day_dir.stat().st_mtime_ns
+    (day_dir / p.get_path("2").name.replace("uid[2]", "uid[4]")).write_bytes(buf)
+    os.utime(day_dir, ns=(mtime_ns, mtime_ns))
+    p2 = TimedRollingFilePersister(tmp_path)
+    assert set(p2.pending()) == {"2", "3", "4"}
+    p2.close()
+
+    # as does a file removed without being journaled
+    p2.get_path("3").unlink()
+    os.utime(day_dir, ns=(mtime_ns, mtime_ns))
+    p3 = TimedRollingFilePersister(tmp_path)
+    assert set(p3.pending()) == {"2", "4"}
+    assert p3.curr_bytes == 2 * len(buf)
+    p3.close()
+
+
 def test_persister_problems():
     settings = ScadaSettings()
     settings.paths.mkdirs()
@@ -826,3 +1025,695 @@ def test_persister_problems():
 
     finally:
         pendulum.set_test_now()
+
+
+def assert_segmented_contents(
+    p: SegmentedLogPersister,
+    uids: Optional[list] = None,
+    curr_bytes: Optional[int] = None,
+    num_segments: Optional[int] = None,
+    check_index: bool = True,
+):
+    assert p.num_pending == len(p.pending())
+    if uids is not None:
+        str_uids = [str(uid) for uid in uids]
+        assert p.pending() == str_uids
+        for str_uid in str_uids:
+            assert str_uid in p
+    if curr_bytes is not None:
+        assert p.curr_bytes == curr_bytes
+    if num_segments is not None:
+        assert p.num_segments == num_segments
+        assert len(list(p.base_dir.glob(f"*{SegmentedLogPersister.SEGMENT_SUFFIX}"))) == num_segments
+    if check_index:
+        p2 = SegmentedLogPersister(p.base_dir, max_bytes=p.max_bytes, max_segment_bytes=p.max_segment_bytes)
+        assert p2.pending() == p.pending()
+        assert p2.curr_bytes == p.curr_bytes
+        for uid in p.pending():
+            assert p2.retrieve(uid).unwrap() == p.retrieve(uid).unwrap()
+
+
+def test_segmented_persister_happy_path():
+    settings = ScadaSettings()
+    settings.paths.mkdirs()
+    event = ProblemEvent(
+        Src="foo",
+        ProblemType=gwproto.messages.Problems.error,
+        Summary="Problems, I've got a few",
+        Details="Too numerous to name"
+    )
+    event_bytes = event.json().encode()
+
+    # empty persister
+    p = SegmentedLogPersister(settings.paths.event_dir)
+    assert p.reindex().is_ok()
+    assert p.get_path("foo") is None
+    assert p.retrieve("foo").unwrap() is None
+    assert_segmented_contents(p, uids=[], curr_bytes=0, num_segments=0)
+
+    # add one, retrieve it
+    assert p.persist(event.MessageId, event_bytes).is_ok()
+    assert_segmented_contents(p, uids=[event.MessageId], curr_bytes=len(event_bytes), num_segments=1)
+    assert p.retrieve(event.MessageId).unwrap() == event_bytes
+    assert ProblemEvent.parse_raw(p.retrieve(event.MessageId).unwrap()) == event
+
+    # add another, in the same segment
+    event2 = ProblemEvent(Src="foo", Summary="maybe not great", ProblemType=gwproto.messages.Problems.warning)
+    event2_bytes = event2.json().encode()
+    assert p.persist(event2.MessageId, event2_bytes).is_ok()
+    assert p.get_path(event.MessageId) == p.get_path(event2.MessageId)
+    assert_segmented_contents(
+        p,
+        uids=[event.MessageId, event2.MessageId],
+        curr_bytes=len(event_bytes) + len(event2_bytes),
+        num_segments=1,
+    )
+
+    # clear first one; segment remains, cleared uid not restored by reindex
+    assert p.clear(event.MessageId).is_ok()
+    assert p.get_path(event.MessageId) is None
+    assert_segmented_contents(p, uids=[event2.MessageId], curr_bytes=len(event2_bytes), num_segments=1)
+
+    # clear second one; segment removed
+    segment_path = p.get_path(event2.MessageId)
+    assert p.clear(event2.MessageId).is_ok()
+    assert not segment_path.exists()
+    assert not segment_path.with_suffix(SegmentedLogPersister.INDEX_SUFFIX).exists()
+    assert_segmented_contents(p, uids=[], curr_bytes=0, num_segments=0)
+
+    # persisting after the active segment was removed starts a new segment
+    assert p.persist(event.MessageId, event_bytes).is_ok()
+    assert p.get_path(event.MessageId) != segment_path
+    assert_segmented_contents(p, uids=[event.MessageId], curr_bytes=len(event_bytes), num_segments=1)
+
+    # make_persister selects backend from settings
+    settings.persister.writer_thread = False
+    settings.persister.retention_classes = []
+    settings.persister.backend = PersisterBackend.segmented_log
+    assert isinstance(make_persister(settings.persister, settings.paths.event_dir), SegmentedLogPersister)
+    settings.persister.backend = PersisterBackend.sqlite
+    sqlite_persister = make_persister(settings.persister, settings.paths.event_dir)
+    assert isinstance(sqlite_persister, SQLitePersister)
+    sqlite_persister.close()
+    settings.persister.backend = PersisterBackend.timed_rolling_file
+    assert isinstance(make_persister(settings.persister, settings.paths.event_dir), TimedRollingFilePersister)
+    settings.persister.writer_thread = True
+    threaded = make_persister(settings.persister, settings.paths.event_dir)
+    assert isinstance(threaded, ThreadedWriterPersister)
+    assert isinstance(threaded.persister, TimedRollingFilePersister)
+    threaded.close()
+    settings.persister.retention_classes = DEFAULT_RETENTION_CLASSES
+    threaded = make_persister(settings.persister, settings.paths.event_dir)
+    assert isinstance(threaded.persister, RetentionPersister)
+    assert isinstance(threaded.persister.persister, TimedRollingFilePersister)
+    threaded.close()
+
+
+def test_segmented_persister_size_and_roll():
+    settings = ScadaSettings()
+    settings.paths.mkdirs()
+    packet_size = 1000
+    num_supported = 10
+    buf = ("." * packet_size).encode()
+    uids = [f"{i:2d}" for i in range(1, 20)]
+    record_size = SegmentedLogPersister.RECORD_HEADER.size + len(uids[0]) + packet_size
+    p = SegmentedLogPersister(
+        settings.paths.event_dir,
+        max_bytes=num_supported * packet_size,
+        max_segment_bytes=3 * record_size,
+    )
+
+    # three records per segment
+    for i, uid in enumerate(uids[:num_supported]):
+        assert p.persist(uid, buf).is_ok()
+        assert_segmented_contents(p, uids=uids[:i + 1], curr_bytes=(i + 1) * packet_size, num_segments=i // 3 + 1)
+
+    # full: each new record trims the oldest, oldest segment is removed once empty
+    first_segment = p.get_path(uids[0])
+    for i in range(3):
+        assert p.persist(uids[num_supported + i], buf).is_ok()
+        assert_segmented_contents(
+            p,
+            uids=uids[i + 1:num_supported + i + 1],
+            curr_bytes=num_supported * packet_size,
+        )
+    assert not first_segment.exists()
+    assert p.num_segments == 4
+
+    # large record trims several
+    assert p.persist(uids[num_supported + 3], buf * 2).is_ok()
+    assert_segmented_contents(p, uids=uids[5:num_supported + 4], curr_bytes=num_supported * packet_size)
+
+    # duplicate uid
+    problems = p.persist(uids[num_supported + 3], buf).unwrap_err()
+    assert len(problems.errors) == 0
+    assert len(problems.warnings) == 1
+    assert isinstance(problems.warnings[0], UIDExistedWarning)
+    assert_segmented_contents(p, uids=uids[5:num_supported + 4], curr_bytes=(num_supported - 1) * packet_size)
+
+    # too large
+    assert not p.persist("big", buf * (num_supported + 1)).is_ok()
+    assert_segmented_contents(p, uids=uids[5:num_supported + 4], curr_bytes=(num_supported - 1) * packet_size)
+
+    # clear everything
+    for uid in p.pending():
+        assert p.clear(uid).is_ok()
+    assert_segmented_contents(p, uids=[], curr_bytes=0, num_segments=0)
+    problems = p.clear("foo").unwrap_err()
+    assert isinstance(problems.warnings[0], UIDMissingWarning)
+
+
+def test_segmented_persister_recovery():
+    settings = ScadaSettings()
+    settings.paths.mkdirs()
+    buf = ("." * 100).encode()
+    uids = [f"{i:2d}" for i in range(1, 7)]
+    p = SegmentedLogPersister(settings.paths.event_dir)
+    for uid in uids:
+        p.persist(uid, buf).unwrap()
+    p.clear(uids[1]).unwrap()
+    segment_path = p.get_path(uids[0])
+    index_path = segment_path.with_suffix(SegmentedLogPersister.INDEX_SUFFIX)
+    exp_uids = [uids[0]] + uids[2:]
+
+    # truncated record at end of segment and index is ignored
+    with segment_path.open("ab") as f:
+        f.write(SegmentedLogPersister.RECORD_HEADER.pack(2, len(buf)) + b"xx" + buf[:10])
+    with index_path.open("a") as f:
+        f.write(f"+ {segment_path.stat().st_size - 10} {len(buf)} xx\n+ 5")
+    p = SegmentedLogPersister(settings.paths.event_dir)
+    assert p.pending() == exp_uids
+    for uid in p.pending():
+        assert p.retrieve(uid).unwrap() == buf
+
+    # missing index is rebuilt by scanning the segment, which does not know about clears.
+    index_path.unlink()
+    p = SegmentedLogPersister(settings.paths.event_dir)
+    assert p.pending() == uids
+    assert p.curr_bytes == len(uids) * len(buf)
+
+    # retrieve, segment missing
+    segment_path.unlink()
+    problems = p.retrieve(uids[0]).unwrap_err()
+    assert isinstance(problems.errors[0], FileMissing)
+    problems = p.clear(uids[0]).unwrap_err()
+    assert isinstance(problems.warnings[0], FileMissingWarning)
+
+    # reindex, unparsable index
+    p = SegmentedLogPersister(settings.paths.event_dir)
+    p.persist(uids[0], buf).unwrap()
+    with p.get_path(uids[0]).with_suffix(SegmentedLogPersister.INDEX_SUFFIX).open("a") as f:
+        f.write("+ x y z\n")
+    problems = p.reindex().unwrap_err()
+    assert len(problems.errors) == 2
+    assert isinstance(problems.errors[1], ReindexError)
+
+
+def test_segmented_persister_unindexed_records(tmp_path, monkeypatch):
+    buf = ("." * 100).encode()
+    opened = []
+    path_open = Path.open
+
+    def counting_open(path, *args, **kwargs):
+        opened.append(path)
+        return path_open(path, *args, **kwargs)
+
+    # the files of the segment being appended to are opened once, not for each persist and clear
+    monkeypatch.setattr(Path, "open", counting_open)
+    p = SegmentedLogPersister(tmp_path)
+    for i in range(5):
+        p.persist(str(i), buf).unwrap()
+    p.clear("0").unwrap()
+    assert len(opened) == 2
+    monkeypatch.undo()
+
+    # records written to the segment but not to its index, as by a crash between the two writes, are recovered
+    index_path = p.get_path("1").with_suffix(SegmentedLogPersister.INDEX_SUFFIX)
+    p.close()
+    lines = index_path.read_text().splitlines(keepends=True)
+    assert lines[-1] == "- 0\n"
+    index_path.write_text("".join(lines[:3] + lines[-1:]))
+    p = SegmentedLogPersister(tmp_path)
+    assert p.pending() == ["1", "2", "3", "4"]
+    assert p.curr_bytes == 4 * len(buf)
+    for uid in p.pending():
+        assert p.retrieve(uid).unwrap() == buf
+
+    # persisting continues after the recovered records
+    p.persist("5", buf).unwrap()
+    p.close()
+    p = SegmentedLogPersister(tmp_path)
+    assert p.pending() == ["1", "2", "3", "4", "5"]
+    assert p.retrieve("5").unwrap() == buf
+
+
+class _FailingPersister(TimedRollingFilePersister):
+    """Persister which fails writes of fail_uids and counts commits."""
+
+    def __init__(self, base_dir: Path):
+        self.fail_uids = set()
+        self.num_commits = 0
+        super().__init__(base_dir)
+
+    def persist(self, uid: str, content: bytes, type_name: str = "") -> Result[bool, Problems]:
+        if uid in self.fail_uids:
+            return Err(Problems(errors=[WriteFailed(uid=uid)]))
+        return super().persist(uid, content, type_name)
+
+    def commit(self) -> Result[bool, Problems]:
+        self.num_commits += 1
+        return Ok()
+
+
+class _BlockingWriterPersister(ThreadedWriterPersister):
+    """ThreadedWriterPersister whose writer thread waits until released before writing each group, to control its
+    timing. The wait precedes taking _persister_lock, so queries are not held up."""
+
+    def __init__(self, *args, **kwargs):
+        self.release = threading.Event()
+        self.writing = threading.Event()
+        super().__init__(*args, **kwargs)
+
+    def _write_group(self, group: list) -> Result[bool, Problems]:
+        if threading.current_thread() is self._thread:
+            self.writing.set()
+            self.release.wait(5)
+        return super()._write_group(group)
+
+
+@pytest.mark.parametrize("backend", list(PersisterBackend))
+def test_persister_backends(tmp_path, backend: PersisterBackend):
+    settings = PersisterSettings(backend=backend, max_bytes=1000, writer_thread=False, retention_classes=[])
+    buf = ("." * 300).encode()
+    p = make_persister(settings, tmp_path)
+    assert p.num_pending == 0
+    assert p.retrieve("0").unwrap() is None
+
+    # persist, retrieve and clear
+    for i in range(3):
+        assert p.persist(str(i), buf).is_ok()
+    assert p.pending() == ["0", "1", "2"]
+    assert p.num_pending == 3
+    assert "1" in p
+    assert p.retrieve("1").unwrap() == buf
+    assert p.clear("1").is_ok()
+    assert "1" not in p
+    result = p.clear("1")
+    assert result.is_err()
+    assert isinstance(result.err().warnings[0], UIDMissingWarning)
+    assert p.pending() == ["0", "2"]
+
+    # duplicate uid replaces content
+    result = p.persist("0", buf[:100])
+    assert result.is_err()
+    assert not result.err().errors
+    assert isinstance(result.err().warnings[0], UIDExistedWarning)
+    assert p.retrieve("0").unwrap() == buf[:100]
+    assert p.num_pending == 2
+
+    # oldest are trimmed to stay within max_bytes; content larger than max_bytes is rejected
+    assert p.persist("3", buf).is_ok()
+    assert p.persist("4", buf).is_ok()
+    assert p.pending() == ["2", "0", "3", "4"]
+    assert p.persist("5", buf).is_ok()
+    assert p.pending() == ["0", "3", "4", "5"]
+    result = p.persist("6", ("." * 1001).encode())
+    assert result.is_err()
+    assert isinstance(result.err().errors[0], ContentTooLarge)
+    pending = p.pending()
+
+    # pending content is read in chunks, skipping uids cleared before their chunk is read
+    chunks = p.iter_pending(chunk_size=2)
+    assert next(chunks) == [PendingContent("0", buf[:100]), PendingContent("3", buf)]
+    assert p.clear("4").is_ok()
+    assert p.persist("6", buf[:10]).is_ok()
+    assert list(chunks) == [[PendingContent("5", buf)]]
+    assert [[event.uid for event in chunk] for chunk in p.iter_pending(chunk_size=2)] == [["0", "3"], ["5", "6"]]
+    pending = p.pending()
+    p.close()
+
+    # pending events survive reopening
+    p = make_persister(settings, tmp_path)
+    assert p.pending() == pending
+    assert p.retrieve("5").unwrap() == buf
+    p.close()
+
+    # through the writer thread; events persisted after iteration started are not yielded
+    settings.writer_thread = True
+    p = make_persister(settings, tmp_path)
+    assert isinstance(p, ThreadedWriterPersister)
+    chunks = p.iter_pending(chunk_size=2)
+    assert [event.uid for event in next(chunks)] == ["0", "3"]
+    assert p.persist("7", buf[:20]).is_ok()
+    assert p.clear("6").is_ok()
+    assert [event.uid for chunk in chunks for event in chunk] == ["5"]
+    assert [event.uid for chunk in p.iter_pending() for event in chunk] == ["0", "3", "5", "7"]
+    p.close()
+
+
+def test_sqlite_persister(tmp_path):
+    buf = ("." * 100).encode()
+    p = SQLitePersister(tmp_path, max_bytes=1000)
+    assert p.database_path.exists()
+    assert p.persist("a", buf, "snapshot").is_ok()
+    assert p.persist("b", buf[:50], "problem").is_ok()
+    assert p.persist("c", buf, "snapshot").is_ok()
+    assert p.curr_bytes == 250
+    assert p.pending_by_type() == {"problem": (1, 50), "snapshot": (2, 200)}
+    assert [info.uid for info in p.pending_info(type_name="snapshot")] == ["a", "c"]
+    info = p.pending_info()
+    assert [(i.uid, i.type_name, i.size) for i in info] == [
+        ("a", "snapshot", 100), ("b", "problem", 50), ("c", "snapshot", 100)
+    ]
+    assert [i.uid for i in p.pending_info(start=info[1].timestamp)] == ["b", "c"]
+    assert p.pending_info(end=info[0].timestamp) == []
+    assert p.pending_info(type_name="unknown") == []
+
+    # trimming deletes the oldest rows
+    for i in range(8):
+        assert p.persist(str(i), buf, "snapshot").is_ok()
+    assert p.curr_bytes <= 1000
+    assert p.pending() == ["b", "c"] + [str(i) for i in range(8)]
+    assert p.pending_by_type() == {"problem": (1, 50), "snapshot": (9, 900)}
+
+    # reindex recounts from the database
+    p._num_pending = p._curr_bytes = 0
+    assert p.reindex().is_ok()
+    assert p.num_pending == 10
+    assert p.curr_bytes == 950
+    p.close()
+
+    p = SQLitePersister(tmp_path, max_bytes=1000, durability=PersisterDurability.per_event)
+    assert p.num_pending == 10
+    assert p.flush().is_ok()
+    p.close()
+
+
+def test_sqlite_persister_statements(tmp_path):
+    """The deployment target ships SQLite 3.34, so statements must not use RETURNING (3.35), whatever the version of
+    SQLite running the tests."""
+    p = SQLitePersister(tmp_path)
+    statements = []
+    p._connection.set_trace_callback(statements.append)
+    buf = ("." * 100).encode()
+    p.persist("a", buf).unwrap()
+    p.persist("a", buf).unwrap_err()
+    p.clear("a").unwrap()
+    assert isinstance(p.clear("a").unwrap_err().warnings[0], UIDMissingWarning)
+    assert p.num_pending == 0
+    assert p.curr_bytes == 0
+    assert statements
+    assert not [statement for statement in statements if "RETURNING" in statement.upper()]
+    p.close()
+
+
+def test_threaded_writer_persister(tmp_path):
+    buf = ("." * 100).encode()
+    inner = _FailingPersister(tmp_path)
+    problems = []
+    p = _BlockingWriterPersister(inner, queue_size=4, group_size=3, on_problems=problems.append)
+
+    # pending immediately, retrievable from memory until written
+    p.persist("1", buf).unwrap()
+    assert p.writing.wait(5)
+    p.persist("2", buf).unwrap()
+    p.persist("3", buf).unwrap()
+    assert "1" in p and "2" in p and "3" in p
+    assert p.pending() == ["1", "2", "3"]
+    assert p.num_pending == 3
+    assert p.retrieve("3").unwrap() == buf
+    assert inner.num_pending == 0
+    assert list(p.iter_pending(chunk_size=2)) == [
+        [PendingContent("1", buf), PendingContent("2", buf)], [PendingContent("3", buf)]
+    ]
+
+    # clearing a queued write cancels it, even if the writer has taken it from the queue
+    p.clear("1").unwrap()
+    p.clear("2").unwrap()
+    assert "1" not in p and "2" not in p
+    assert p.stats.num_cleared_before_write == 2
+    p.release.set()
+    p.flush().unwrap()
+    assert inner.pending() == ["3"]
+    assert p.pending() == ["3"]
+
+    # clears are queued behind writes of the same uid
+    p.persist("4", buf).unwrap()
+    p.persist("5", buf).unwrap()
+    p.clear("3").unwrap()
+    assert isinstance(p.clear("3").unwrap_err().warnings[0], UIDMissingWarning)
+    p.flush().unwrap()
+    assert inner.pending() == ["4", "5"]
+    assert p.stats.num_writes >= 4
+    assert p.stats.num_groups < p.stats.num_writes
+    assert inner.num_commits == p.stats.num_groups
+    assert p.stats.queue_depth == 0
+    assert p.stats.max_queue_depth > 0
+    assert str(p.stats)
+
+    # write problems are reported on the writer thread
+    inner.fail_uids.add("6")
+    p.persist("6", buf).unwrap()
+    p.flush()
+    assert p.stats.num_write_errors == 1
+    assert isinstance(problems[0].errors[0], WriteFailed)
+    assert "6" not in p
+
+    # after close, operations are completed synchronously
+    p.close().unwrap()
+    p.persist("7", buf).unwrap()
+    assert inner.pending() == ["4", "5", "7"]
+    p.clear("4").unwrap()
+    assert p.pending() == ["5", "7"]
+
+
+def test_threaded_writer_persister_queue_full(tmp_path):
+    buf = ("." * 100).encode()
+    inner = _FailingPersister(tmp_path)
+    p = _BlockingWriterPersister(inner, queue_size=1)
+    p.persist("1", buf).unwrap()
+    assert p.writing.wait(5)
+    p.persist("2", buf).unwrap()
+
+    # with the writer busy and the queue full, the caller waits for room rather than writing on its own thread
+    caller = threading.Thread(target=lambda: p.persist("3", buf).unwrap())
+    caller.start()
+    caller.join(timeout=0.1)
+    assert caller.is_alive()
+    assert "3" in p and p.pending() == ["1", "2", "3"]
+    assert inner.pending() == []
+    assert p.stats.num_queue_full == 1
+
+    # queries and clears do not wait for the writer
+    p.clear("2").unwrap()
+    assert p.pending() == ["1", "3"]
+    p.release.set()
+    caller.join(timeout=5)
+    assert not caller.is_alive()
+    p.flush().unwrap()
+    assert inner.pending() == ["1", "3"]
+    p.close().unwrap()
+
+
+def test_threaded_writer_persister_trimmed(tmp_path):
+    buf = ("." * 100).encode()
+    inner = SegmentedLogPersister(tmp_path, max_bytes=3 * len(buf))
+    inner.persist("0", buf).unwrap()
+    p = ThreadedWriterPersister(inner)
+    assert p.pending() == ["0"]
+
+    # events the wrapped persister trims to make space are no longer pending
+    for i in range(1, 5):
+        p.persist(str(i), buf).unwrap()
+    p.flush().unwrap()
+    assert inner.pending() == ["2", "3", "4"]
+    assert p.pending() == ["2", "3", "4"]
+    assert p.num_pending == 3
+    assert "1" not in p
+    assert isinstance(p.clear("1").unwrap_err().warnings[0], UIDMissingWarning)
+    p.close().unwrap()
+
+
+def test_threaded_writer_persister_concurrent_queries(tmp_path):
+    """Query from one thread while the writer persists and clears through a RetentionPersister, whose index and
+    per-class byte counts are plain dicts, and a TimedRollingFilePersister, which deletes files as they are
+    cleared."""
+    buf = ("." * 100).encode()
+    inner = RetentionPersister(
+        TimedRollingFilePersister(tmp_path, max_bytes=100_000),
+        DEFAULT_RETENTION_CLASSES,
+        max_bytes=100_000,
+        journal_dir=tmp_path,
+    )
+    p = ThreadedWriterPersister(inner, queue_size=64, group_size=8)
+    num_events = 2000
+    errors = []
+    done = threading.Event()
+
+    def query():
+        try:
+            while not done.is_set():
+                pending = p.pending()
+                for uid in pending[-4:]:
+                    uid in p
+                    p.retrieve(uid)
+                for chunk in p.iter_pending(chunk_size=16):
+                    for pending_content in chunk:
+                        assert pending_content.content == buf
+        except BaseException as e:
+            errors.append(e)
+
+    querier = threading.Thread(target=query)
+    querier.start()
+    for i in range(num_events):
+        p.persist(str(i), buf, "snapshot").unwrap()
+        if i >= 4:
+            p.clear(str(i - 4))
+    done.set()
+    querier.join(timeout=30)
+    assert not errors
+    p.flush().unwrap()
+    assert p.pending() == [str(i) for i in range(num_events - 4, num_events)]
+    assert inner.pending() == p.pending()
+    p.close().unwrap()
+
+
+@pytest.mark.parametrize(
+    "backend", [backend for backend in PersisterBackend if backend != PersisterBackend.sqlite]
+)
+def test_persister_durability(tmp_path, backend: PersisterBackend):
+    buf = ("." * 100).encode()
+    settings = PersisterSettings(
+        backend=backend,
+        writer_thread=False,
+        retention_classes=[],
+        sync_max_events=3,
+        sync_interval_ms=60_000,
+    )
+    for durability in PersisterDurability:
+        (tmp_path / durability.value).mkdir()
+
+    # none: nothing is synced
+    p = make_persister(settings, tmp_path / "none")
+    syncer = p._syncer
+    for i in range(4):
+        p.persist(str(i), buf).unwrap()
+    p.flush().unwrap()
+    assert syncer.num_file_syncs == syncer.num_dir_syncs == 0
+
+    # per_event: each write is synced, directories in groups
+    settings.durability = PersisterDurability.per_event
+    p = make_persister(settings, tmp_path / "per_event")
+    syncer = p._syncer
+    p.persist("0", buf).unwrap()
+    assert syncer.num_file_syncs >= 1
+    assert syncer.num_dir_syncs == 0
+    p.commit().unwrap()
+    assert syncer.num_dir_syncs >= 1
+    num_dir_syncs = syncer.num_dir_syncs
+    for i in range(1, 4):
+        p.persist(str(i), buf).unwrap()
+    assert syncer.num_file_syncs >= 4
+    assert num_dir_syncs < syncer.num_dir_syncs <= num_dir_syncs + 2
+
+    # periodic: files and directories are synced every sync_max_events, or when flushed
+    settings.durability = PersisterDurability.periodic
+    p = make_persister(settings, tmp_path / "periodic")
+    syncer = p._syncer
+    p.persist("0", buf).unwrap()
+    p.persist("1", buf).unwrap()
+    p.commit().unwrap()
+    assert syncer.num_file_syncs == syncer.num_dir_syncs == 0
+    p.persist("2", buf).unwrap()
+    assert syncer.num_file_syncs >= 1
+    assert syncer.num_dir_syncs >= 1
+    num_file_syncs = syncer.num_file_syncs
+    p.persist("3", buf).unwrap()
+    p.clear("3").unwrap()
+    p.flush().unwrap()
+    assert syncer.num_file_syncs == num_file_syncs + (backend == PersisterBackend.segmented_log) * 2
+    assert p.pending() == ["0", "1", "2"]
+
+
+def test_retention_persister(tmp_path, monkeypatch):
+    # retention is off unless classes are configured
+    assert PersisterSettings().retention_classes == []
+
+    buf = ("." * 100).encode()
+    classes = [
+        RetentionClass(name="critical", priority=2, type_names=["gridworks.event.problem"]),
+        RetentionClass(name="telemetry", priority=0, max_bytes=3 * len(buf), type_names=["*.snapshot.*"]),
+        RetentionClass(name="default", priority=1),
+    ]
+    p = RetentionPersister(
+        SegmentedLogPersister(tmp_path, max_bytes=10 * len(buf)),
+        classes,
+        max_bytes=10 * len(buf),
+        journal_dir=tmp_path,
+    )
+    assert p.retention_class("gridworks.event.problem").name == "critical"
+    assert p.retention_class("gridworks.event.snapshot.spaceheat.100").name == "telemetry"
+    assert p.retention_class("gridworks.event.startup").name == "default"
+    assert p.retention_class("").name == "default"
+
+    # telemetry is limited to its own budget
+    for i in range(5):
+        p.persist(f"t{i}", buf, "gridworks.event.snapshot.spaceheat.100").unwrap()
+    assert p.pending() == ["t2", "t3", "t4"]
+    assert p.stats["telemetry"].num_evicted == 2
+    for i in range(3):
+        p.persist(f"p{i}", buf, "gridworks.event.problem").unwrap()
+    for i in range(4):
+        p.persist(f"d{i}", buf, "").unwrap()
+    assert p.curr_bytes == p.persister.curr_bytes == 10 * len(buf)
+
+    # a full persister evicts the lowest class first
+    p.persist("p3", buf, "gridworks.event.problem").unwrap()
+    p.persist("p4", buf, "gridworks.event.problem").unwrap()
+    assert p.pending() == ["t4", "p0", "p1", "p2", "d0", "d1", "d2", "d3", "p3", "p4"]
+    p.persist("d4", buf, "").unwrap()
+    assert p.pending() == ["p0", "p1", "p2", "d0", "d1", "d2", "d3", "p3", "p4", "d4"]
+    p.persist("p5", buf, "gridworks.event.problem").unwrap()
+    assert "d0" not in p and "p0" in p
+
+    # but never evicts a higher class to make space for a lower one
+    for i in range(4):
+        p.persist(f"p{i + 6}", buf, "gridworks.event.problem").unwrap()
+    assert p.stats["default"].pending == 0
+    error = p.persist("t5", buf, "gridworks.event.snapshot.x").unwrap_err().errors[0]
+    assert isinstance(error, RetentionBudgetExceeded)
+    error = p.persist("t6", buf * 4, "gridworks.event.snapshot.x").unwrap_err().errors[0]
+    assert isinstance(error, ContentTooLarge)
+    assert p.stats["telemetry"].num_rejected == 2
+    assert "t5" not in p
+    assert p.stats["critical"].pending == 10
+    assert p.stats["critical"].bytes == 10 * len(buf)
+    assert p.stats["telemetry"].pending == 0
+
+    # classes survive a restart once the buffered journal is flushed
+    p.clear("p1").unwrap()
+    p.flush()
+    pending = p.pending()
+    p2 = RetentionPersister(
+        SegmentedLogPersister(tmp_path, max_bytes=10 * len(buf)),
+        classes,
+        max_bytes=10 * len(buf),
+        journal_dir=tmp_path,
+    )
+    assert p2.pending() == pending
+    assert p2.stats["critical"].pending == 9
+    assert p2.stats["critical"].bytes == 9 * len(buf)
+    assert p2.curr_bytes == p.curr_bytes
+
+    # uids missing from the journal are assigned to the default class, sized without reading their content
+    (tmp_path / RetentionPersister.JOURNAL_FILE_NAME).unlink()
+    monkeypatch.setattr(SegmentedLogPersister, "retrieve", lambda self, uid: pytest.fail(f"retrieved {uid}"))
+    p3 = RetentionPersister(
+        SegmentedLogPersister(tmp_path, max_bytes=10 * len(buf)),
+        classes,
+        max_bytes=10 * len(buf),
+        journal_dir=tmp_path,
+    )
+    assert p3.stats["default"].pending == 9
+    assert p3.stats["default"].bytes == 9 * len(buf)
+    assert str(p3.stats["default"])
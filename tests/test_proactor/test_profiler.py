@@ -0,0 +1,77 @@
+import json
+import time
+
+import pytest
+from gwproto import Message
+from gwproto.messages import GsPwr
+
+import load_house
+from actors2 import Scada2
+from actors2.config import ScadaSettings
+from proactor import Proactor
+from proactor import ProactorSettings
+from proactor.message import DBGCommands
+from proactor.message import DBGPayload
+from proactor.profiler import PathProfiler
+
+
+def test_path_profiler():
+    profiler = PathProfiler(num_samples=3)
+    profiler.record("h", "a", 0x1, time.perf_counter())
+    assert profiler.profile("h", "a", 0x1).num_calls == 0
+    assert not profiler.samples
+
+    profiler.enabled = True
+    for _ in range(4):
+        profiler.record("h", "a", 0x1, time.perf_counter())
+    profiler.record("h", "a", 0x3, time.perf_counter() - 1)
+    profile = profiler.profile("h", "a", 0x1)
+    assert profile.num_calls == 4
+    assert profile.max <= profile.total
+    assert profiler.profile("h", "b", 0x1).num_calls == 0
+
+    # the ring buffer keeps the latest samples
+    samples = profiler.samples
+    assert len(samples) == 3
+    assert samples[-1].key.path == 0x3
+    assert samples[-1].seconds >= 1
+
+    d = json.loads(json.dumps(profiler.as_dict()))
+    assert d["paths"][0]["path"] == "0x00000003"
+    assert d["paths"][1]["num_calls"] == 4
+    assert len(d["samples"]) == 3
+    assert "0x00000001  h  [a]" in str(profiler)
+
+    profiler.clear()
+    assert not profiler.samples
+    assert profiler.profile("h", "a", 0x1).num_calls == 0
+
+
+def test_proactor_profiling_commands():
+    proactor = Proactor("p", ProactorSettings())
+    assert not proactor.profiler.enabled
+    proactor._process_dbg(DBGPayload(Command=DBGCommands.start_profiling))
+    assert proactor.profiler.enabled
+    proactor._process_dbg(DBGPayload(Command=DBGCommands.show_latency))
+    proactor._process_dbg(DBGPayload(Command=DBGCommands.stop_profiling))
+    assert not proactor.profiler.enabled
+    # calls are recorded from the one starting profiling up to the one stopping it
+    dbg_type_name = DBGPayload.__fields__["TypeName"].default
+    assert proactor.profiler.profile("Proactor._process_dbg", dbg_type_name, 0x00000010).num_calls == 1
+    assert proactor.profiler.profile("Proactor._process_dbg", dbg_type_name, 0x00000008).num_calls == 1
+    assert proactor.profiler.profile("Proactor._process_dbg", dbg_type_name, 0x00000020).num_calls == 0
+    assert len(proactor.profiler.samples) == 2
+
+
+@pytest.mark.asyncio
+async def test_scada_profiling():
+    settings = ScadaSettings()
+    settings.paths.mkdirs()
+    layout = load_house.load_all(settings)
+    scada = Scada2("a.s", settings, hardware_layout=layout)
+    scada.profiler.enabled = True
+    message = Message(Src=layout.power_meter_node.alias, Payload=GsPwr(Power=1))
+    await scada.process_message(message)
+    # both the route taken by process_message and the branch taken by the Scada2 handler are recorded
+    assert scada.profiler.profile("Scada2._process_gs_pwr", message.Header.MessageType, 0x00000001).num_calls == 1
+    assert scada.profiler.profile("Proactor.process_message", message.Header.MessageType, 0x00010001).num_calls == 1
@@ -0,0 +1,247 @@
+import asyncio
+import threading
+import time
+
+from gwproto.messages import Ack
+from gwproto.messages import GtDispatchBoolean_Maker
+from paho.mqtt.client import MQTTMessage
+
+from proactor.config import OverflowPolicy
+from proactor.config import ReceiveLaneSettings
+from proactor.config import ReceiveQueueSettings
+from proactor.message import MQTTReceiptMessage
+from proactor.message import PatInternalWatchdogMessage
+from proactor.receive_queue import ReceiveLane
+from proactor.receive_queue import ReceiveLaneAlert
+from proactor.receive_queue import ReceiveQueue
+from proactor.stats import ProactorStats
+from actors2 import Scada2
+from actors2.config import ScadaSettings
+import load_house
+
+
+def lane_of(item: str) -> ReceiveLane:
+    return ReceiveLane[item.split(":")[0]]
+
+
+def drain(queue: ReceiveQueue) -> list[str]:
+    items = []
+    while not queue.empty():
+        items.append(queue.get_nowait())
+    return items
+
+
+def test_receive_queue_lanes():
+    stats = ProactorStats()
+    queue = ReceiveQueue(lane_of, stats.receive_lanes)
+    assert set(stats.receive_lanes) == {lane.name for lane in ReceiveLane}
+    for item in ["telemetry:0", "power:0", "control:0", "telemetry:1", "control:1", "power:1"]:
+        queue.put_nowait(item)
+    assert queue.qsize() == 6
+    assert queue.lane_size(ReceiveLane.control) == 2
+    assert stats.receive_lanes["telemetry"].max_depth == 2
+
+    # highest priority lane first, each lane in arrival order
+    assert drain(queue) == ["control:0", "control:1", "power:0", "power:1", "telemetry:0", "telemetry:1"]
+    for lane in stats.receive_lanes.values():
+        assert lane.num_received == 2
+        assert lane.num_promoted == 0
+        assert lane.depth == 0
+        assert lane.max_wait >= lane.mean_wait >= 0
+    assert "ReceiveLaneStats [control]" in str(stats)
+
+
+def test_receive_queue_starvation():
+    queue = ReceiveQueue(lane_of, starvation_limit=3)
+    queue.put_nowait("telemetry:0")
+    queue.put_nowait("power:0")
+    for i in range(8):
+        queue.put_nowait(f"control:{i}")
+
+    # power and telemetry are each served once passed over starvation_limit times
+    assert drain(queue) == [
+        "control:0", "control:1", "control:2",
+        "power:0",
+        "telemetry:0",
+        "control:3", "control:4", "control:5", "control:6", "control:7",
+    ]
+    assert queue._lane_stats[ReceiveLane.power].num_promoted == 1
+    assert queue._lane_stats[ReceiveLane.telemetry].num_promoted == 1
+    assert queue._lane_stats[ReceiveLane.control].num_promoted == 0
+
+
+def test_receive_queue_created():
+    queue = ReceiveQueue(lane_of)
+    queue.put_nowait("telemetry:0", 1.5)
+    queue.put_nowait("telemetry:1")
+    assert queue.get_nowait() == "telemetry:0"
+    assert queue.last_created == 1.5
+    assert queue.get_nowait() == "telemetry:1"
+    assert queue.last_created > 1.5
+
+
+def test_receive_queue_async():
+    async def run():
+        queue = ReceiveQueue(lane_of)
+        getter = asyncio.create_task(queue.get())
+        await asyncio.sleep(0)
+        queue.put_nowait("telemetry:0")
+        assert await getter == "telemetry:0"
+        queue.task_done()
+        await queue.join()
+    asyncio.run(run())
+
+
+def bounded(overflow: OverflowPolicy, max_size: int = 4, **kwargs) -> ReceiveQueueSettings:
+    return ReceiveQueueSettings(telemetry=ReceiveLaneSettings(max_size=max_size, overflow=overflow), **kwargs)
+
+
+def source_of(item: str) -> str:
+    return item.split(":")[1]
+
+
+def test_receive_queue_drop_oldest():
+    stats = ProactorStats()
+    alerts = []
+    queue = ReceiveQueue(
+        lane_of,
+        stats.receive_lanes,
+        settings=bounded(OverflowPolicy.drop_oldest),
+        on_alert=alerts.append,
+    )
+    for i in range(6):
+        queue.put_nowait(f"telemetry:{i}")
+    queue.put_nowait("control:0")
+    lane_stats = stats.receive_lanes["telemetry"]
+    assert queue.qsize() == 5
+    assert lane_stats.max_size == 4
+    assert lane_stats.num_dropped == 2
+    assert lane_stats.max_depth == 4
+    assert alerts == [ReceiveLaneAlert(ReceiveLane.telemetry, True, 4, 4)]
+    assert drain(queue) == ["control:0", "telemetry:2", "telemetry:3", "telemetry:4", "telemetry:5"]
+
+    # high water mark is ceil(0.8 * 4) == 4; cleared at half of that, counting the drops since it was reached
+    assert alerts[1:] == [ReceiveLaneAlert(ReceiveLane.telemetry, False, 2, 4, num_dropped=2)]
+    assert "dropped: 2" in str(lane_stats)
+
+
+def test_receive_queue_coalesce():
+    stats = ProactorStats()
+    queue = ReceiveQueue(
+        lane_of,
+        stats.receive_lanes,
+        settings=bounded(OverflowPolicy.coalesce, max_size=3),
+        coalesce_key=source_of,
+    )
+    for item in ["telemetry:a:0", "telemetry:b:0", "telemetry:a:1", "telemetry:b:1", "telemetry:c:0"]:
+        queue.put_nowait(item)
+    lane_stats = stats.receive_lanes["telemetry"]
+    assert lane_stats.num_coalesced == 1
+    assert lane_stats.num_dropped == 1
+
+    # b:1 replaced b:0 in its place; c:0, from a source with nothing waiting, dropped the oldest
+    assert drain(queue) == ["telemetry:b:1", "telemetry:a:1", "telemetry:c:0"]
+    assert not queue._keys[ReceiveLane.telemetry]
+
+    # each put is a task; discarded items are marked done
+    assert queue._unfinished_tasks == 3
+
+
+def test_receive_queue_block():
+    stats = ProactorStats()
+    queue = ReceiveQueue(
+        lane_of,
+        stats.receive_lanes,
+        settings=bounded(OverflowPolicy.block, max_size=2, block_timeout_seconds=0.05),
+    )
+    lane_stats = stats.receive_lanes["telemetry"]
+
+    # items put without reserving room, as by writers in the event loop, are admitted over max_size
+    for i in range(3):
+        queue.put_nowait(f"telemetry:{i}")
+    assert queue.qsize() == 3
+    assert lane_stats.num_overflowed == 1
+    assert drain(queue) == ["telemetry:0", "telemetry:1", "telemetry:2"]
+
+    # a writer in another thread waits for room, and times out if none is made
+    for i in range(2):
+        assert queue.reserve_threadsafe(f"telemetry:{i}") == ReceiveLane.telemetry
+        queue.put_nowait(f"telemetry:{i}", reserved=ReceiveLane.telemetry)
+    assert queue.reserve_threadsafe("telemetry:2") is None
+    assert lane_stats.num_blocked == 1
+    assert lane_stats.total_blocked >= 0.04
+
+    reserved = []
+    writer = threading.Thread(target=lambda: reserved.append(queue.reserve_threadsafe("telemetry:3")))
+    queue._block_timeout = 10
+    writer.start()
+    time.sleep(0.05)
+    assert not reserved
+    assert queue.get_nowait() == "telemetry:0"
+    writer.join(timeout=5)
+    assert reserved == [ReceiveLane.telemetry]
+    assert queue._num_reserved[ReceiveLane.telemetry] == 1
+    queue.put_nowait("telemetry:3", reserved=ReceiveLane.telemetry)
+    assert queue._num_reserved[ReceiveLane.telemetry] == 0
+
+    # writers in the event loop never wait
+    async def reserve_in_loop():
+        return queue.reserve_threadsafe("telemetry:4")
+    assert asyncio.run(reserve_in_loop()) is None
+
+    # close() releases waiting writers
+    writer = threading.Thread(target=lambda: reserved.append(queue.reserve_threadsafe("telemetry:4")))
+    writer.start()
+    time.sleep(0.05)
+    queue.close()
+    writer.join(timeout=5)
+    assert reserved == [ReceiveLane.telemetry, None]
+
+
+def test_receive_queue_reserve_unbounded():
+    classified = []
+
+    def classify(item: str) -> ReceiveLane:
+        classified.append(item)
+        return lane_of(item)
+
+    # items are not classified to reserve room unless some lane blocks
+    queue = ReceiveQueue(classify, settings=bounded(OverflowPolicy.coalesce, max_size=2))
+    assert queue.reserve_threadsafe("telemetry:0") is None
+    assert classified == []
+
+    # an item put in the lane reserved for it is not classified again
+    queue = ReceiveQueue(classify, settings=bounded(OverflowPolicy.block, max_size=2))
+    assert queue.reserve_threadsafe("telemetry:0") == ReceiveLane.telemetry
+    queue.put_nowait("telemetry:0", reserved=ReceiveLane.telemetry)
+    assert classified == ["telemetry:0"]
+    assert drain(queue) == ["telemetry:0"]
+
+
+def mqtt_receipt(topic: str) -> MQTTReceiptMessage:
+    return MQTTReceiptMessage(Scada2.GRIDWORKS_MQTT, None, MQTTMessage(topic=topic.encode()))
+
+
+def test_scada_receive_lanes():
+    settings = ScadaSettings()
+    settings.paths.mkdirs()
+    layout = load_house.load_all(settings)
+    scada = Scada2("a.s", settings, hardware_layout=layout)
+    atn = "dw1-isone-ct-newhaven-orange1"
+    assert scada._receive_lane(PatInternalWatchdogMessage("a.s")) == ReceiveLane.control
+    assert scada._receive_lane(mqtt_receipt(f"gw/{atn}/{Ack.__fields__['TypeName'].default}".replace(".", "-"))) == (
+        ReceiveLane.control
+    )
+    dispatch_topic = f"gw/{atn}/{GtDispatchBoolean_Maker.type_alias}".replace(".", "-")
+    assert scada._receive_lane(mqtt_receipt(dispatch_topic)) == ReceiveLane.control
+    assert scada._receive_lane_by_topic[dispatch_topic] == ReceiveLane.control
+    # the cache is replaced, never updated in place, as writer threads read it concurrently
+    cache = scada._receive_lane_by_topic
+    assert scada._receive_lane(mqtt_receipt(f"gw/{atn}/gt-telemetry-110")) == ReceiveLane.telemetry
+    assert scada._receive_lane_by_topic is not cache
+    assert len(cache) == len(scada._receive_lane_by_topic) - 1
+    assert scada._receive_lane(mqtt_receipt(f"gw/{atn}/gt-telemetry-110")) == ReceiveLane.telemetry
+    assert scada._receive_coalesce_key(mqtt_receipt(dispatch_topic)) == (Scada2.GRIDWORKS_MQTT, dispatch_topic)
+    assert scada._receive_coalesce_key(PatInternalWatchdogMessage("a.s")) == (
+        "a.s", PatInternalWatchdogMessage("a.s").Header.MessageType
+    )
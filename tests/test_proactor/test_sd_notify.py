@@ -0,0 +1,62 @@
+import asyncio
+
+from actors2 import Scada2
+from actors2.config import ScadaSettings
+from proactor.message import PatExternalWatchdogMessage
+from proactor.sd_notify import SdNotifier
+from proactor.watchdog import WatchdogManager
+import load_house
+from tests.utils.notify_socket import NotifySocket
+
+
+def test_sd_notifier():
+    assert not SdNotifier("").enabled
+    assert not SdNotifier("").watchdog()
+    assert SdNotifier("@abstract").address == b"\0abstract"
+    with NotifySocket() as notify_socket:
+        notifier = SdNotifier(notify_socket.address)
+        assert notifier.enabled
+        assert notifier.ready("starting\nup")
+        assert notifier.watchdog()
+        assert notifier.status("running")
+        assert notifier.stopping()
+        assert notify_socket.received() == [
+            ["READY=1", "STATUS=starting up"],
+            ["WATCHDOG=1"],
+            ["STATUS=running"],
+            ["STOPPING=1"],
+        ]
+        assert notifier.num_sent == 4
+        notifier.close()
+
+    # the listener is gone: the notification fails without raising, and is retried on a new socket next time
+    assert not notifier.watchdog()
+    assert notifier.num_failed == 1
+    assert notifier.last_error is not None
+    assert notifier._socket is None
+
+
+def test_watchdog_manager_notifies(monkeypatch):
+    settings = ScadaSettings()
+    settings.paths.mkdirs()
+    scada = Scada2("a.s", settings, hardware_layout=load_house.load_all(settings))
+    with NotifySocket() as notify_socket:
+        monkeypatch.setenv(WatchdogManager.RUNNING_AS_SERIVCE_ENV_NAME, "1")
+        monkeypatch.setenv("NOTIFY_SOCKET", notify_socket.address)
+
+        async def run():
+            scada._receive_queue = asyncio.Queue()
+            watchdog = WatchdogManager(10, scada)
+            watchdog.start()
+            watchdog.process_message(PatExternalWatchdogMessage())
+            watchdog.notify_status("busy")
+            watchdog.stop()
+            await watchdog.join()
+
+        asyncio.run(run())
+        assert notify_socket.received() == [
+            ["READY=1", "STATUS=a.s running"],
+            ["WATCHDOG=1"],
+            ["STATUS=busy"],
+            ["STOPPING=1", "STATUS=a.s stopping"],
+        ]
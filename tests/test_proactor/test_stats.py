@@ -0,0 +1,42 @@
+import json
+
+from proactor.stats import LATENCY_BUCKET_BOUNDS
+from proactor.stats import LatencyHistogram
+from proactor.stats import MessageLatencyStats
+
+
+def test_latency_histogram():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(0.5) == 0.0
+    assert histogram.mean == 0.0
+    for latency in [0.0, 0.0001, 0.0002, 0.003, 0.003, 0.004, 0.02, 0.3, 20.0, 0.001]:
+        histogram.add(latency)
+    assert histogram.count == 10
+    assert sum(histogram.counts) == 10
+    assert len(histogram.counts) == len(LATENCY_BUCKET_BOUNDS) + 1
+    # latencies equal to a bound are counted in the bucket of that bound
+    assert histogram.counts[LATENCY_BUCKET_BOUNDS.index(0.0001)] == 2
+    assert histogram.counts[LATENCY_BUCKET_BOUNDS.index(0.001)] == 1
+    assert histogram.counts[-1] == 1
+    assert histogram.max == 20.0
+    assert abs(histogram.mean - 2.03313) < 1e-9
+    assert histogram.percentile(0.5) == 0.005
+    assert histogram.percentile(0.8) == 0.025
+    assert histogram.percentile(0.99) == 20.0
+
+
+def test_message_latency_stats():
+    latency = MessageLatencyStats()
+    assert not latency
+    latency.queue["a"].add(0.001)
+    latency.handler["a"].add(0.002)
+    latency.mqtt_by_link["link"].add(0.01)
+    latency.mqtt_by_type["b"].add(0.01)
+    assert latency
+    d = json.loads(json.dumps(latency.as_dict()))
+    assert set(d) == {"queue", "handler", "mqtt_by_link", "mqtt_by_type"}
+    assert d["handler"]["a"]["count"] == 1
+    assert d["mqtt_by_link"]["link"]["bounds"] == list(LATENCY_BUCKET_BOUNDS)
+    s = str(latency)
+    assert "[link]" in s
+    assert "mqtt by message_type" in s
@@ -0,0 +1,61 @@
+import asyncio
+import threading
+
+from proactor import AsyncQueueWriter
+from proactor import SyncAsyncQueueWriter
+
+
+def test_async_queue_writer_batches():
+    async def run():
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        writer = AsyncQueueWriter()
+        writer.set_async_loop(loop, queue)
+
+        # items put before the loop runs the delivery callback are delivered in one batch
+        for i in range(10):
+            writer.put(i)
+        assert queue.qsize() == 0
+        await asyncio.sleep(0)
+        assert [queue.get_nowait() for _ in range(queue.qsize())] == list(range(10))
+        assert writer.stats.num_batches == 1
+        assert writer.stats.max_batch == 10
+
+        # items from other threads arrive complete and in order
+        num_threads = 4
+        num_items = 1000
+
+        def put_items(thread_idx: int) -> None:
+            for item_idx in range(num_items):
+                writer.put((thread_idx, item_idx))
+
+        threads = [threading.Thread(target=put_items, args=(thread_idx,)) for thread_idx in range(num_threads)]
+        for thread in threads:
+            thread.start()
+        received = []
+        while len(received) < num_threads * num_items:
+            received.append(await asyncio.wait_for(queue.get(), timeout=5))
+        for thread in threads:
+            thread.join()
+        for thread_idx in range(num_threads):
+            assert [item for t, item in received if t == thread_idx] == list(range(num_items))
+        assert writer.stats.num_items == 10 + num_threads * num_items
+        assert writer.stats.num_batches <= 1 + num_threads * num_items
+        assert writer.stats.mean_batch >= 1
+
+    asyncio.run(run())
+
+
+def test_sync_async_queue_writer():
+    async def run():
+        queue = asyncio.Queue()
+        channel = SyncAsyncQueueWriter()
+        channel.set_async_loop(asyncio.get_running_loop(), queue)
+        channel.put_to_async_queue("a")
+        channel.put_to_async_queue("b")
+        assert await queue.get() == "a"
+        assert await queue.get() == "b"
+        assert channel.stats.num_items == 2
+        assert channel.stats.num_batches == 1
+
+    asyncio.run(run())
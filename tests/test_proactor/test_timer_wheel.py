@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from proactor import Proactor
+from proactor import ProactorSettings
+from proactor.config import MQTTClient
+from proactor.timer_wheel import TimerWheel
+
+
+def test_timer_wheel():
+    wheel = TimerWheel(tick_seconds=0.1, num_slots=8)
+    assert wheel.next_sweep(0.0) is None
+    assert wheel.expire(0.0) == []
+    wheel.add("a", 0.25)
+    wheel.add("b", 0.3)
+    wheel.add("c", 0.35)
+    wheel.add("far", 2.0)
+    assert len(wheel) == 4
+    assert "a" in wheel
+    # the next sweep is at the end of the tick of the earliest deadline
+    assert wheel.next_sweep(0.0) == pytest.approx(0.3)
+
+    # deadlines are reported by the first sweep at or after their tick
+    assert wheel.expire(0.2) == []
+    assert wheel.expire(0.3) == ["a", "b"]
+    assert "a" not in wheel
+
+    # cancel, and replace a deadline
+    assert wheel.cancel("c")
+    assert not wheel.cancel("c")
+    wheel.add("d", 0.5)
+    wheel.add("d", 0.75)
+    assert wheel.expire(0.6) == []
+    assert wheel.next_sweep(0.6) == pytest.approx(0.8)
+
+    # "far" shares a slot with nearer ticks until its own tick comes around
+    assert wheel.expire(1.0) == ["d"]
+    assert wheel.next_sweep(1.0) == pytest.approx(1.8)
+    assert wheel.expire(1.8) == []
+    assert wheel.next_sweep(1.8) == pytest.approx(2.1)
+    assert wheel.expire(1.99) == []
+    assert wheel.expire(2.0) == ["far"]
+    assert len(wheel) == 0
+    assert wheel.next_sweep(2.0) is None
+
+    # a deadline which already passed is reported by the next sweep
+    wheel.add("late", 1.0)
+    assert wheel.expire(2.1) == ["late"]
+
+    # sweeps more than a revolution apart visit every slot once
+    wheel.add("e", 2.5)
+    wheel.add("f", 3.0)
+    assert wheel.expire(10.0) == ["e", "f"]
+
+
+@pytest.mark.asyncio
+async def test_proactor_ack_timers():
+    proactor = Proactor("proactor", ProactorSettings(ack_timeout_seconds=60))
+    proactor._add_mqtt_client("fast", MQTTClient(ack_timeout_seconds=0.05))
+    proactor._add_mqtt_client("slow", MQTTClient())
+    proactor._start_ack_timer("fast", "a")
+    proactor._start_ack_timer("fast", "b")
+    proactor._start_ack_timer("slow", "c")
+    assert proactor._acks["c"].deadline - proactor._acks["a"].deadline > 59
+    assert proactor._ack_sweep_handle is not None
+    # the sweep is set for the earliest deadline rather than the next tick
+    assert proactor._ack_sweep_handle.when() >= proactor._acks["a"].deadline
+
+    # only the link with the short timeout times out; acks are cancelled as before
+    assert proactor._cancel_ack_timer("b").client_name == "fast"
+    await asyncio.sleep(0.2)
+    assert proactor.stats.link("fast").timeouts == 1
+    assert proactor.stats.link("slow").timeouts == 0
+    assert "a" not in proactor._acks
+    assert proactor._cancel_ack_timer("a") is None
+
+    # while only "c" is awaited the sweep is not set before its deadline, or the span of the wheel if sooner
+    loop = asyncio.get_running_loop()
+    assert proactor._ack_sweep_handle.when() - loop.time() > 1
+
+    # the sweep stops once no acks are awaited
+    assert proactor._cancel_ack_timer("c").message_id == "c"
+    assert proactor._ack_sweep_handle is None
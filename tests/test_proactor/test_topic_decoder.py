@@ -0,0 +1,78 @@
+import pytest
+from gwproto import Decoders
+from gwproto import MQTTCodec
+from gwproto import create_message_payload_discriminator
+from gwproto.enums import TelemetryName
+from gwproto.messages import Ack
+from gwproto.messages import GtTelemetry_Maker
+from gwproto.messages import PingMessage
+from pydantic import ValidationError
+
+from proactor.message import Message
+from proactor.topic_decoder import TopicDecoder
+
+SRC = "a.b"
+
+_MessageDecoder = create_message_payload_discriminator(
+    "_MessageDecoder",
+    [
+        "gwproto.messages",
+        "proactor.message",
+    ]
+)
+
+
+class _Codec(MQTTCodec):
+
+    def __init__(self):
+        super().__init__(Decoders.from_objects([GtTelemetry_Maker], message_payload_discriminator=_MessageDecoder))
+
+    def validate_source_alias(self, source_alias: str):
+        if source_alias != SRC:
+            raise ValueError(f"alias {source_alias} is not {SRC}")
+
+
+def encoded(message: Message) -> tuple[str, bytes]:
+    if hasattr(message.Payload, "asdict"):
+        # maker payloads are published as their dicts
+        message = Message(Header=message.Header, Payload=message.Payload.asdict())
+    return message.mqtt_topic(), message.json().encode()
+
+
+@pytest.mark.parametrize("trusted", [False, True])
+def test_topic_decoder(trusted: bool):
+    codec = _Codec()
+    decoder = TopicDecoder(codec, trusted=trusted)
+    telemetry = GtTelemetry_Maker(
+        scada_read_time_unix_ms=1_700_000_000_000, value=2, name=TelemetryName.WATER_TEMP_C_TIMES1000, exponent=3
+    ).tuple
+    for message in [
+        Message(Src=SRC, Payload=Ack(AckMessageID="x"), MessageId="y", AckRequired=True),
+        PingMessage(Src=SRC),
+        Message(Src=SRC, Payload=telemetry),
+    ]:
+        topic, payload = encoded(message)
+        decoded = decoder.decode(topic, payload)
+        expected = codec.decode(topic, payload)
+        assert decoded.Header == expected.Header
+        assert decoded.Payload == expected.Payload
+        assert decoded.Header.MessageType == message.Header.MessageType
+        assert decoder._routes[topic] is not None
+
+    # topics which do not name a known type are decoded by the codec
+    message = PingMessage(Src=SRC)
+    payload = message.json().encode()
+    topic = f"gw/{SRC.replace('.', '-')}"
+    assert decoder.decode(topic, payload).Header == message.Header
+    assert decoder._routes[topic] is None
+
+    # source aliases are validated
+    topic, payload = encoded(PingMessage(Src="c.d"))
+    with pytest.raises(ValueError):
+        decoder.decode(topic, payload)
+
+    # payloads are validated, trusted or not
+    topic, _ = encoded(Message(Src=SRC, Payload=Ack(AckMessageID="x")))
+    bad_ack = Message(Src=SRC, Payload=dict(TypeName="gridworks.ack")).json().encode()
+    with pytest.raises(ValidationError):
+        decoder.decode(topic, bad_ack.replace(b'"MessageType": ""', b'"MessageType": "gridworks.ack"'))
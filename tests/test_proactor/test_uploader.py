@@ -0,0 +1,137 @@
+import pytest
+
+from proactor.config import UploadSettings
+from proactor.persister import PendingContent
+from proactor.stats import UploadStats
+from proactor.uploader import PendingEventUploader
+
+
+def chunks(uids: list[str], chunk_size: int = 3) -> list[list[PendingContent]]:
+    return [
+        [PendingContent(uid, uid.encode()) for uid in uids[start:start + chunk_size]]
+        for start in range(0, len(uids), chunk_size)
+    ]
+
+
+def drain(uploader: PendingEventUploader, now: float) -> list[str]:
+    sent = []
+    while (event := uploader.next_event()) is not None:
+        uploader.sent(event.uid, now)
+        sent.append(event.uid)
+    return sent
+
+
+def test_uploader_window():
+    settings = UploadSettings(initial_window=2, min_window=1, max_window=4, target_ack_seconds=1.0)
+    stats = UploadStats()
+    uploader = PendingEventUploader(settings, stats)
+    assert uploader.window == 2
+    assert uploader.next_event() is None
+
+    # events are read one chunk at a time, as they are needed
+    uids = [str(i) for i in range(10)]
+    uploader.start(iter(chunks(uids)), len(uids), now=0.0)
+    assert uploader.num_queued == 0
+    assert stats.backlog == 10
+    assert stats.num_uploads == 1
+    assert drain(uploader, 0.0) == ["0", "1"]
+    assert "0" in uploader
+    assert uploader.num_in_flight == stats.in_flight == 2
+    assert uploader.num_queued == 1
+
+    # fast acks grow the window up to max_window
+    assert uploader.acked("0", now=0.1)
+    assert uploader.window == 3
+    assert drain(uploader, 0.1) == ["2", "3"]
+    assert uploader.acked("1", now=0.2)
+    assert uploader.acked("2", now=0.2)
+    assert uploader.window == 4
+    assert drain(uploader, 0.2) == ["4", "5", "6"]
+    assert uploader.num_in_flight == 4
+    assert stats.ack_latency == pytest.approx(0.1125 + 0.125 * (0.1 - 0.1125))
+    assert stats.backlog == 7
+    assert stats.drain_rate(now=1.0) == pytest.approx(3.0)
+    assert stats.eta_seconds(now=1.0) == pytest.approx(7 / 3.0)
+    assert not uploader.acked("unknown", now=1.0)
+
+    # slow acks shrink the window
+    assert uploader.acked("3", now=5.0)
+    assert uploader.acked("4", now=5.0)
+    assert uploader.window == 3
+    assert uploader.num_in_flight == 2
+    assert drain(uploader, 5.0) == ["7"]
+
+    # timeouts halve the window, but not below min_window
+    assert uploader.timed_out("5")
+    assert uploader.window == 1
+    assert uploader.timed_out("6")
+    assert uploader.window == 1
+    assert not uploader.timed_out("6")
+    assert stats.num_timeouts == 2
+    assert drain(uploader, 5.0) == []
+    assert uploader.acked("7", now=5.5)
+    assert drain(uploader, 5.5) == ["8", "9"]
+    uploader.skipped()
+    assert stats.backlog == 1
+
+    # stop abandons queued and in flight events
+    uploader.stop()
+    assert uploader.num_queued == uploader.num_in_flight == 0
+    assert stats.backlog == 0
+    assert stats.eta_seconds() == 0.0
+    assert uploader.next_event() is None
+
+
+def test_uploader_restart():
+    uploader = PendingEventUploader(UploadSettings(initial_window=2))
+    uploader.start(chunks(["a", "b", "c"]), 3, now=0.0)
+    assert drain(uploader, 0.0) == ["a", "b"]
+    assert uploader.stats.eta_seconds(now=1.0) is None
+
+    # starting while an upload is running does not send events in flight again
+    assert uploader.uploading
+    assert not uploader.start(chunks(["a", "b", "c"]), 3, now=0.5)
+    assert uploader.stats.num_uploads == 1
+    assert "a" in uploader and "b" in uploader
+    assert drain(uploader, 0.5) == []
+
+    # restart after stop sends events in flight again
+    uploader.stop()
+    assert not uploader.uploading
+    assert uploader.start(chunks(["a", "b", "c"]), 3, now=1.0)
+    assert uploader.stats.num_uploads == 2
+    assert uploader.stats.backlog == 3
+    assert drain(uploader, 1.0) == ["a", "b"]
+    assert uploader.acked("a", now=1.1)
+    assert drain(uploader, 1.1) == ["c"]
+    assert "a" not in uploader
+    assert str(uploader.stats)
+    assert uploader.acked("b", now=1.2) and uploader.acked("c", now=1.2)
+    assert not uploader.uploading
+
+    # events cleared before they were read leave the backlog once all chunks are read
+    uploader.start(chunks(["d"]), 3, now=2.0)
+    assert drain(uploader, 2.0) == ["d"]
+    assert uploader.stats.backlog == 1
+
+
+def test_uploader_batches():
+    uploader = PendingEventUploader(UploadSettings(initial_window=1))
+    uploader.start(chunks(["a", "b", "c", "d"], chunk_size=2), 4, now=0.0)
+    assert uploader.next_event().uid == "a"
+    assert uploader.next_batched_event().uid == "b"
+    c = uploader.next_batched_event()
+    assert c == PendingContent("c", b"c")
+    uploader.requeue(c)
+    uploader.sent("batch1", now=0.0, uids=["a", "b"])
+    assert uploader.num_in_flight == 1
+    assert uploader.next_event() is None
+    assert uploader.acked("batch1", now=0.1) == ["a", "b"]
+    assert uploader.stats.num_acked == 2
+    assert uploader.stats.backlog == 2
+    assert uploader.next_event().uid == "c"
+    assert uploader.next_batched_event().uid == "d"
+    assert uploader.next_batched_event() is None
+    uploader.sent("batch2", now=0.1, uids=["c", "d"])
+    assert uploader.timed_out("batch2")
+    assert uploader.stats.backlog == 0
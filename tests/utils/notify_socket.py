@@ -0,0 +1,37 @@
+import socket
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+
+class NotifySocket:
+    """A stand-in for the socket systemd listens on for sd_notify messages. Use as a context manager; while open,
+    address is the value for NOTIFY_SOCKET and received() returns the messages received so far, each as a list of
+    its assignments."""
+
+    address: str
+    _directory: Optional[tempfile.TemporaryDirectory] = None
+    _socket: Optional[socket.socket] = None
+    _received: list[list[str]]
+
+    def __init__(self):
+        self._received = []
+
+    def __enter__(self) -> "NotifySocket":
+        self._directory = tempfile.TemporaryDirectory()
+        self.address = str(Path(self._directory.name) / "notify")
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.bind(self.address)
+        self._socket.setblocking(False)
+        return self
+
+    def __exit__(self, *args) -> None:
+        self._socket.close()
+        self._directory.cleanup()
+
+    def received(self) -> list[list[str]]:
+        while True:
+            try:
+                self._received.append(self._socket.recv(4096).decode().split("\n"))
+            except BlockingIOError:
+                return list(self._received)
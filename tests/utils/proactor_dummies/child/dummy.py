@@ -8,7 +8,8 @@ from gwproto import MQTTTopic
 
 from proactor import ProactorSettings
 from proactor.mqtt import QOS
-from proactor.persister import TimedRollingFilePersister
+from proactor.persister import PersisterInterface
+from proactor.persister import make_persister
 from proactor.proactor_implementation import Proactor
 
 from tests.utils.proactor_dummies.child.config import DummyChildSettings
@@ -68,8 +69,8 @@ class DummyChild(Proactor):
         self.log_subscriptions("construction")
 
     @classmethod
-    def make_event_persister(cls, settings: ProactorSettings) -> TimedRollingFilePersister:
-        return TimedRollingFilePersister(settings.paths.event_dir)
+    def make_event_persister(cls, settings: ProactorSettings) -> PersisterInterface:
+        return make_persister(settings.persister, settings.paths.event_dir)
 
     @property
     def publication_name(self) -> str:
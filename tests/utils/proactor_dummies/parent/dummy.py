@@ -19,7 +19,7 @@ from tests.utils.proactor_dummies.parent.config import DummyParentSettings
 
 ParentMessageDecoder = create_message_payload_discriminator(
     model_name="ParentMessageDecoder",
-    module_names=["gwproto.messages"],
+    module_names=["gwproto.messages", "proactor.message"],
 )
 
 
@@ -1,14 +1,21 @@
 import asyncio
 import warnings
+from typing import Optional
 from typing import Type
 
 import pytest
 from gwproto import MQTTTopic
+from gwproto.messages import Ack
+from gwproto.messages import ProblemEvent
+from gwproto.messages import Problems as ProblemType
 from paho.mqtt.client import MQTT_ERR_CONN_LOST
 
+from proactor.config import CoalescingPolicy
 from proactor.config import MQTTClient
+from proactor.config import UploadSettings
 from proactor.link_state import StateName
 from proactor.message import DBGPayload
+from proactor.message import MessageType
 from tests.utils import await_for
 from tests.utils.comm_test_helper import CommTestHelper
 from tests.utils.proactor_dummies import DummyChildSettings
@@ -233,6 +240,16 @@ class ProactorCommTests:
                 err_str_f=child.summary_str
             )
 
+            # latencies of the messages processed were recorded
+            latency = child.stats.latency
+            num_connected = child.stats.num_received_by_type[MessageType.mqtt_connected.value]
+            assert num_connected > 0
+            assert latency.queue[MessageType.mqtt_connected.value].count == num_connected
+            assert latency.handler[MessageType.mqtt_connected.value].count == num_connected
+            assert latency.mqtt_by_link[child.upstream_client].count > 0
+            assert latency.mqtt_by_type[Ack.__fields__["TypeName"].default].count > 0
+            assert "MessageLatencyStats" in str(child.stats)
+
     @pytest.mark.asyncio
     async def test_basic_parent_comm_loss(self):
         async with self.CTH(add_child=True, add_parent=True, verbose=False) as h:
@@ -992,3 +1009,154 @@ class ProactorCommTests:
                 "ERROR waiting for parent to respond",
                 err_str_f=child.summary_str
             )
+
+    async def test_paced_upload(self):
+        """Test that pending events are uploaded with at most upload.max_window events awaiting acks"""
+        child_settings = self.CTH.child_settings_t()
+        child_settings.upload = UploadSettings(initial_window=2, max_window=4)
+        async with self.CTH(
+            add_child=True,
+            add_parent=True,
+            child_settings=child_settings,
+            verbose=True,
+        ) as h:
+            child = h.child
+            link = child._link_states.link(child.upstream_client)
+            max_in_flight = 0
+            uploader_sent = child._uploader.sent
+
+            def sent(uid: str, now: Optional[float] = None) -> None:
+                nonlocal max_in_flight
+                uploader_sent(uid, now)
+                max_in_flight = max(max_in_flight, child._uploader.num_in_flight)
+
+            child._uploader.sent = sent
+            num_events = 20
+            for i in range(num_events):
+                child.generate_event(
+                    ProblemEvent(ProblemType=ProblemType.warning, Summary=f"backlog event {i}")
+                )
+            assert child._event_persister.num_pending == num_events
+
+            h.start_parent()
+            h.start_child()
+            await await_for(
+                lambda: link.in_state(StateName.active),
+                3,
+                "ERROR waiting for child active",
+                err_str_f=child.summary_str
+            )
+            await await_for(
+                lambda: child._event_persister.num_pending == 0,
+                3,
+                "ERROR waiting for events to be acked",
+                err_str_f=child.summary_str
+            )
+            assert 0 < max_in_flight <= 4
+            assert child.stats.upload.num_acked >= num_events
+            assert child.stats.upload.backlog == 0
+            assert child.stats.upload.eta_seconds() == 0.0
+
+    async def test_coalesced_events(self):
+        """Test that events of coalesced types generated while the upstream link is not active are thinned"""
+        child_settings = self.CTH.child_settings_t()
+        child_settings.persister.coalescing = [
+            CoalescingPolicy(type_names=[ProblemEvent.__fields__["TypeName"].default], keep_every=3)
+        ]
+        async with self.CTH(
+            add_child=True,
+            add_parent=True,
+            child_settings=child_settings,
+            verbose=True,
+        ) as h:
+            child = h.child
+            link = child._link_states.link(child.upstream_client)
+            backlog = []
+            for i in range(9):
+                event = ProblemEvent(ProblemType=ProblemType.warning, Summary=f"backlog event {i}")
+                backlog.append(event.MessageId)
+                child.generate_event(event)
+            assert child._event_persister.pending() == backlog[::3]
+            assert child.stats.num_coalesced_events == 6
+
+            h.start_parent()
+            h.start_child()
+            await await_for(
+                lambda: link.in_state(StateName.active),
+                3,
+                "ERROR waiting for child active",
+                err_str_f=child.summary_str
+            )
+            await await_for(
+                lambda: child._event_persister.num_pending == 0,
+                3,
+                "ERROR waiting for events to be acked",
+                err_str_f=child.summary_str
+            )
+
+            # the backlog which survived coalescing was replayed
+            num_acked = child.stats.upload.num_acked
+            assert num_acked >= len(backlog[::3])
+
+            # while the link is active, events are not coalesced
+            for i in range(3):
+                child.generate_event(ProblemEvent(ProblemType=ProblemType.warning, Summary=f"live event {i}"))
+            assert child.stats.num_coalesced_events == 6
+            await await_for(
+                lambda: child._event_persister.num_pending == 0,
+                3,
+                "ERROR waiting for live events to be acked",
+                err_str_f=child.summary_str
+            )
+            # live events are acked as published rather than replayed
+            assert child.stats.upload.num_acked == num_acked
+
+    async def test_batched_upload(self):
+        """Test that pending events uploaded in batches are unpacked by the parent and cleared by batch acks"""
+        child_settings = self.CTH.child_settings_t()
+        child_settings.upload = UploadSettings(initial_window=1, max_window=2, batch_max_events=5, batch_max_bytes=1300)
+        async with self.CTH(
+            add_child=True,
+            add_parent=True,
+            child_settings=child_settings,
+            verbose=True,
+        ) as h:
+            child = h.child
+            parent = h.parent
+            link = child._link_states.link(child.upstream_client)
+            parent_stats = parent.stats.link(parent.primary_peer_client)
+            batch_topic = MQTTTopic.encode("gw", child.publication_name, "gridworks-proactor-event-batch")
+            unpacked = []
+            parent_derived_process_mqtt_message = parent._derived_process_mqtt_message
+
+            def derived_process_mqtt_message(message, decoded) -> None:
+                if message.Payload.message.topic == batch_topic:
+                    unpacked.append(decoded.Payload.MessageId)
+                parent_derived_process_mqtt_message(message, decoded)
+
+            parent._derived_process_mqtt_message = derived_process_mqtt_message
+            num_events = 23
+            backlog = []
+            for i in range(num_events):
+                event = ProblemEvent(ProblemType=ProblemType.warning, Summary=f"backlog event {i}")
+                backlog.append(event.MessageId)
+                child.generate_event(event)
+
+            h.start_parent()
+            h.start_child()
+            await await_for(
+                lambda: link.in_state(StateName.active),
+                3,
+                "ERROR waiting for child active",
+                err_str_f=child.summary_str
+            )
+            await await_for(
+                lambda: child._event_persister.num_pending == 0,
+                3,
+                "ERROR waiting for events to be acked",
+                err_str_f=child.summary_str
+            )
+            assert set(backlog) <= set(unpacked)
+            num_batches = parent_stats.num_received_by_topic[batch_topic]
+            # ~420 byte event messages are batched by 3 due to batch_max_bytes
+            assert num_events / 3 <= num_batches < num_events